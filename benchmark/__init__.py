@@ -0,0 +1 @@
+"""Benchmarks of the adapter, run as modules from the repository root."""
@@ -0,0 +1,86 @@
+"""Synthetic parquet datasets for benchmarks.
+
+The generated files follow the layout and column names of the Open Targets
+datasets so that the schema classes and the reference definitions could be used
+against them directly. Values are random but deterministic.
+"""
+
+from pathlib import Path
+
+import duckdb
+
+from open_targets.data.schema import DatasetEvidenceEuropepmc, DatasetExpression
+
+
+def write_synthetic_evidence_europepmc(location: Path, num_rows: int, num_files: int = 1) -> None:
+    """Write a synthetic `evidence_europepmc` dataset."""
+    _write_dataset(
+        location / DatasetEvidenceEuropepmc.id,
+        num_rows,
+        num_files,
+        """
+        SELECT
+            md5(i::VARCHAR) AS id,
+            'europepmc' AS datasourceId,
+            'literature' AS datatypeId,
+            printf('EFO_%07d', i % 5000) AS diseaseId,
+            printf('EFO_%07d', i % 5000) AS diseaseFromSourceMappedId,
+            printf('ENSG%011d', i % 20000) AS targetId,
+            printf('GENE%d', i % 20000) AS targetFromSourceId,
+            list_transform(range(i % 4), j -> (30000000 + i + j)::VARCHAR) AS literature,
+            (i % 1000) / 1000.0 AS resourceScore,
+            (i % 997) / 997.0 AS score,
+            (1990 + i % 35)::DOUBLE AS publicationYear,
+            list_transform(
+                range(i % 3),
+                j -> {
+                    'dEnd': 10.0, 'dStart': 0.0, 'section': 'abstract',
+                    'tEnd': 30.0, 'tStart': 20.0, 'text': printf('sentence %d of row %d', j, i)
+                }
+            ) AS textMiningSentences
+        FROM range({start}, {stop}) AS t(i)
+        """,
+    )
+
+
+def write_synthetic_expression(location: Path, num_rows: int, num_files: int = 1) -> None:
+    """Write a synthetic `expression` dataset."""
+    _write_dataset(
+        location / DatasetExpression.id,
+        num_rows,
+        num_files,
+        """
+        SELECT
+            printf('ENSG%011d', i) AS id,
+            CASE WHEN i % 50 = 0 THEN NULL ELSE list_transform(
+                range(i % 12),
+                j -> {
+                    'efo_code': printf('UBERON_%07d', (i * 7 + j) % 800),
+                    'label': printf('tissue %d', (i * 7 + j) % 800),
+                    'organs': ['organ a', 'organ b'],
+                    'anatomical_systems': ['system a'],
+                    'rna': {'value': (i + j) / 3.0, 'zscore': (i + j) % 5, 'level': (i + j) % 4, 'unit': 'TPM'},
+                    'protein': {
+                        'reliability': j % 2 = 0,
+                        'level': j % 3,
+                        'cell_type': [{'name': 'cell', 'level': j % 3, 'reliability': true}]
+                    }
+                }
+            ) END AS tissues
+        FROM range({start}, {stop}) AS t(i)
+        """,
+    )
+
+
+def _write_dataset(directory: Path, num_rows: int, num_files: int, query: str) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    rows_per_file = -(-num_rows // num_files)
+    connection = duckdb.connect()
+    try:
+        for index in range(num_files):
+            start = index * rows_per_file
+            stop = min(num_rows, start + rows_per_file)
+            file_query = query.replace("{start}", str(start)).replace("{stop}", str(stop))
+            connection.execute(f"COPY ({file_query}) TO '{directory / f'part-{index:05d}.parquet'}' (FORMAT parquet)")
+    finally:
+        connection.close()
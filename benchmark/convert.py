@@ -0,0 +1,197 @@
+"""Benchmark of converting scanned rows into nodes and edges.
+
+Compares converters evaluating each expression on its own, as previously done,
+with converters evaluating the expressions of a definition together, sharing
+common subtrees and folding constants. Rows are scanned into memory first so
+that only the conversion is measured.
+
+Run from the repository root:
+
+    python -m benchmark.convert --rows 100000
+"""
+
+import argparse
+import cProfile
+import pstats
+import tempfile
+import time
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any
+
+from benchmark._synthetic import write_synthetic_evidence_europepmc, write_synthetic_expression
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.data_view import DataView
+from open_targets.adapter.expression import (
+    FieldExpression,
+    LiteralExpression,
+    StringConcatenationExpression,
+    StringLowerExpression,
+    ToStringExpression,
+    TransformExpression,
+)
+from open_targets.adapter.output import EdgeInfo, NodeInfo
+from open_targets.adapter.scan_operation import RowScanOperation
+from open_targets.data.schema import (
+    DatasetEvidenceEuropepmc,
+    FieldEvidenceEuropepmcDiseaseId,
+    FieldEvidenceEuropepmcScore,
+    FieldEvidenceEuropepmcTargetId,
+)
+from open_targets.definition.reference_kg.edge import (
+    edge_target_disease_association_europepmc_has_object_disease,
+    edge_target_expressed_in_biosample,
+)
+from open_targets.definition.reference_kg.node import node_target_disease_association_europepmc
+
+
+def _score_band(score: float) -> str:
+    return "high" if score > 0.5 else "low"  # noqa: PLR2004
+
+
+# Mixes Python transforms with subtrees shared by the id, the endpoints and
+# the properties, as in definitions deriving ids from their endpoints.
+_shared_subtree_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetEvidenceEuropepmc),
+    primary_id=StringConcatenationExpression(
+        [
+            StringLowerExpression(ToStringExpression(FieldExpression(FieldEvidenceEuropepmcTargetId))),
+            LiteralExpression("-"),
+            StringLowerExpression(ToStringExpression(FieldExpression(FieldEvidenceEuropepmcDiseaseId))),
+            LiteralExpression("-"),
+            TransformExpression(FieldExpression(FieldEvidenceEuropepmcScore), _score_band),
+        ],
+    ),
+    source=StringLowerExpression(ToStringExpression(FieldExpression(FieldEvidenceEuropepmcTargetId))),
+    target=StringLowerExpression(ToStringExpression(FieldExpression(FieldEvidenceEuropepmcDiseaseId))),
+    label=ToStringExpression(LiteralExpression("ASSOCIATED_WITH")),
+    properties=[
+        (StringLowerExpression(LiteralExpression("SCORE")), FieldEvidenceEuropepmcScore),
+        (LiteralExpression("band"), TransformExpression(FieldExpression(FieldEvidenceEuropepmcScore), _score_band)),
+    ],
+)
+
+DEFINITIONS: dict[str, AcquisitionDefinition[Any]] = {
+    "node_target_disease_association_europepmc": node_target_disease_association_europepmc,
+    "edge_target_disease_association_europepmc_has_object_disease": (
+        edge_target_disease_association_europepmc_has_object_disease
+    ),
+    "edge_target_expressed_in_biosample": edge_target_expressed_in_biosample,
+    "shared subtrees": _shared_subtree_definition,
+}
+
+
+def create_per_expression_converter(
+    definition: ExpressionNodeAcquisitionDefinition | ExpressionEdgeAcquisitionDefinition,
+    context: AcquisitionContext,
+) -> Callable[[DataView], NodeInfo | EdgeInfo]:
+    """Create a converter evaluating each expression on its own."""
+    property_getters = [
+        (definition._create_value_getter(key, context), definition._create_value_getter(value, context))  # noqa: SLF001
+        for key, value in definition._property_exprs  # noqa: SLF001
+    ]
+    id_getter = definition._create_value_getter(definition._primary_id_expr, context)  # noqa: SLF001
+    label_getter = definition._create_value_getter(definition._label_expr, context)  # noqa: SLF001
+    if isinstance(definition, ExpressionNodeAcquisitionDefinition):
+        return lambda data: NodeInfo(
+            id=id_getter(data),
+            label=label_getter(data),
+            properties={key_getter(data): value_getter(data) for key_getter, value_getter in property_getters},
+        )
+    source_getter = definition._create_value_getter(definition._source_expr, context)  # noqa: SLF001
+    target_getter = definition._create_value_getter(definition._target_expr, context)  # noqa: SLF001
+    return lambda data: EdgeInfo(
+        id=id_getter(data),
+        source_id=source_getter(data),
+        target_id=target_getter(data),
+        label=label_getter(data),
+        properties={key_getter(data): value_getter(data) for key_getter, value_getter in property_getters},
+    )
+
+
+def measure(
+    converters: Sequence[Callable[[DataView], object]],
+    views: Sequence[DataView],
+    repeat: int,
+) -> list[float]:
+    """Convert all views with each converter and return the best times per row.
+
+    Converters are run in turns so that they are equally affected by changes
+    of the load of the machine. Times are in nanoseconds.
+    """
+    best = [float("inf")] * len(converters)
+    for _ in range(repeat):
+        for index, convert in enumerate(converters):
+            start = time.perf_counter()
+            for view in views:
+                convert(view)
+            best[index] = min(best[index], time.perf_counter() - start)
+    return [elapsed / len(views) * 1e9 for elapsed in best]
+
+
+def count_calls(convert: Callable[[DataView], object], views: Sequence[DataView]) -> float:
+    """Convert all views and return the number of function calls per row.
+
+    Unlike times, the number of calls is not affected by the load of the
+    machine.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    for view in views:
+        convert(view)
+    profile.disable()
+    return pstats.Stats(profile).total_calls / len(views)  # type: ignore[attr-defined]
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        location = Path(directory)
+        write_synthetic_evidence_europepmc(location, args.rows)
+        write_synthetic_expression(location, args.rows // 10)
+        print(  # noqa: T201
+            f"{'definition':<64}{'ns/row before':>16}{'ns/row after':>16}"
+            f"{'calls/row before':>20}{'calls/row after':>20}",
+        )
+        with AcquisitionContext(
+            node_definitions=[],
+            edge_definitions=[],
+            datasets_location=location,
+            expression_cache_size=None,
+        ) as context:
+            for name, definition in DEFINITIONS.items():
+                if not isinstance(
+                    definition,
+                    ExpressionNodeAcquisitionDefinition | ExpressionEdgeAcquisitionDefinition,
+                ):
+                    continue
+                fields = definition._get_required_fields(context)  # noqa: SLF001
+                # Values are copied into dictionaries so that reading them
+                # costs the same for both converters.
+                views: list[DataView] = [
+                    {field: view[field] for field in fields}
+                    for view in context.get_scan_result_stream(definition.scan_operation, fields)
+                ]
+                converters = [
+                    create_per_expression_converter(definition, context),
+                    definition._create_converter(context),  # noqa: SLF001
+                ]
+                before, after = measure(converters, views, args.repeat)
+                calls_before, calls_after = (count_calls(convert, views) for convert in converters)
+                print(  # noqa: T201
+                    f"{name:<64}{before:>16,.0f}{after:>16,.0f}{calls_before:>20,.1f}{calls_after:>20,.1f}",
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark of exploding scans done by duckdb or in Python.
+
+The Python explosion is the previous implementation of exploding scans which
+fetches the whole sequence of each row and explodes it into data views.
+
+Run from the repository root:
+
+    python -m benchmark.explode --rows 100000
+"""
+
+import argparse
+import tempfile
+import time
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any, cast
+
+from benchmark._synthetic import write_synthetic_expression
+from open_targets.adapter.context import TOP_FIELD_PATH_INDEX, AcquisitionContext
+from open_targets.adapter.data_view import DataView, DataViewProtocol, SequenceBackedDataView
+from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.data.metadata.model import OpenTargetsDatasetFieldType
+from open_targets.data.schema_base import Field
+from open_targets.definition.reference_kg.edge import edge_target_expressed_in_biosample
+
+
+class PythonExplodingAcquisitionContext(AcquisitionContext):
+    """Acquisition context exploding sequences in Python."""
+
+    def _get_exploded_scan_result_stream(
+        self,
+        scan_operation: ExplodingScanOperation,
+        requested_fields: Sequence[type[Field]],
+    ) -> Iterable[DataView]:
+        dataset = scan_operation.dataset
+        exploded_field = scan_operation.exploded_field
+        required_fields = [exploded_field, *requested_fields]
+        top_fields = list({cast("type[Field]", field.path[TOP_FIELD_PATH_INDEX]) for field in required_fields})
+        nested_fields = [field for field in required_fields if field not in top_fields]
+        field_index_map = {field: index for index, field in enumerate([*top_fields, exploded_field.element])}
+        field_path_map: dict[type[Field], int | Sequence[type[Field]]] = {}
+        field_path_map.update(field_index_map)
+        field_path_map.update(
+            {
+                field: cast("Sequence[type[Field]]", field.path[TOP_FIELD_PATH_INDEX:])
+                for field in nested_fields
+                if len(field.path) <= len(exploded_field.path)
+            },
+        )
+        field_path_map.update(
+            {
+                field: cast("Sequence[type[Field]]", field.path[len(exploded_field.path) :])
+                for field in nested_fields
+                if len(field.path) > len(exploded_field.element.path)
+            },
+        )
+        is_container = exploded_field.element.data_type in (
+            OpenTargetsDatasetFieldType.ARRAY,
+            OpenTargetsDatasetFieldType.STRUCT,
+        )
+        query = self._build_query(dataset, scan_operation.predicate, top_fields)
+        for data in self._get_query_result_stream(query):
+            view = SequenceBackedDataView(field_path_map, data, required_fields)
+            sequence_data = cast("Sequence[Any] | None", view[exploded_field])
+            if sequence_data is None:
+                yield SequenceBackedDataView(field_path_map, [*data, None], requested_fields)
+            else:
+                for item in sequence_data:
+                    raw = cast("DataViewProtocol", item).raw_data if is_container else item
+                    yield SequenceBackedDataView(field_path_map, [*data, raw], requested_fields)
+
+
+def measure(context: AcquisitionContext) -> tuple[int, float]:
+    """Acquire all edges and return the number of edges and edges per second."""
+    start = time.perf_counter()
+    count = sum(1 for _ in context.get_acquisition_generator(edge_target_expressed_in_biosample))
+    elapsed = time.perf_counter() - start
+    return count, count / elapsed
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        location = Path(directory)
+        write_synthetic_expression(location, args.rows)
+        print(f"{'mode':<24}{'edges':>12}{'edges/sec':>16}")  # noqa: T201
+        for mode, context_class in [
+            ("python explode", PythonExplodingAcquisitionContext),
+            ("duckdb unnest", AcquisitionContext),
+        ]:
+            with context_class(
+                node_definitions=[],
+                edge_definitions=[edge_target_expressed_in_biosample],
+                datasets_location=location,
+            ) as context:
+                count, rate = measure(context)
+            print(f"{mode:<24}{count:>12}{rate:>16,.0f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
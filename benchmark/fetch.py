@@ -0,0 +1,68 @@
+"""Benchmark of fetching query results from duckdb row by row or in batches.
+
+Run from the repository root:
+
+    python -m benchmark.fetch --rows 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+from benchmark._synthetic import write_synthetic_evidence_europepmc
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.scan_operation import RowScanOperation
+from open_targets.data.schema import (
+    DatasetEvidenceEuropepmc,
+    FieldEvidenceEuropepmcDiseaseId,
+    FieldEvidenceEuropepmcId,
+    FieldEvidenceEuropepmcScore,
+    FieldEvidenceEuropepmcTargetId,
+)
+
+FIELDS = [
+    FieldEvidenceEuropepmcId,
+    FieldEvidenceEuropepmcDiseaseId,
+    FieldEvidenceEuropepmcTargetId,
+    FieldEvidenceEuropepmcScore,
+]
+
+
+def measure(location: Path, fetch_batch_size: int | None) -> tuple[int, float]:
+    """Scan the dataset and return the number of rows and rows per second."""
+    with AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[],
+        datasets_location=location,
+        fetch_batch_size=fetch_batch_size,
+    ) as context:
+        start = time.perf_counter()
+        count = 0
+        for view in context.get_scan_result_stream(RowScanOperation(dataset=DatasetEvidenceEuropepmc), FIELDS):
+            view[FieldEvidenceEuropepmcId]
+            count += 1
+    elapsed = time.perf_counter() - start
+    return count, count / elapsed
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[256, 2048, 16384])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        location = Path(directory)
+        write_synthetic_evidence_europepmc(location, args.rows)
+        print(f"{'mode':<24}{'rows':>12}{'rows/sec':>16}")  # noqa: T201
+        for fetch_batch_size in [None, *args.batch_sizes]:
+            mode = "fetchone" if fetch_batch_size is None else f"fetchmany({fetch_batch_size})"
+            count, rate = measure(location, fetch_batch_size)
+            print(f"{mode:<24}{count:>12}{rate:>16,.0f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
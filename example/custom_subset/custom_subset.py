@@ -72,6 +72,8 @@ def main() -> None:
         biocypher_instance.write_edges(iterable)
 
     # Finalize
+    context.close()
+
     biocypher_instance.write_import_call()
     biocypher_instance.write_schema_info()
     biocypher_instance.summary()
@@ -4,7 +4,7 @@ import logging
 
 from biocypher import BioCypher
 
-from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.runner import ParallelAcquisitionRunner
 from open_targets.definition.reference_kg import reference_kg_definition
 
 
@@ -16,36 +16,31 @@ def main():
     logging.getLogger("biocypher").setLevel(logging.ERROR)
     biocypher_instance.show_ontology_structure()
 
-    context = AcquisitionContext(
+    runner = ParallelAcquisitionRunner(
         node_definitions=reference_kg_definition.node_definitions,
         edge_definitions=reference_kg_definition.edge_definitions,
         datasets_location="datasets",  # directory containing the downloaded datasets,
     )
 
     count = 1
-    # Stream nodes and edges to BioCypher
-    for node_definition in reference_kg_definition.node_definitions:
-        print(f"{count}: {node_definition.label}")  # noqa: T201
+    # Stream nodes and edges acquired by the worker processes to BioCypher
+    for outcome in runner.run():
+        print(f"{count}: {outcome.definition.label}")  # noqa: T201
         count += 1
-        try:
-            iterable = context.get_acquisition_generator(node_definition)
-            first = next(iterable)
-        except StopIteration:
+        if outcome.error is not None:
+            print(outcome.error)  # noqa: T201
             continue
-        else:
-            iterable = itertools.chain([first], iterable)
-        biocypher_instance.write_nodes(iterable)
-    for edge_definition in reference_kg_definition.edge_definitions:
-        print(f"{count}: {edge_definition.label}")  # noqa: T201
-        count += 1
+        iterable = iter(outcome.items)
         try:
-            iterable = context.get_acquisition_generator(edge_definition)
             first = next(iterable)
         except StopIteration:
             continue
         else:
             iterable = itertools.chain([first], iterable)
-        biocypher_instance.write_edges(iterable)
+        if outcome.definition in reference_kg_definition.node_definitions:
+            biocypher_instance.write_nodes(iterable)
+        else:
+            biocypher_instance.write_edges(iterable)
 
     biocypher_instance.write_import_call()
     biocypher_instance.write_schema_info()
@@ -1,21 +1,27 @@
 import uuid
-from collections.abc import Callable
-from typing import Any
+from collections.abc import Callable, Hashable, Mapping, Sequence
+from functools import partial
+from typing import Any, TypeVar
 
 import xxhash  # type: ignore[reportPrivateUsage]
-from bioregistry.constants import BIOREGISTRY_PATH
-from bioregistry.resource_manager import Manager
-from bioregistry.schema import Resource
-from bioregistry.schema_utils import _registry_from_path  # type: ignore[reportPrivateUsage]
 
+from open_targets.adapter._helper._curie import get_curie_lookup
+from open_targets.adapter._helper._expression import (
+    get_expression_key,
+    is_pure_expression,
+    recursive_get_dependent_fields,
+    replace_dependents,
+)
 from open_targets.adapter.data_view import DataView
 from open_targets.adapter.expression import (
     BuildCurieExpression,
     DataSourceToLicenceExpression,
+    DeterministicIdExpression,
     Expression,
     ExtractCuriePrefixExpression,
     ExtractSubstringExpression,
     FieldExpression,
+    HasDependentExpressionMixin,
     HashAlgorithm,
     LiteralExpression,
     NewUuidExpression,
@@ -26,25 +32,40 @@ from open_targets.adapter.expression import (
     ToStringExpression,
     TransformExpression,
 )
+from open_targets.adapter.expression_cache import ExpressionCache
 from open_targets.adapter.licence import get_datasource_license
 
 CURIE_SEPARATORS = [":", "_", "/"]
 
-# Unfortunately this seems to be the only way to add ad hoc resources without
-# making permanent changes to users' local registry.
-patched_register = dict(_registry_from_path(BIOREGISTRY_PATH))
-patched_register["otar"] = Resource(
-    prefix="otar",
-    synonyms=["OTAR"],
-    preferred_prefix="otar",
+_COSTLY_EXPRESSION_TYPES = (
+    BuildCurieExpression,
+    DataSourceToLicenceExpression,
+    ExtractCuriePrefixExpression,
+    NormaliseCurieExpression,
+    StringHashExpression,
+    TransformExpression,
 )
-bioregistry_manager = Manager(registry=patched_register)
+
+TValue = TypeVar("TValue")
 
 
 def recursive_build_expression_function(
     expression: Expression[Any],
+    cache: ExpressionCache | None = None,
+    shared_functions: Mapping[Hashable, Callable[[DataView], Any]] | None = None,
 ) -> Callable[[DataView], Any]:
-    """Build a function chain that evaluates the expression."""
+    """Build a function chain that evaluates the expression.
+
+    If a cache is provided, the values of the pure expressions costly to
+    evaluate, i.e. pure transforms, hashes, CURIE operations and licences, are
+    cached by their inputs. Cheap string operations are not worth caching.
+
+    Subtrees whose keys, see `get_expression_key`, are in the shared functions
+    are evaluated by them instead.
+    """
+    if shared_functions and (function := shared_functions.get(get_expression_key(expression))) is not None:
+        return function
+    build = partial(recursive_build_expression_function, cache=cache, shared_functions=shared_functions)
     match expression:
         case FieldExpression():
             return lambda data: data[expression.field]
@@ -53,44 +74,54 @@ def recursive_build_expression_function(
         case TransformExpression():
             if expression.expression is None:
                 return lambda _: expression.function(None)
-            func = recursive_build_expression_function(expression.expression)
-            return lambda data: expression.function(func(data))
+            func = build(expression.expression)
+            transform = _cache_function(expression.function, cache) if expression.pure else expression.function
+            return lambda data: transform(func(data))
         case NewUuidExpression():
             return lambda _: str(uuid.uuid4())
+        case DeterministicIdExpression():
+            return get_deterministic_id_generator(
+                expression.namespace,
+                [build(e) for e in expression.components],
+                None if expression.position is None else build(expression.position),
+            )
         case StringHashExpression():
-            func = recursive_build_expression_function(expression.expression)
+            func = build(expression.expression)
             if expression.algorithm == HashAlgorithm.xxh3:
-                return lambda data: xxhash.xxh3_64_hexdigest(func(data).encode("utf-8"))
+                hash_function = _cache_function(hash_xxh3, cache)
+                return lambda data: hash_function(func(data))
             msg = f"Unsupported hash algorithm: {expression.algorithm}"
             raise ValueError(msg)
         case ToStringExpression():
-            func = recursive_build_expression_function(expression.expression)
+            func = build(expression.expression)
             return lambda data: str(func(data))
         case StringConcatenationExpression():
-            funcs = [recursive_build_expression_function(e) for e in expression.expressions]
+            funcs = [build(e) for e in expression.expressions]
             return lambda data: "".join(func(data) for func in funcs)
         case StringLowerExpression():
-            func = recursive_build_expression_function(expression.expression)
+            func = build(expression.expression)
             return lambda data: func(data).lower()
         case BuildCurieExpression():
-            return get_curie_builder(expression)
+            return get_curie_builder(expression, cache, shared_functions)
         case ExtractCuriePrefixExpression():
-            func = recursive_build_expression_function(expression.expression)
-            return (
-                (lambda data: bioregistry_manager.normalize_prefix(extract_curie_prefix(func(data))))
-                if expression.normalise
-                else (lambda data: extract_curie_prefix(func(data)))
+            func = build(expression.expression)
+            extract = _cache_function(
+                extract_normalised_curie_prefix if expression.normalise else extract_curie_prefix,
+                cache,
             )
+            return lambda data: extract(func(data))
         case NormaliseCurieExpression():
-            func = recursive_build_expression_function(expression.expression)
-            return lambda data: normalise_curie(func(data))
+            func = build(expression.expression)
+            normalise = _cache_function(normalise_curie, cache)
+            return lambda data: normalise(func(data))
         case ExtractSubstringExpression():
-            func = recursive_build_expression_function(expression.expression)
-            separator_func = recursive_build_expression_function(expression.separator)
+            func = build(expression.expression)
+            separator_func = build(expression.separator)
             return lambda data: func(data).split(separator_func(data))[expression.index]
         case DataSourceToLicenceExpression():
-            func = recursive_build_expression_function(expression.datasource)
-            return lambda data: get_datasource_license(func(data))
+            func = build(expression.datasource)
+            get_licence = _cache_function(get_datasource_license, cache)
+            return lambda data: get_licence(func(data))
         case _:
             msg = f"Unsupported expression: {expression}"
             raise ValueError(msg)
@@ -98,28 +129,173 @@ def recursive_build_expression_function(
 
 def get_curie_builder(
     expression: BuildCurieExpression,
+    cache: ExpressionCache | None = None,
+    shared_functions: Mapping[Hashable, Callable[[DataView], Any]] | None = None,
 ) -> Callable[[DataView], str]:
-    prefix_func = recursive_build_expression_function(expression.prefix)
-    reference_func = recursive_build_expression_function(expression.reference)
-
-    def normalise_curie_builder(data: DataView) -> str:
-        prefix, reference = bioregistry_manager.normalize_parsed_curie(
-            prefix_func(data),
-            reference_func(data),
-        )
-        return f"{prefix}:{reference}"
-
-    return (
-        normalise_curie_builder
-        if expression.normalise
-        else (lambda data: f"{prefix_func(data)}:{reference_func(data)}")
+    prefix_func = recursive_build_expression_function(expression.prefix, cache, shared_functions)
+    reference_func = recursive_build_expression_function(expression.reference, cache, shared_functions)
+    build = _cache_function(partial(build_curie, normalise=expression.normalise), cache)
+    return lambda data: build(prefix_func(data), reference_func(data))
+
+
+def build_expressions_function(
+    expressions: Sequence[Expression[Any]],
+    cache: ExpressionCache | None = None,
+) -> Callable[[DataView], list[Any]]:
+    """Build a function that evaluates expressions together.
+
+    Constant subtrees are folded, see `fold_constants`, and expressions folded
+    into literals are not evaluated again. Costly pure subtrees occurring more
+    than once across the expressions are evaluated once per data view, see
+    `get_shared_subexpressions`.
+
+    Returns:
+        Callable[[DataView], list[Any]]: The function returning the values of
+        the expressions in order.
+    """
+    expressions = [fold_constants(expression) for expression in expressions]
+    shared_expressions = get_shared_subexpressions(expressions)
+    shared_values: list[Any] = [None] * len(shared_expressions)
+    shared_functions: dict[Hashable, Callable[[DataView], Any]] = {}
+    shared_value_functions: list[tuple[int, Callable[[DataView], Any]]] = []
+    # Shared subtrees come after the shared subtrees they contain, so that the
+    # values of the latter are already computed when evaluating the former.
+    for index, (key, expression) in enumerate(shared_expressions.items()):
+        shared_value_functions.append((index, recursive_build_expression_function(expression, cache, shared_functions)))
+        shared_functions[key] = lambda _, index=index: shared_values[index]
+    evaluate_values = _get_values_evaluator(
+        [expression.value if isinstance(expression, LiteralExpression) else None for expression in expressions],
+        [
+            (index, recursive_build_expression_function(expression, cache, shared_functions))
+            for index, expression in enumerate(expressions)
+            if not isinstance(expression, LiteralExpression)
+        ],
     )
+    if not shared_value_functions:
+        return evaluate_values
+
+    def evaluate(data: DataView) -> list[Any]:
+        for index, function in shared_value_functions:
+            shared_values[index] = function(data)
+        return evaluate_values(data)
+
+    return evaluate
+
+
+def _get_values_evaluator(
+    constant_values: list[Any],
+    value_functions: Sequence[tuple[int, Callable[[DataView], Any]]],
+) -> Callable[[DataView], list[Any]]:
+    """Get the function evaluating the values of expressions in order.
+
+    The values of the expressions folded into literals are the constants, the
+    others being computed by their functions, given by the index of their
+    expressions.
+    """
+    if len(value_functions) == len(constant_values):
+        functions = [function for _, function in value_functions]
+        return lambda data: [function(data) for function in functions]
+
+    def evaluate(data: DataView) -> list[Any]:
+        values = constant_values.copy()
+        for index, function in value_functions:
+            values[index] = function(data)
+        return values
+
+    return evaluate
+
+
+def fold_constants(expression: Expression[Any]) -> Expression[Any]:
+    """Replace the pure subtrees not depending on any field by their values.
+
+    Subtrees failing to evaluate are kept so that they fail when evaluated.
+    """
+    if isinstance(expression, FieldExpression | LiteralExpression):
+        return expression
+    expression = replace_dependents(expression, fold_constants)
+    if recursive_get_dependent_fields(expression) or not is_pure_expression(expression):
+        return expression
+    try:
+        return LiteralExpression(recursive_build_expression_function(expression)({}))
+    except Exception:  # noqa: BLE001
+        return expression
+
+
+def get_shared_subexpressions(expressions: Sequence[Expression[Any]]) -> dict[Hashable, Expression[Any]]:
+    """Get the costly pure subtrees occurring more than once across expressions.
+
+    Subtrees are costly if they contain a transform, a hash, a CURIE operation
+    or a licence, as in `recursive_build_expression_function`. Others, such as
+    fields and string operations over them, are cheaper to evaluate again than
+    to read back from the shared values. Occurrences within an occurrence of a
+    shared subtree are not counted as the shared subtree is evaluated once.
+    Subtrees are keyed by `get_expression_key` and ordered after the subtrees
+    they contain.
+    """
+    counts: dict[Hashable, int] = {}
+    subexpressions: dict[Hashable, Expression[Any]] = {}
+
+    def visit(expression: Expression[Any]) -> None:
+        key = get_expression_key(expression)
+        if key in counts:
+            counts[key] += 1
+            return
+        counts[key] = 1
+        if isinstance(expression, HasDependentExpressionMixin):
+            for child in expression.dependents:
+                visit(child)
+        subexpressions[key] = expression
+
+    for expression in expressions:
+        visit(expression)
+    return {
+        key: expression
+        for key, expression in subexpressions.items()
+        if counts[key] > 1 and _is_costly_expression(expression) and is_pure_expression(expression)
+    }
+
+
+def build_curie(prefix: object, reference: object, *, normalise: bool) -> str:
+    if normalise:
+        prefix, reference = get_curie_lookup().normalise_parsed_curie(prefix, reference)  # type: ignore[arg-type]
+    return f"{prefix}:{reference}"
+
+
+def hash_xxh3(string: str) -> str:
+    return xxhash.xxh3_64_hexdigest(string.encode("utf-8"))
+
+
+def get_deterministic_id_generator(
+    namespace: str,
+    funcs: Sequence[Callable[[DataView], Any]],
+    position_func: Callable[[DataView], Any] | None,
+) -> Callable[[DataView], str]:
+    # Only the last position is kept, the items of a position being consecutive.
+    last_position: object = None
+    ordinal = -1
+
+    def generate(data: DataView) -> str:
+        nonlocal last_position, ordinal
+        position = None if position_func is None else position_func(data)
+        if position == last_position:
+            ordinal += 1
+        else:
+            last_position, ordinal = position, 0
+        return generate_deterministic_id(namespace, [func(data) for func in funcs], position, ordinal)
+
+    return generate
+
+
+def generate_deterministic_id(namespace: str, values: Sequence[object], position: object, ordinal: int) -> str:
+    # The unit separator could hardly be part of any value.
+    string = "\x1f".join([namespace, *(str(value) for value in values), str(position), str(ordinal)])
+    return xxhash.xxh3_128_hexdigest(string.encode())
 
 
 def normalise_curie(string: str) -> str:
     for sep in CURIE_SEPARATORS:
         if sep in string:
-            result = bioregistry_manager.normalize_curie(string, sep=sep)
+            result = get_curie_lookup().normalise_curie(string, sep)
             if result is not None:
                 return result
             msg = f"Failed to normalize curie: {string} with separator: {sep}"
@@ -128,9 +304,25 @@ def normalise_curie(string: str) -> str:
     raise ValueError(msg)
 
 
+def extract_normalised_curie_prefix(string: str) -> str | None:
+    return get_curie_lookup().normalise_prefix(extract_curie_prefix(string))
+
+
 def extract_curie_prefix(string: str) -> str:
     for sep in CURIE_SEPARATORS:
         if sep in string:
             return string.split(sep)[0]
     msg = f"Failed to extract curie prefix from: {string}"
     raise ValueError(msg)
+
+
+def _cache_function(function: Callable[..., TValue], cache: ExpressionCache | None) -> Callable[..., TValue]:
+    return function if cache is None else cache.wrap(function)
+
+
+def _is_costly_expression(expression: Expression[Any]) -> bool:
+    if isinstance(expression, _COSTLY_EXPRESSION_TYPES):
+        return True
+    return isinstance(expression, HasDependentExpressionMixin) and any(
+        _is_costly_expression(child) for child in expression.dependents
+    )
@@ -0,0 +1,205 @@
+"""Compiled lookup normalising CURIEs the way the bioregistry does.
+
+Normalising a CURIE only needs the canonical prefix of each synonym and the
+redundant prefixes, or bananas, stripped from identifiers. The lookup holds
+them for the bioregistry and the resources added by the adapter. It is built
+once per version of the bioregistry and cached on disk, so that processes read
+a small file instead of importing and validating the whole registry.
+"""
+
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+from contextlib import suppress
+from dataclasses import dataclass, field
+from functools import cache
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Final
+
+CURIE_LOOKUP_FORMAT_VERSION: Final = 1
+CACHE_DIRECTORY_ENVIRONMENT_VARIABLE: Final = "OPEN_TARGETS_CACHE_DIRECTORY"
+
+_DEFAULT_BANANA_PEEL: Final = ":"
+
+
+@dataclass(frozen=True)
+class CurieLookup:
+    """Lookup normalising prefixes and identifiers of CURIEs.
+
+    Attributes:
+        synonyms: The canonical prefix of each synonym, keyed by the synonym
+            normalised by `normalise_synonym`.
+        bananas: The banana and the delimiter following it of the prefixes
+            having one.
+    """
+
+    synonyms: Mapping[str, str]
+    bananas: Mapping[str, tuple[str, str]]
+    _identifier_prefixes: dict[str, list[tuple[str, int]]] = field(
+        default_factory=dict[str, list[tuple[str, int]]],
+        init=False,
+        repr=False,
+        compare=False,
+    )
+
+    def normalise_prefix(self, prefix: str) -> str | None:
+        """Get the canonical prefix of a prefix, or None if not registered."""
+        return self.synonyms.get(normalise_synonym(prefix))
+
+    def standardise_identifier(self, prefix: str, identifier: str) -> str:
+        """Remove the redundant prefix from an identifier.
+
+        Args:
+            prefix (str): The canonical prefix of the identifier.
+            identifier (str): The identifier.
+        """
+        folded_identifier = identifier.casefold()
+        for identifier_prefix, length in self._get_identifier_prefixes(prefix):
+            if folded_identifier.startswith(identifier_prefix):
+                return identifier[length:]
+        return identifier
+
+    def normalise_parsed_curie(self, prefix: str, identifier: str) -> tuple[str, str] | tuple[None, None]:
+        """Normalise the prefix and identifier of a CURIE.
+
+        Returns:
+            tuple[str, str] | tuple[None, None]: The normalised prefix and
+                identifier, or a pair of None if the prefix is not registered.
+        """
+        norm_prefix = self.normalise_prefix(prefix)
+        if not norm_prefix:
+            return None, None
+        return norm_prefix, self.standardise_identifier(norm_prefix, identifier)
+
+    def normalise_curie(self, curie: str, separator: str = ":") -> str | None:
+        """Normalise a CURIE, or return None if it could not be normalised."""
+        prefix, delimiter, identifier = curie.partition(separator)
+        if not delimiter:
+            return None
+        norm_prefix, norm_identifier = self.normalise_parsed_curie(prefix, identifier)
+        if norm_prefix is None:
+            return None
+        return f"{norm_prefix}:{norm_identifier}"
+
+    def _get_identifier_prefixes(self, prefix: str) -> list[tuple[str, int]]:
+        """Get the casefolded redundant prefixes of identifiers, in order.
+
+        Each of them comes with the length of the redundant prefix in the
+        original identifier.
+        """
+        identifier_prefixes = self._identifier_prefixes.get(prefix)
+        if identifier_prefixes is None:
+            banana, banana_peel = self.bananas.get(prefix, (None, _DEFAULT_BANANA_PEEL))
+            identifier_prefixes = []
+            for peel in (banana_peel, "_"):
+                if banana:
+                    folded_banana = f"{banana}{peel}".casefold()
+                    identifier_prefixes.append((folded_banana, len(folded_banana)))
+                identifier_prefixes.append((f"{prefix.casefold()}{peel}", len(prefix) + len(peel)))
+            self._identifier_prefixes[prefix] = identifier_prefixes
+        return identifier_prefixes
+
+
+def normalise_synonym(synonym: str) -> str:
+    """Normalise a synonym of a prefix for lookup, as the bioregistry does."""
+    normalised = synonym.casefold().lower()
+    for character in " -_./":
+        normalised = normalised.replace(character, "")
+    return normalised
+
+
+@cache
+def get_curie_lookup() -> CurieLookup:
+    """Get the CURIE lookup of the installed bioregistry.
+
+    The lookup is loaded once per process from the cache directory, see
+    `load_curie_lookup`.
+    """
+    return load_curie_lookup(get_cache_directory())
+
+
+def get_cache_directory() -> Path:
+    """Get the directory where artifacts built by the adapter are cached.
+
+    It could be set by the `OPEN_TARGETS_CACHE_DIRECTORY` environment variable
+    and defaults to `open_targets` in the user cache directory.
+    """
+    if directory := os.environ.get(CACHE_DIRECTORY_ENVIRONMENT_VARIABLE):
+        return Path(directory)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "open_targets"
+
+
+def load_curie_lookup(cache_directory: Path) -> CurieLookup:
+    """Load the CURIE lookup cached in a directory.
+
+    The lookup is built and cached if it is missing or unreadable. Failing to
+    cache it is not an error as the lookup is then built again next time.
+
+    Args:
+        cache_directory (Path): The directory of the cached lookup.
+    """
+    path = cache_directory / _get_curie_lookup_file_name()
+    with suppress(OSError, ValueError, KeyError, TypeError):
+        return _read_curie_lookup(path)
+    lookup = build_curie_lookup()
+    with suppress(OSError):
+        _write_curie_lookup(path, lookup)
+    return lookup
+
+
+def build_curie_lookup() -> CurieLookup:
+    """Build the CURIE lookup from the installed bioregistry."""
+    # The bioregistry is imported here as importing it loads the registry.
+    from bioregistry.constants import BIOREGISTRY_PATH  # noqa: PLC0415
+    from bioregistry.resource_manager import _synonym_to_canonical  # type: ignore[reportPrivateUsage] # noqa: PLC0415
+    from bioregistry.schema import Resource  # noqa: PLC0415
+    from bioregistry.schema_utils import _registry_from_path  # type: ignore[reportPrivateUsage] # noqa: PLC0415
+
+    # Unfortunately this seems to be the only way to add ad hoc resources
+    # without making permanent changes to users' local registry.
+    registry = dict(_registry_from_path(BIOREGISTRY_PATH))
+    registry["otar"] = Resource(
+        prefix="otar",
+        synonyms=["OTAR"],
+        preferred_prefix="otar",
+    )
+    bananas: dict[str, tuple[str, str]] = {}
+    for prefix, resource in registry.items():
+        banana = resource.get_banana()
+        banana_peel = resource.get_banana_peel()
+        if banana or banana_peel != _DEFAULT_BANANA_PEEL:
+            bananas[prefix] = (banana or "", banana_peel)
+    return CurieLookup(synonyms=dict(_synonym_to_canonical(registry)), bananas=bananas)
+
+
+def _get_curie_lookup_file_name() -> str:
+    return f"curie-lookup-{CURIE_LOOKUP_FORMAT_VERSION}-bioregistry-{version('bioregistry')}.json"
+
+
+def _read_curie_lookup(path: Path) -> CurieLookup:
+    with path.open(encoding="utf-8") as file:
+        content: dict[str, Any] = json.load(file)
+    if content["format_version"] != CURIE_LOOKUP_FORMAT_VERSION:
+        msg = f"Unsupported CURIE lookup format version: {content['format_version']}"
+        raise ValueError(msg)
+    return CurieLookup(
+        synonyms=content["synonyms"],
+        bananas={prefix: (banana, banana_peel) for prefix, (banana, banana_peel) in content["bananas"].items()},
+    )
+
+
+def _write_curie_lookup(path: Path, lookup: CurieLookup) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    content = {
+        "format_version": CURIE_LOOKUP_FORMAT_VERSION,
+        "synonyms": lookup.synonyms,
+        "bananas": lookup.bananas,
+    }
+    # Written to a temporary file first so that concurrent processes never
+    # read a partially written lookup.
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False) as file:
+        json.dump(content, file)
+    Path(file.name).replace(path)
@@ -0,0 +1,76 @@
+"""Python functions registered on duckdb connections to compute expressions.
+
+The functions are vectorised over Arrow arrays and evaluate each distinct
+combination of arguments of a batch once, using the same functions as the
+evaluation of expressions in Python. A value failing to be computed is null.
+"""
+
+from collections.abc import Callable
+from functools import partial
+from inspect import Parameter, Signature
+from typing import Any, Final
+
+import pyarrow as pa
+from duckdb import DuckDBPyConnection
+from duckdb.sqltypes import VARCHAR
+
+from open_targets.adapter._helper._acquisition_definition import (
+    build_curie,
+    extract_curie_prefix,
+    hash_xxh3,
+    normalise_curie,
+)
+
+XXH3_FUNCTION_NAME = "__xxh3"
+NORMALISE_CURIE_FUNCTION_NAME = "__normalise_curie"
+BUILD_NORMALISED_CURIE_FUNCTION_NAME = "__build_normalised_curie"
+EXTRACT_CURIE_PREFIX_FUNCTION_NAME = "__extract_curie_prefix"
+
+_FUNCTIONS: Final[list[tuple[str, Callable[..., str], int]]] = [
+    (XXH3_FUNCTION_NAME, hash_xxh3, 1),
+    (NORMALISE_CURIE_FUNCTION_NAME, normalise_curie, 1),
+    (BUILD_NORMALISED_CURIE_FUNCTION_NAME, partial(build_curie, normalise=True), 2),
+    (EXTRACT_CURIE_PREFIX_FUNCTION_NAME, extract_curie_prefix, 1),
+]
+
+
+def register_functions(connection: DuckDBPyConnection) -> None:
+    """Register the functions on a duckdb connection.
+
+    Nulls are passed to the functions as None, as in Python.
+    """
+    for name, function, num_parameters in _FUNCTIONS:
+        connection.create_function(
+            name,
+            _create_batch_function(function, num_parameters),
+            [VARCHAR] * num_parameters,
+            VARCHAR,
+            type="arrow",
+            null_handling="special",
+            side_effects=False,
+        )
+
+
+def _create_batch_function(function: Callable[..., str], num_parameters: int) -> Callable[..., pa.Array]:
+    def evaluate_batch(*arrays: pa.ChunkedArray) -> pa.Array:
+        results: dict[tuple[Any, ...], str | None] = {}
+        values: list[str | None] = []
+        for arguments in zip(*(array.to_pylist() for array in arrays), strict=True):
+            if arguments not in results:
+                results[arguments] = _evaluate(function, arguments)
+            values.append(results[arguments])
+        return pa.array(values, type=pa.string())
+
+    # duckdb checks the number of parameters of the function against the
+    # number of types of the parameters.
+    evaluate_batch.__signature__ = Signature(  # type: ignore[attr-defined]
+        [Parameter(f"argument_{index}", Parameter.POSITIONAL_ONLY) for index in range(num_parameters)],
+    )
+    return evaluate_batch
+
+
+def _evaluate(function: Callable[..., str], arguments: tuple[Any, ...]) -> str | None:
+    try:
+        return function(*arguments)
+    except Exception:  # noqa: BLE001
+        return None
@@ -1,10 +1,15 @@
+from collections.abc import Callable, Hashable
+from dataclasses import fields, replace
 from typing import Any, TypeAlias
 
 from open_targets.adapter.expression import (
+    DeterministicIdExpression,
     Expression,
     FieldExpression,
     HasDependentExpressionMixin,
     LiteralExpression,
+    NewUuidExpression,
+    TransformExpression,
 )
 from open_targets.data.schema_base import Field
 
@@ -34,3 +39,47 @@ def recursive_get_dependent_fields(
         for child in expression.dependents:
             dataset_fields.update(recursive_get_dependent_fields(child))
     return dataset_fields
+
+
+def replace_dependents(
+    expression: Expression[Any],
+    function: Callable[[Expression[Any]], Expression[Any]],
+) -> Expression[Any]:
+    """Replace the dependent expressions of an expression by mapping a function.
+
+    The expression is returned as is if it has no dependent expressions.
+    """
+    changes: dict[str, Any] = {}
+    for attribute in fields(expression):
+        value = getattr(expression, attribute.name)
+        if isinstance(value, Expression):
+            changes[attribute.name] = function(value)
+        elif isinstance(value, list | tuple) and all(isinstance(item, Expression) for item in value):
+            changes[attribute.name] = [function(item) for item in value]
+    return replace(expression, **changes) if changes else expression
+
+
+def get_expression_key(value: object) -> Hashable:
+    """Get a hashable key of an expression, equal for equal expressions."""
+    if isinstance(value, Expression):
+        return (type(value), *(get_expression_key(getattr(value, attribute.name)) for attribute in fields(value)))
+    if isinstance(value, list | tuple):
+        return tuple(get_expression_key(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        # Unhashable values are only equal to themselves.
+        return (type(value), id(value))
+    # Equal values of different types, such as 1 and True, are told apart.
+    return (type(value), value)
+
+
+def is_pure_expression(expression: Expression[Any]) -> bool:
+    """Check if an expression always evaluates to the same value for a row."""
+    if isinstance(expression, NewUuidExpression | DeterministicIdExpression):
+        return False
+    if isinstance(expression, TransformExpression) and not expression.pure:
+        return False
+    if isinstance(expression, HasDependentExpressionMixin):
+        return all(is_pure_expression(child) for child in expression.dependents)
+    return True
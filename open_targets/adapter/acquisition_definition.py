@@ -7,22 +7,32 @@ import logging
 from abc import ABC, abstractmethod
 from collections.abc import Callable, Iterable, Sequence
 from dataclasses import dataclass
-from typing import Any, Generic, TypeAlias, TypeVar
+from itertools import islice
+from typing import Any, Generic, TypeAlias, TypeVar, cast
 
 from typing_extensions import override
 
-from open_targets.adapter._helper._acquisition_definition import recursive_build_expression_function
+from open_targets.adapter._helper._acquisition_definition import (
+    build_expressions_function,
+    fold_constants,
+    recursive_build_expression_function,
+)
 from open_targets.adapter._helper._expression import recursive_get_dependent_fields, to_expression
 from open_targets.adapter.context_protocol import AcquisitionContextProtocol
 from open_targets.adapter.data_view import DataView
 from open_targets.adapter.expression import (
     Expression,
+    LiteralExpression,
+    NewUuidExpression,
 )
-from open_targets.adapter.output import EdgeInfo, NodeInfo
-from open_targets.adapter.scan_operation import ExplodingScanOperation, ScanOperation
+from open_targets.adapter.expression_cache import ExpressionCache
+from open_targets.adapter.output import EdgeBatch, EdgeInfo, NodeBatch, NodeInfo
+from open_targets.adapter.scan_operation import ScanOperation
 from open_targets.data.schema import Field
 from open_targets.data.schema_base import Dataset
 
+logger = logging.getLogger(__name__)
+
 Source: TypeAlias = int | float | str | type[Field] | Expression[Any]
 TAcquisitionOutput = TypeVar("TAcquisitionOutput")
 
@@ -105,28 +115,181 @@ class _ExpressionAcquisitionDefinition(
     def _all_expressions(self) -> Sequence[Expression[Any]]:
         """All expressions that are included in this definition."""
 
+    @property
+    @abstractmethod
+    def _property_exprs(self) -> Sequence[tuple[Expression[str], Expression[Any]]]:
+        """The expressions of the keys and values of the properties."""
+
+    @abstractmethod
+    def _get_attribute_expressions(self, context: AcquisitionContextProtocol) -> list[Expression[Any]]:
+        """Get the expressions of the attributes of the output but properties.
+
+        They are in the order of the fields of the output, the expression of
+        the id being the one chosen by `_get_id_expression`.
+        """
+
     @override
     def _get_scan_operation(self) -> ScanOperation:
         """Return the provided scan operation."""
         return self.scan_operation
 
     @override
-    def _get_required_fields(self) -> Sequence[type[Field]]:
-        """Get all fields that are required by all the expressions."""
+    def acquire(self, context: AcquisitionContextProtocol) -> Iterable[TAcquisitionOutput]:
+        """Create the scanning result stream of the compiled expressions."""
+        return self._acquire_from_scanning(context, self._get_scan_result_stream(context))
+
+    def _get_scan_result_stream(self, context: AcquisitionContextProtocol) -> Iterable[DataView]:
+        return context.get_scan_result_stream(
+            self._get_scan_operation(),
+            self._get_required_fields(context),
+        )
+
+    @override
+    def _get_required_fields(self, context: AcquisitionContextProtocol | None = None) -> Sequence[type[Field]]:
+        """Get all fields that are required by all the expressions.
+
+        If a context is provided, the fields are those required by the
+        expressions compiled by the context, with the id chosen by
+        `_get_id_expression`.
+        """
+        expressions = (
+            self._all_expressions
+            if context is None
+            else [
+                *self._get_attribute_expressions(context),
+                *[key_expr for key_expr, _ in self._property_exprs],
+                *[value_expr for _, value_expr in self._property_exprs],
+            ]
+        )
         fields = set[type[Field]]()
-        for expression in self._all_expressions:
-            fields.update(recursive_get_dependent_fields(expression))
-        if isinstance(self.scan_operation, ExplodingScanOperation):
-            fields.add(self.scan_operation.exploded_field)
+        for expression in expressions:
+            fields.update(recursive_get_dependent_fields(self._compile_expression(expression, context)))
         return list(fields)
 
+    @abstractmethod
+    def _create_converter(
+        self,
+        context: AcquisitionContextProtocol,
+    ) -> Callable[[DataView], TAcquisitionOutput]:
+        """Build the function that converts a scanned item into the output.
+
+        The converter allows a context to drive the conversion row by row, for
+        instance when a single scan is shared by multiple definitions.
+        """
+
     def _create_value_getter(
         self,
         expression: Expression[Any],
+        context: AcquisitionContextProtocol | None = None,
+        cache: ExpressionCache | None = None,
     ) -> Callable[[DataView], Any]:
-        func = recursive_build_expression_function(expression)
+        func = recursive_build_expression_function(self._compile_expression(expression, context), cache)
         return lambda data: func(data)
 
+    def _create_row_evaluator(
+        self,
+        expressions: Sequence[Expression[Any]],
+        property_exprs: Sequence[tuple[Expression[str], Expression[Any]]],
+        context: AcquisitionContextProtocol,
+    ) -> tuple[Callable[[DataView], list[Any]], tuple[str, ...] | None]:
+        """Build the function computing the values and properties of an item.
+
+        All the expressions are evaluated together, see
+        `build_expressions_function`. The function returns the values of the
+        expressions followed by the keys and the values of the properties.
+        Property keys are usually literals, in which case they are computed
+        once and returned alongside the function rather than by it.
+        """
+        cache = context.create_expression_cache(self)
+        compiled_expressions = [self._compile_expression(expression, context) for expression in expressions]
+        key_exprs = [fold_constants(self._compile_expression(key_expr, context)) for key_expr, _ in property_exprs]
+        value_exprs = [self._compile_expression(value_expr, context) for _, value_expr in property_exprs]
+        if all(isinstance(key_expr, LiteralExpression) for key_expr in key_exprs):
+            keys = tuple(cast("LiteralExpression[str]", key_expr).value for key_expr in key_exprs)
+            return build_expressions_function([*compiled_expressions, *value_exprs], cache), keys
+        return build_expressions_function([*compiled_expressions, *key_exprs, *value_exprs], cache), None
+
+    def _create_values_getter(
+        self,
+        expressions: Sequence[Expression[Any]],
+        property_exprs: Sequence[tuple[Expression[str], Expression[Any]]],
+        context: AcquisitionContextProtocol,
+    ) -> Callable[[DataView], tuple[list[Any], dict[str, Any]]]:
+        """Build the function computing the values and properties of an item.
+
+        See `_create_row_evaluator`.
+        """
+        evaluate, keys = self._create_row_evaluator(expressions, property_exprs, context)
+        num_values = len(expressions)
+        if keys is not None:
+            literal_keys = keys
+
+            def get_values(data: DataView) -> tuple[list[Any], dict[str, Any]]:
+                values = evaluate(data)
+                return values, dict(zip(literal_keys, islice(values, num_values, None), strict=True))
+
+            return get_values
+
+        return _create_values_and_keys_getter(evaluate, num_values, len(property_exprs))
+
+    def _create_batch_values_getter(
+        self,
+        expressions: Sequence[Expression[Any]],
+        property_exprs: Sequence[tuple[Expression[str], Expression[Any]]],
+        context: AcquisitionContextProtocol,
+    ) -> Callable[[DataView], tuple[list[Any], tuple[str, ...], tuple[Any, ...]]]:
+        """Build the function computing the values of an item of a batch.
+
+        The function returns the values of the expressions, the keys of the
+        properties and the values of the properties. Literal keys are returned
+        as the same tuple for all items. See `_create_row_evaluator`.
+        """
+        evaluate, keys = self._create_row_evaluator(expressions, property_exprs, context)
+        num_values = len(expressions)
+        if keys is not None:
+            literal_keys = keys
+
+            def get_values(data: DataView) -> tuple[list[Any], tuple[str, ...], tuple[Any, ...]]:
+                values = evaluate(data)
+                return values, literal_keys, tuple(values[num_values:])
+
+            return get_values
+
+        num_keys = len(property_exprs)
+
+        def get_values_and_keys(data: DataView) -> tuple[list[Any], tuple[str, ...], tuple[Any, ...]]:
+            values = evaluate(data)
+            return (
+                values,
+                tuple(values[num_values : num_values + num_keys]),
+                tuple(values[num_values + num_keys :]),
+            )
+
+        return get_values_and_keys
+
+    def _get_id_expression(
+        self,
+        primary_id_expr: Expression[str],
+        components: Sequence[Expression[Any]],
+        context: AcquisitionContextProtocol,
+    ) -> Expression[str]:
+        """Get the expression of the ids, deterministic if the context says so.
+
+        See `AcquisitionContextProtocol.create_deterministic_id_expression`.
+        """
+        if isinstance(primary_id_expr, NewUuidExpression):
+            return context.create_deterministic_id_expression(self.scan_operation, components) or primary_id_expr
+        return primary_id_expr
+
+    def _compile_expression(
+        self,
+        expression: Expression[Any],
+        context: AcquisitionContextProtocol | None,
+    ) -> Expression[Any]:
+        if context is None:
+            return expression
+        return context.compile_expression(self.scan_operation, expression)
+
 
 @dataclass(frozen=True)
 class ExpressionNodeAcquisitionDefinition(_ExpressionAcquisitionDefinition[NodeInfo]):
@@ -163,29 +326,87 @@ class ExpressionNodeAcquisitionDefinition(_ExpressionAcquisitionDefinition[NodeI
             *[i[1] for i in self._property_exprs],
         ]
 
+    @override
+    def _get_attribute_expressions(self, context: AcquisitionContextProtocol) -> list[Expression[Any]]:
+        id_expr = self._get_id_expression(self._primary_id_expr, [self._label_expr], context)
+        return [id_expr, self._label_expr]
+
+    @override
+    def _create_converter(self, context: AcquisitionContextProtocol) -> Callable[[DataView], NodeInfo]:
+        """Build the functions that compute the values from a data view.
+
+        Nodes are built right from the values of the expressions when the keys
+        of the properties are literals, as they usually are.
+        """
+        expressions = self._get_attribute_expressions(context)
+        evaluate, keys = self._create_row_evaluator(expressions, self._property_exprs, context)
+        if keys is None:
+            get_values = _create_values_and_keys_getter(evaluate, len(expressions), len(self._property_exprs))
+
+            def convert_with_keys(data: DataView) -> NodeInfo:
+                values, properties = get_values(data)
+                return NodeInfo(id=values[0], label=values[1], properties=properties)
+
+            return convert_with_keys
+        literal_keys = keys
+
+        def convert(data: DataView) -> NodeInfo:
+            values = evaluate(data)
+            return NodeInfo(id=values[0], label=values[1], properties=dict(zip(literal_keys, values[2:], strict=True)))
+
+        return convert
+
     @override
     def _acquire_from_scanning(
         self,
         context: AcquisitionContextProtocol,
         data_stream: Iterable[DataView],
     ) -> Iterable[NodeInfo]:
-        """Build the functions that compute the values from the data stream."""
-        id_getter = self._create_value_getter(self._primary_id_expr)
-        label_getter = self._create_value_getter(self._label_expr)
-        property_getters = [
-            (self._create_value_getter(key_expr), self._create_value_getter(value_expr))
-            for key_expr, value_expr in self._property_exprs
-        ]
-
+        """Convert each item of the data stream into a node."""
+        convert = self._create_converter(context)
         for data in data_stream:
             try:
-                yield NodeInfo(
-                    id=id_getter(data),
-                    label=label_getter(data),
-                    properties={key_getter(data): value_getter(data) for key_getter, value_getter in property_getters},
-                )
+                yield convert(data)
             except Exception:  # noqa: PERF203
-                logging.exception("Failed to acquire node from data: %s", data)
+                logger.exception("Failed to acquire node from data: %s", data)
+                context.record_acquisition_failure(self)
+
+    def acquire_batches(self, context: AcquisitionContextProtocol, batch_size: int) -> Iterable[NodeBatch]:
+        """Acquire the nodes in batches of at most a given size.
+
+        Nodes are appended to the batches as they are converted, without
+        creating a node and a dictionary of properties for each of them. A new
+        batch is started whenever the keys of the properties change.
+        """
+        return self._acquire_batches_from_scanning(context, self._get_scan_result_stream(context), batch_size)
+
+    def _acquire_batches_from_scanning(
+        self,
+        context: AcquisitionContextProtocol,
+        data_stream: Iterable[DataView],
+        batch_size: int,
+    ) -> Iterable[NodeBatch]:
+        """Convert the items of the data stream into batches of nodes."""
+        get_values = self._create_batch_values_getter(
+            self._get_attribute_expressions(context),
+            self._property_exprs,
+            context,
+        )
+        batch: NodeBatch | None = None
+        for data in data_stream:
+            try:
+                values, keys, property_values = get_values(data)
+            except Exception:
+                logger.exception("Failed to acquire node from data: %s", data)
+                context.record_acquisition_failure(self)
+                continue
+            if batch is None or len(batch) >= batch_size or keys != batch.property_keys:
+                if batch:
+                    yield batch
+                batch = NodeBatch(keys)
+            batch.append(values[0], values[1], property_values)
+        if batch:
+            yield batch
 
 
 @dataclass(frozen=True)
@@ -234,30 +455,117 @@ class ExpressionEdgeAcquisitionDefinition(_ExpressionAcquisitionDefinition[EdgeI
             *[i[1] for i in self._property_exprs],
         ]
 
+    @override
+    def _get_attribute_expressions(self, context: AcquisitionContextProtocol) -> list[Expression[Any]]:
+        id_expr = self._get_id_expression(
+            self._primary_id_expr,
+            [self._label_expr, self._source_expr, self._target_expr],
+            context,
+        )
+        return [id_expr, self._source_expr, self._target_expr, self._label_expr]
+
+    @override
+    def _create_converter(self, context: AcquisitionContextProtocol) -> Callable[[DataView], EdgeInfo]:
+        """Build the functions that compute the values from a data view.
+
+        See `ExpressionNodeAcquisitionDefinition._create_converter`.
+        """
+        expressions = self._get_attribute_expressions(context)
+        evaluate, keys = self._create_row_evaluator(expressions, self._property_exprs, context)
+        if keys is None:
+            get_values = _create_values_and_keys_getter(evaluate, len(expressions), len(self._property_exprs))
+
+            def convert_with_keys(data: DataView) -> EdgeInfo:
+                values, properties = get_values(data)
+                return EdgeInfo(
+                    id=values[0],
+                    source_id=values[1],
+                    target_id=values[2],
+                    label=values[3],
+                    properties=properties,
+                )
+
+            return convert_with_keys
+        literal_keys = keys
+
+        def convert(data: DataView) -> EdgeInfo:
+            values = evaluate(data)
+            return EdgeInfo(
+                id=values[0],
+                source_id=values[1],
+                target_id=values[2],
+                label=values[3],
+                properties=dict(zip(literal_keys, values[4:], strict=True)),
+            )
+
+        return convert
+
     @override
     def _acquire_from_scanning(
         self,
         context: AcquisitionContextProtocol,
         data_stream: Iterable[DataView],
     ) -> Iterable[EdgeInfo]:
-        """Build the functions that compute the values from the data stream."""
-        id_getter = self._create_value_getter(self._primary_id_expr)
-        source_getter = self._create_value_getter(self._source_expr)
-        target_getter = self._create_value_getter(self._target_expr)
-        label_getter = self._create_value_getter(self._label_expr)
-        property_getters = [
-            (self._create_value_getter(key_expr), self._create_value_getter(value_expr))
-            for key_expr, value_expr in self._property_exprs
-        ]
-
+        """Convert each item of the data stream into an edge."""
+        convert = self._create_converter(context)
         for data in data_stream:
             try:
-                yield EdgeInfo(
-                    id=id_getter(data),
-                    source_id=source_getter(data),
-                    target_id=target_getter(data),
-                    label=label_getter(data),
-                    properties={key_getter(data): value_getter(data) for key_getter, value_getter in property_getters},
-                )
+                yield convert(data)
             except Exception:  # noqa: PERF203
-                logging.exception("Failed to acquire edge from data: %s", data)
+                logger.exception("Failed to acquire edge from data: %s", data)
+                context.record_acquisition_failure(self)
+
+    def acquire_batches(self, context: AcquisitionContextProtocol, batch_size: int) -> Iterable[EdgeBatch]:
+        """Acquire the edges in batches of at most a given size.
+
+        See `ExpressionNodeAcquisitionDefinition.acquire_batches`.
+        """
+        return self._acquire_batches_from_scanning(context, self._get_scan_result_stream(context), batch_size)
+
+    def _acquire_batches_from_scanning(
+        self,
+        context: AcquisitionContextProtocol,
+        data_stream: Iterable[DataView],
+        batch_size: int,
+    ) -> Iterable[EdgeBatch]:
+        """Convert the items of the data stream into batches of edges."""
+        get_values = self._create_batch_values_getter(
+            self._get_attribute_expressions(context),
+            self._property_exprs,
+            context,
+        )
+        batch: EdgeBatch | None = None
+        for data in data_stream:
+            try:
+                values, keys, property_values = get_values(data)
+            except Exception:
+                logger.exception("Failed to acquire edge from data: %s", data)
+                context.record_acquisition_failure(self)
+                continue
+            if batch is None or len(batch) >= batch_size or keys != batch.property_keys:
+                if batch:
+                    yield batch
+                batch = EdgeBatch(keys)
+            batch.append(values[0], values[1], values[2], values[3], property_values)
+        if batch:
+            yield batch
+
+
+def _create_values_and_keys_getter(
+    evaluate: Callable[[DataView], list[Any]],
+    num_values: int,
+    num_keys: int,
+) -> Callable[[DataView], tuple[list[Any], dict[str, Any]]]:
+    """Wrap the function evaluating the expressions and the computed keys."""
+
+    def get_values_and_keys(data: DataView) -> tuple[list[Any], dict[str, Any]]:
+        values = evaluate(data)
+        return values, dict(
+            zip(
+                values[num_values : num_values + num_keys],
+                values[num_values + num_keys :],
+                strict=True,
+            ),
+        )
+
+    return get_values_and_keys
@@ -0,0 +1,373 @@
+"""Writer of nodes and edges as Arrow record batches.
+
+The items of each definition are converted batch by batch into record batches
+with typed property columns, so that memory stays bounded by the batch size.
+The types of properties read from fields are taken from the `data_type` of the
+fields in the schema, those of literals and string expressions are known in
+advance, and the others are inferred from the values of the first batch.
+
+Record batches are either written as zstd compressed parquet files partitioned
+by label, or streamed in the Arrow IPC format, e.g. to the standard output.
+"""
+
+import logging
+import sys
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from os import PathLike
+from pathlib import Path
+from typing import Any, BinaryIO, Final, Literal
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition, _ExpressionAcquisitionDefinition
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.data_view import ArrayDataView, MappingBackedDataView
+from open_targets.adapter.expression import (
+    BuildCurieExpression,
+    DataSourceToLicenceExpression,
+    DeterministicIdExpression,
+    Expression,
+    ExtractCuriePrefixExpression,
+    ExtractSubstringExpression,
+    FieldExpression,
+    LiteralExpression,
+    NewUuidExpression,
+    NormaliseCurieExpression,
+    StringConcatenationExpression,
+    StringHashExpression,
+    StringLowerExpression,
+    ToStringExpression,
+)
+from open_targets.adapter.output import DEFAULT_BATCH_SIZE, EdgeBatch, EdgeInfo, NodeBatch, NodeInfo
+from open_targets.data.metadata.model import OpenTargetsDatasetFieldType
+from open_targets.data.schema_base import Field, SequenceField, StructField
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSION = "zstd"
+LABEL_COLUMN_NAME = "label"
+PROPERTIES_COLUMN_NAME = "properties"
+KIND_METADATA_KEY = b"open_targets.kind"
+
+NODE_ATTRIBUTE_COLUMN_NAMES: Final = ("id", LABEL_COLUMN_NAME)
+EDGE_ATTRIBUTE_COLUMN_NAMES: Final = ("id", "source_id", "target_id", LABEL_COLUMN_NAME)
+
+_SCALAR_TYPES: Final[Mapping[OpenTargetsDatasetFieldType, pa.DataType]] = {
+    OpenTargetsDatasetFieldType.BOOLEAN: pa.bool_(),
+    OpenTargetsDatasetFieldType.INTEGER: pa.int64(),
+    OpenTargetsDatasetFieldType.FLOAT: pa.float64(),
+    OpenTargetsDatasetFieldType.STRING: pa.string(),
+    OpenTargetsDatasetFieldType.DATE: pa.date32(),
+}
+_LITERAL_TYPES: Final[Mapping[type, pa.DataType]] = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+}
+_STRING_EXPRESSION_TYPES: Final = (
+    BuildCurieExpression,
+    DataSourceToLicenceExpression,
+    DeterministicIdExpression,
+    ExtractCuriePrefixExpression,
+    ExtractSubstringExpression,
+    NewUuidExpression,
+    NormaliseCurieExpression,
+    StringConcatenationExpression,
+    StringHashExpression,
+    StringLowerExpression,
+    ToStringExpression,
+)
+
+
+class ArrowOutputWriter:
+    """Writer of the definitions of a context as Arrow record batches.
+
+    Node record batches have `id` and `label` columns and edge record batches
+    have `id`, `source_id`, `target_id` and `label` columns, as `NodeInfo` and
+    `EdgeInfo`, followed by a `properties` struct column with a field per
+    property if there is any. The properties of a definition are those of its
+    first batch. Properties missing from later batches are null and properties
+    not in the first batch are dropped. A key given more than once takes its
+    last value, as in the properties of `NodeInfo` and `EdgeInfo`. Definitions
+    without items are not written.
+    """
+
+    def __init__(self, context: AcquisitionContext, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """Initialize the writer.
+
+        Args:
+            context (AcquisitionContext): The context acquiring the
+                definitions.
+            batch_size (int): The maximum number of rows of a record batch.
+        """
+        self.context: Final[AcquisitionContext] = context
+        self.batch_size: Final[int] = batch_size
+
+    def get_record_batch_generator(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> Iterator[pa.RecordBatch]:
+        """Get the items of a registered definition as record batches.
+
+        All the record batches of a definition share the same schema, whose
+        metadata tells if they hold nodes or edges.
+        """
+        kind: Literal["nodes", "edges"] = "nodes" if definition in self.context.node_definitions else "edges"
+        builder = _RecordBatchBuilder(kind, get_property_types(definition))
+        for batch in self.context.get_acquisition_batch_generator(definition, self.batch_size):
+            yield builder.build(batch)
+
+    def write_parquet(
+        self,
+        output_directory: str | PathLike[str],
+        compression: str = DEFAULT_COMPRESSION,
+        compression_level: int | None = None,
+    ) -> list[Path]:
+        """Write all the definitions of the context as parquet files.
+
+        Files are written to a `nodes` and an `edges` directory, each
+        partitioned by label in the hive layout, e.g.
+        `nodes/label=Gene/000.parquet`, so that they could be read by
+        `pyarrow.dataset.dataset(path, partitioning="hive")` or duckdb. Labels
+        are percent-encoded in the names of the partitions and the label column
+        is left out of the files. Each definition writes a file per label it
+        gives, named after the index of the definition in the context.
+
+        Returns:
+            list[Path]: The paths of the files written.
+        """
+        paths: list[Path] = []
+        for index, definition in enumerate([*self.context.node_definitions, *self.context.edge_definitions]):
+            paths.extend(
+                write_label_partitions(
+                    self.get_record_batch_generator(definition),
+                    output_directory,
+                    f"{index:03d}.parquet",
+                    compression,
+                    compression_level,
+                ),
+            )
+        return paths
+
+    def write_ipc_stream(self, sink: BinaryIO | None = None) -> None:
+        """Write all the definitions of the context in the Arrow IPC format.
+
+        Each definition is written as its own stream, one after the other,
+        since their properties differ. The streams could be read by calling
+        `pyarrow.ipc.open_stream` on the source until it is exhausted.
+
+        Args:
+            sink (BinaryIO | None): The binary stream to write to. If None,
+                the standard output is used.
+        """
+        if sink is None:
+            sink = sys.stdout.buffer
+        for definition in [*self.context.node_definitions, *self.context.edge_definitions]:
+            writer: pa.ipc.RecordBatchStreamWriter | None = None
+            try:
+                for record_batch in self.get_record_batch_generator(definition):
+                    if writer is None:
+                        writer = pa.ipc.new_stream(sink, record_batch.schema)
+                    writer.write_batch(record_batch)
+            finally:
+                if writer is not None:
+                    writer.close()
+        sink.flush()
+
+
+def write_label_partitions(
+    record_batches: Iterable[pa.RecordBatch],
+    output_directory: str | PathLike[str],
+    file_name: str,
+    compression: str = DEFAULT_COMPRESSION,
+    compression_level: int | None = None,
+) -> dict[Path, int]:
+    """Write record batches sharing a schema as a parquet file per label.
+
+    Files are written in the layout of `ArrowOutputWriter.write_parquet`, under
+    the directory of the kind of the batches and of their label.
+
+    Returns:
+        dict[Path, int]: The number of rows of each file written.
+    """
+    output_directory = Path(output_directory)
+    writers: dict[str, pq.ParquetWriter] = {}
+    num_rows: dict[Path, int] = {}
+    try:
+        for record_batch in record_batches:
+            for label, label_batch in _partition_by_label(record_batch):
+                path = (
+                    output_directory
+                    / record_batch.schema.metadata[KIND_METADATA_KEY].decode()
+                    / f"{LABEL_COLUMN_NAME}={quote(label, safe='')}"
+                    / file_name
+                )
+                writer = writers.get(label)
+                if writer is None:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    writer = pq.ParquetWriter(
+                        path,
+                        label_batch.schema,
+                        compression=compression,
+                        compression_level=compression_level,
+                    )
+                    writers[label] = writer
+                    num_rows[path] = 0
+                writer.write_batch(label_batch)
+                num_rows[path] += label_batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return num_rows
+
+
+def get_property_types(
+    definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+) -> dict[str, pa.DataType]:
+    """Get the Arrow types of the properties of a definition known in advance.
+
+    These are the properties with literal keys of expression definitions whose
+    values are fields typed in the schema, literals or string expressions. A key
+    given more than once is typed by its last value.
+    """
+    if not isinstance(definition, _ExpressionAcquisitionDefinition):
+        return {}
+    types: dict[str, pa.DataType] = {}
+    for key_expr, value_expr in definition._property_exprs:  # noqa: SLF001
+        if not isinstance(key_expr, LiteralExpression) or not isinstance(key_expr.value, str):
+            continue
+        value_type = _get_expression_arrow_type(value_expr)
+        if value_type is None:
+            types.pop(key_expr.value, None)
+        else:
+            types[key_expr.value] = value_type
+    return types
+
+
+def get_field_arrow_type(field: type[Field]) -> pa.DataType | None:
+    """Get the Arrow type of the values of a field from its `data_type`.
+
+    Returns:
+        pa.DataType | None: The type, or None if the field or one of its
+            nested fields has no matching Arrow type.
+    """
+    if issubclass(field, SequenceField):
+        element_type = get_field_arrow_type(field.element)
+        return None if element_type is None else pa.list_(element_type)
+    if issubclass(field, StructField):
+        field_types = [(nested_field.name, get_field_arrow_type(nested_field)) for nested_field in field.fields]
+        if any(field_type is None for _, field_type in field_types):
+            return None
+        return pa.struct(field_types)
+    return _SCALAR_TYPES.get(field.data_type)
+
+
+class _RecordBatchBuilder:
+    """Builder of the record batches of a definition.
+
+    The schema is set by the first batch built.
+    """
+
+    def __init__(self, kind: Literal["nodes", "edges"], property_types: Mapping[str, pa.DataType]) -> None:
+        self._kind: Final = kind
+        self._property_types: Final = property_types
+        self._schema: pa.Schema | None = None
+        self._property_keys: tuple[str, ...] = ()
+
+    def build(self, batch: NodeBatch | EdgeBatch) -> pa.RecordBatch:
+        if isinstance(batch, NodeBatch):
+            attribute_columns: list[Sequence[Any]] = [batch.ids, batch.labels]
+        else:
+            attribute_columns = [batch.ids, batch.source_ids, batch.target_ids, batch.labels]
+        property_columns = self._get_property_columns(batch)
+        if self._schema is None:
+            self._schema = self._create_schema(batch, property_columns)
+        arrays: list[pa.Array] = [pa.array(column, pa.string()) for column in attribute_columns]
+        if self._property_keys:
+            properties_type = self._schema.field(PROPERTIES_COLUMN_NAME).type
+            arrays.append(
+                pa.StructArray.from_arrays(
+                    [
+                        _to_arrow_array(key, column, properties_type.field(key).type)
+                        for key, column in zip(self._property_keys, property_columns, strict=True)
+                    ],
+                    fields=list(properties_type),
+                ),
+            )
+        return pa.record_batch(arrays, schema=self._schema)
+
+    def _get_property_columns(self, batch: NodeBatch | EdgeBatch) -> list[Sequence[Any]]:
+        if self._schema is None:
+            # Duplicate keys are kept at their first position, with the values
+            # of their last one as the dictionaries of the items do.
+            self._property_keys = tuple(dict.fromkeys(batch.property_keys))
+        if batch.property_keys == self._property_keys:
+            return list(zip(*batch.property_values, strict=True))
+        dropped_keys = set(batch.property_keys) - set(self._property_keys)
+        if dropped_keys:
+            logger.warning("Properties %s are dropped as they are not in the schema.", sorted(dropped_keys))
+        columns = dict(zip(batch.property_keys, zip(*batch.property_values, strict=True), strict=True))
+        return [columns.get(key, [None] * len(batch)) for key in self._property_keys]
+
+    def _create_schema(self, batch: NodeBatch | EdgeBatch, property_columns: Sequence[Sequence[Any]]) -> pa.Schema:
+        attribute_names = NODE_ATTRIBUTE_COLUMN_NAMES if isinstance(batch, NodeBatch) else EDGE_ATTRIBUTE_COLUMN_NAMES
+        fields = [pa.field(name, pa.string()) for name in attribute_names]
+        property_fields: list[pa.Field] = []
+        for key, column in zip(self._property_keys, property_columns, strict=True):
+            property_type = self._property_types.get(key)
+            if property_type is None:
+                property_type = pa.array(_get_raw_values(column)).type
+            property_fields.append(pa.field(key, pa.string() if pa.types.is_null(property_type) else property_type))
+        # Parquet could not hold structs without fields.
+        if property_fields:
+            fields.append(pa.field(PROPERTIES_COLUMN_NAME, pa.struct(property_fields), nullable=False))
+        return pa.schema(fields, metadata={KIND_METADATA_KEY: self._kind.encode()})
+
+
+def _get_expression_arrow_type(expression: Expression[Any]) -> pa.DataType | None:
+    match expression:
+        case FieldExpression():
+            return get_field_arrow_type(expression.field)
+        case LiteralExpression():
+            return _LITERAL_TYPES.get(type(expression.value))
+        case _ if isinstance(expression, _STRING_EXPRESSION_TYPES):
+            return pa.string()
+        case _:
+            return None
+
+
+def _get_raw_values(values: Iterable[Any]) -> list[Any]:
+    """Replace the views of nested values by their raw data."""
+    return [value.raw_data if isinstance(value, ArrayDataView | MappingBackedDataView) else value for value in values]
+
+
+def _to_arrow_array(key: str, values: Sequence[Any], value_type: pa.DataType) -> pa.Array:
+    if pa.types.is_nested(value_type):
+        values = _get_raw_values(values)
+    try:
+        return pa.array(values, value_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    # Values of types Arrow does not convert directly, e.g. decimals into
+    # floats, are converted to their own type first and then cast.
+    try:
+        return pa.array(values).cast(value_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        msg = f"Values of property {key} do not match its type {value_type}."
+        raise ValueError(msg) from e
+
+
+def _partition_by_label(record_batch: pa.RecordBatch) -> Iterator[tuple[str, pa.RecordBatch]]:
+    """Split a record batch by label, leaving out the label column."""
+    labels = record_batch.column(LABEL_COLUMN_NAME)
+    unique_labels = pc.unique(labels).to_pylist()
+    data = record_batch.drop_columns([LABEL_COLUMN_NAME])
+    if len(unique_labels) == 1:
+        yield unique_labels[0], data
+        return
+    for label in unique_labels:
+        yield label, data.filter(pc.equal(labels, label))
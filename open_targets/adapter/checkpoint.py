@@ -0,0 +1,342 @@
+"""Builds of definitions into parquet files resumable from a checkpoint.
+
+Definitions are built one shard of their dataset at a time, see
+`AcquisitionContext.get_dataset_shards`. Once the files of a shard are moved
+into place, the shard is committed to a checkpoint written next to them, so
+that a build interrupted, e.g. by a crash, skips the definitions it completed
+and resumes the others from their first shard not committed.
+"""
+
+import json
+import logging
+import shutil
+import tempfile
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+from typing import Any, Final, Literal
+
+import xxhash
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition
+from open_targets.adapter.arrow_output import DEFAULT_COMPRESSION, ArrowOutputWriter, write_label_partitions
+from open_targets.adapter.context import DEFAULT_FETCH_BATCH_SIZE, AcquisitionContext, DatasetShard, DuckDBSettings
+from open_targets.adapter.expression_cache import DEFAULT_EXPRESSION_CACHE_SIZE
+from open_targets.adapter.incremental import get_definition_names
+from open_targets.adapter.output import DEFAULT_BATCH_SIZE, EdgeInfo, NodeInfo
+from open_targets.adapter.result_cache import get_definition_fingerprint, get_file_fingerprint
+from open_targets.config import DATA_VERSION
+from open_targets.data.schema_base import Dataset
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE_NAME = "checkpoint.json"
+CHECKPOINT_FORMAT_VERSION: Final = 1
+STAGING_DIRECTORY_PREFIX = ".staging-"
+
+
+@dataclass(frozen=True)
+class ShardCheckpoint:
+    """A committed shard of a definition.
+
+    Attributes:
+        paths: The files written for the shard, one per label, relative to
+            the output directory.
+        num_rows: The number of items written for the shard.
+    """
+
+    paths: tuple[str, ...]
+    num_rows: int
+
+
+@dataclass(frozen=True)
+class DefinitionCheckpoint:
+    """The progress of the build of a definition.
+
+    Attributes:
+        name: The name of the definition, see `get_definition_names`.
+        kind: Whether the items are nodes or edges.
+        key: The key of the definition, its datasets and the options of the
+            build. Shards committed under another key are built again.
+        num_shards: The number of shards the definition is built in.
+        shards: The shards committed, in order.
+    """
+
+    name: str
+    kind: Literal["nodes", "edges"]
+    key: str
+    num_shards: int
+    shards: tuple[ShardCheckpoint, ...] = ()
+
+    @property
+    def completed(self) -> bool:
+        """Whether all the shards of the definition are committed."""
+        return len(self.shards) == self.num_shards
+
+    @property
+    def num_rows(self) -> int:
+        """The number of items written for the committed shards."""
+        return sum(shard.num_rows for shard in self.shards)
+
+    @property
+    def paths(self) -> list[str]:
+        """The files written for the committed shards."""
+        return [path for shard in self.shards for path in shard.paths]
+
+
+class CheckpointedBuildRunner:
+    """Runner building definitions into parquet files, resumable on restart.
+
+    The items of each shard are written by `ArrowOutputWriter` to a parquet
+    file per label in the layout of `ArrowOutputWriter.write_parquet`, named
+    after the definition and the shard, e.g.
+    `nodes/label=Gene/targets-Gene-00002.parquet`. Files are staged before
+    being moved into place and the checkpoint is replaced atomically, so that
+    the shards recorded by the checkpoint are always fully written. Files of
+    shards not committed are overwritten when their shards are built again.
+
+    Definitions are matched with the checkpoint by name and key, the key being
+    derived from the structure of the definition, see
+    `get_definition_fingerprint`, the data version and the content of the files
+    of its shards. Definitions which could not be fingerprinted are matched by
+    name only. Definitions generating random ids should be built with
+    `deterministic_ids` set if the ids of shards built by different runs
+    should be consistent, the ids being positioned by the files and rows of
+    the dataset rather than the shards, see `AcquisitionContext`.
+
+    Deduplication and referential integrity checks are not supported as their
+    state would not survive a restart.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        node_definitions: list[AcquisitionDefinition[NodeInfo]],
+        edge_definitions: list[AcquisitionDefinition[EdgeInfo]],
+        datasets_location: str | PathLike[str],
+        output_directory: str | PathLike[str],
+        num_shards: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        compression: str = DEFAULT_COMPRESSION,
+        fetch_batch_size: int | None = DEFAULT_FETCH_BATCH_SIZE,
+        duckdb_settings: DuckDBSettings | None = None,
+        expression_cache_size: int | None = DEFAULT_EXPRESSION_CACHE_SIZE,
+        deterministic_ids: bool = False,
+    ) -> None:
+        """Initialize the runner.
+
+        Args:
+            node_definitions (list[AcquisitionDefinition[NodeInfo]]): The
+                definitions of the nodes to build.
+            edge_definitions (list[AcquisitionDefinition[EdgeInfo]]): The
+                definitions of the edges to build.
+            datasets_location (str | PathLike[str]): The location of the
+                directory containing the datasets.
+            output_directory (str | PathLike[str]): The directory of the files
+                written and of the checkpoint.
+            num_shards (int): The number of shards definitions scanning a
+                single dataset are split into. Other definitions are built in
+                a single shard.
+            batch_size (int): The maximum number of rows of the record batches
+                the items are converted into.
+            compression (str): The compression of the parquet files.
+            fetch_batch_size (int | None): The number of rows fetched from the
+                query engine at a time. If None, rows are fetched one by one.
+            duckdb_settings (DuckDBSettings | None): The settings of the duckdb
+                connections. If None, the defaults are used.
+            expression_cache_size (int | None): The maximum number of values
+                cached per pure expression of each definition. If None, values
+                are not cached.
+            deterministic_ids (bool): Whether generated ids are deterministic
+                instead of random. See `AcquisitionContext`.
+        """
+        if num_shards < 1:
+            msg = f"Number of shards must be positive, got {num_shards}."
+            raise ValueError(msg)
+        self.node_definitions: Final[list[AcquisitionDefinition[NodeInfo]]] = node_definitions
+        self.edge_definitions: Final[list[AcquisitionDefinition[EdgeInfo]]] = edge_definitions
+        self.datasets_location: Final[str | PathLike[str]] = datasets_location
+        self.output_directory: Final[Path] = Path(output_directory)
+        self.num_shards: Final[int] = num_shards
+        self.batch_size: Final[int] = batch_size
+        self.compression: Final[str] = compression
+        self.fetch_batch_size: Final[int | None] = fetch_batch_size
+        self.duckdb_settings: Final[DuckDBSettings | None] = duckdb_settings
+        self.expression_cache_size: Final[int | None] = expression_cache_size
+        self.deterministic_ids: Final[bool] = deterministic_ids
+        self._names: Final = get_definition_names([*node_definitions, *edge_definitions])
+
+    def run(self) -> Iterator[DefinitionCheckpoint]:
+        """Build all the definitions, nodes first, and yield their checkpoints.
+
+        Definitions completed by a previous run are yielded without being
+        built again. A definition failing stops the run, the shards committed
+        until then being kept for the next run.
+        """
+        self.output_directory.mkdir(parents=True, exist_ok=True)
+        for path in self.output_directory.glob(f"{STAGING_DIRECTORY_PREFIX}*"):
+            shutil.rmtree(path, ignore_errors=True)
+        checkpoints = self.get_checkpoints()
+        definitions = [*self.node_definitions, *self.edge_definitions]
+        with self._create_context() as context:
+            for name, definition in zip(self._names, definitions, strict=True):
+                kind: Literal["nodes", "edges"] = "nodes" if definition in self.node_definitions else "edges"
+                shards = self._get_shards(context, definition)
+                checkpoint = DefinitionCheckpoint(name, kind, self._get_key(context, definition, shards), len(shards))
+                previous_checkpoint = checkpoints.get(name)
+                if previous_checkpoint is not None and previous_checkpoint.key == checkpoint.key:
+                    checkpoint = previous_checkpoint
+                elif previous_checkpoint is not None:
+                    logger.info("Definition %s changed since its checkpoint, it is built again.", name)
+                    for path in previous_checkpoint.paths:
+                        (self.output_directory / path).unlink(missing_ok=True)
+                if checkpoint.completed:
+                    logger.info("Definition %s is already built, skipping it.", name)
+                elif checkpoint.shards:
+                    logger.info("Resuming definition %s from shard %d.", name, len(checkpoint.shards))
+                for shard_index in range(len(checkpoint.shards), len(shards)):
+                    shard = shards[shard_index]
+                    if shard is None:
+                        shard_checkpoint = self._build_shard(context, definition, name, shard_index)
+                    else:
+                        # The context of a shard is short lived as the shard is
+                        # scanned once.
+                        (dataset,) = definition.get_required_datasets()
+                        with self._create_context({dataset: shard}) as shard_context:
+                            shard_checkpoint = self._build_shard(shard_context, definition, name, shard_index)
+                    checkpoint = DefinitionCheckpoint(
+                        name,
+                        kind,
+                        checkpoint.key,
+                        checkpoint.num_shards,
+                        (*checkpoint.shards, shard_checkpoint),
+                    )
+                    checkpoints[name] = checkpoint
+                    self._write_checkpoints(checkpoints)
+                yield checkpoint
+
+    def get_checkpoints(self) -> dict[str, DefinitionCheckpoint]:
+        """Read the checkpoints of the definitions, by name."""
+        path = self.output_directory / CHECKPOINT_FILE_NAME
+        if not path.exists():
+            return {}
+        with path.open(encoding="utf-8") as file:
+            content: dict[str, Any] = json.load(file)
+        if content["format_version"] != CHECKPOINT_FORMAT_VERSION:
+            msg = f"Unsupported checkpoint format version: {content['format_version']}"
+            raise ValueError(msg)
+        return {
+            name: DefinitionCheckpoint(
+                name,
+                definition["kind"],
+                definition["key"],
+                definition["num_shards"],
+                tuple(ShardCheckpoint(tuple(shard["paths"]), shard["num_rows"]) for shard in definition["shards"]),
+            )
+            for name, definition in content["definitions"].items()
+        }
+
+    def _create_context(
+        self,
+        dataset_shards: Mapping[type[Dataset], DatasetShard] | None = None,
+    ) -> AcquisitionContext:
+        return AcquisitionContext(
+            node_definitions=self.node_definitions,
+            edge_definitions=self.edge_definitions,
+            datasets_location=self.datasets_location,
+            fetch_batch_size=self.fetch_batch_size,
+            duckdb_settings=self.duckdb_settings,
+            dataset_shards=dataset_shards,
+            expression_cache_size=self.expression_cache_size,
+            deterministic_ids=self.deterministic_ids,
+        )
+
+    def _get_shards(
+        self,
+        context: AcquisitionContext,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> list[DatasetShard | None]:
+        """Get the shards of a definition, None for all its datasets."""
+        datasets = list(definition.get_required_datasets())
+        if self.num_shards > 1 and len(datasets) == 1:
+            shards = context.get_dataset_shards(datasets[0], self.num_shards)
+            if len(shards) > 1:
+                return list(shards)
+        return [None]
+
+    def _get_key(
+        self,
+        context: AcquisitionContext,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        shards: Sequence[DatasetShard | None],
+    ) -> str:
+        hasher = xxhash.xxh3_128()
+        hasher.update(f"{CHECKPOINT_FORMAT_VERSION};{DATA_VERSION};{self.deterministic_ids};".encode())
+        hasher.update(f"{get_definition_fingerprint(definition)};".encode())
+        for shard in shards:
+            files = (
+                [file for dataset in definition.get_required_datasets() for file in context.get_dataset_files(dataset)]
+                if shard is None
+                else shard.files
+            )
+            hasher.update(f"{None if shard is None else shard.row_range}:".encode())
+            for file in files:
+                hasher.update(f"{get_file_fingerprint(file)};".encode())
+        return hasher.hexdigest()
+
+    def _build_shard(
+        self,
+        context: AcquisitionContext,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        name: str,
+        shard_index: int,
+    ) -> ShardCheckpoint:
+        """Write the items of a shard and move them into place."""
+        file_name = f"{name}-{shard_index:05d}.parquet"
+        # Files of the shard left by a run stopped before committing it.
+        for path in self.output_directory.glob(f"*/*/{file_name}"):
+            path.unlink()
+        staging_directory = Path(tempfile.mkdtemp(prefix=STAGING_DIRECTORY_PREFIX, dir=self.output_directory))
+        try:
+            num_rows = write_label_partitions(
+                ArrowOutputWriter(context, self.batch_size).get_record_batch_generator(definition),
+                staging_directory,
+                file_name,
+                self.compression,
+            )
+            paths: list[str] = []
+            for staged_path in num_rows:
+                relative_path = staged_path.relative_to(staging_directory)
+                path = self.output_directory / relative_path
+                path.parent.mkdir(parents=True, exist_ok=True)
+                staged_path.replace(path)
+                paths.append(relative_path.as_posix())
+        finally:
+            shutil.rmtree(staging_directory, ignore_errors=True)
+        return ShardCheckpoint(tuple(paths), sum(num_rows.values()))
+
+    def _write_checkpoints(self, checkpoints: Mapping[str, DefinitionCheckpoint]) -> None:
+        content = {
+            "format_version": CHECKPOINT_FORMAT_VERSION,
+            "definitions": {
+                name: {
+                    "kind": checkpoint.kind,
+                    "key": checkpoint.key,
+                    "num_shards": checkpoint.num_shards,
+                    "shards": [{"paths": list(shard.paths), "num_rows": shard.num_rows} for shard in checkpoint.shards],
+                }
+                for name, checkpoint in checkpoints.items()
+            },
+        }
+        # Written to a temporary file first so that an interrupted run never
+        # leaves a partially written checkpoint.
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=self.output_directory,
+            suffix=".tmp",
+            delete=False,
+        ) as file:
+            json.dump(content, file, indent=2)
+        Path(file.name).replace(self.output_directory / CHECKPOINT_FILE_NAME)
@@ -2,42 +2,234 @@
 
 """Implementation of the acquisition context protocol."""
 
-from collections.abc import Iterable, Sequence
-from functools import reduce
+import logging
+import time
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import partial, reduce
+from itertools import chain, islice, pairwise
 from os import PathLike
 from pathlib import Path
-from typing import Any, Final, cast, overload
+from types import TracebackType
+from typing import Any, Final, TypeAlias, cast, overload
 
-from duckdb import ColumnExpression, ConstantExpression, DuckDBPyRelation, Expression, read_parquet
+import duckdb
+from duckdb import (
+    CaseExpression,
+    CoalesceOperator,
+    ColumnExpression,
+    ConstantExpression,
+    DuckDBPyConnection,
+    DuckDBPyRelation,
+    Expression,
+    FunctionExpression,
+    LambdaExpression,
+    SQLExpression,
+)
+from duckdb.sqltypes import VARCHAR
+from typing_extensions import Self
 
-from open_targets.adapter.acquisition_definition import AcquisitionDefinition
-from open_targets.adapter.data_view import DataView, DataViewProtocol, SequenceBackedDataView
-from open_targets.adapter.output import EdgeInfo, NodeInfo
+from open_targets.adapter._helper._acquisition_definition import fold_constants
+from open_targets.adapter._helper._duckdb_function import (
+    BUILD_NORMALISED_CURIE_FUNCTION_NAME,
+    EXTRACT_CURIE_PREFIX_FUNCTION_NAME,
+    NORMALISE_CURIE_FUNCTION_NAME,
+    XXH3_FUNCTION_NAME,
+    register_functions,
+)
+from open_targets.adapter._helper._expression import (
+    get_expression_key,
+    recursive_get_dependent_fields,
+    replace_dependents,
+)
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+    _ExpressionAcquisitionDefinition,
+)
+from open_targets.adapter.data_view import DataView, SequenceBackedDataView
+from open_targets.adapter.deduplication import NodeDeduplicator
+from open_targets.adapter.expression import (
+    BuildCurieExpression,
+    DataSourceToLicenceExpression,
+    DeterministicIdExpression,
+    ExtractCuriePrefixExpression,
+    ExtractSubstringExpression,
+    FieldExpression,
+    HashAlgorithm,
+    LiteralExpression,
+    NewUuidExpression,
+    NormaliseCurieExpression,
+    StringConcatenationExpression,
+    StringHashExpression,
+    StringLowerExpression,
+    ToStringExpression,
+    TransformExpression,
+)
+from open_targets.adapter.expression import Expression as AcquisitionExpression
+from open_targets.adapter.expression_cache import DEFAULT_EXPRESSION_CACHE_SIZE, ExpressionCache, ExpressionCacheStats
+from open_targets.adapter.licence import DATASOURCE_LICENSES, License
+from open_targets.adapter.metrics import AcquisitionMetrics, DefinitionMetrics
+from open_targets.adapter.output import (
+    DEFAULT_BATCH_SIZE,
+    EdgeBatch,
+    EdgeInfo,
+    NodeBatch,
+    NodeInfo,
+    batch_edges,
+    batch_nodes,
+)
+from open_targets.adapter.referential_integrity import ReferentialIntegrityChecker
+from open_targets.adapter.result_cache import ResultCache
 from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation, ScanOperation
 from open_targets.adapter.scan_operation_predicate import (
     AndExpression,
+    ComparisonExpression,
+    ComparisonOperator,
     EqualityExpression,
+    InExpression,
+    IsNotNullExpression,
+    LikeExpression,
     NotExpression,
     OrExpression,
+    PrefixExpression,
     ScanOperationPredicateExpression,
 )
 from open_targets.data.metadata.model import OpenTargetsDatasetFieldType
-from open_targets.data.schema_base import Dataset, Field
+from open_targets.data.schema_base import Dataset, Field, ScalarField, SequenceField, StructField
+
+logger = logging.getLogger(__name__)
+
+FusedAcquisitionItem: TypeAlias = (
+    tuple[AcquisitionDefinition[NodeInfo], NodeInfo] | tuple[AcquisitionDefinition[EdgeInfo], EdgeInfo]
+)
+_FusibleDefinition: TypeAlias = _ExpressionAcquisitionDefinition[NodeInfo] | _ExpressionAcquisitionDefinition[EdgeInfo]
+_ComputedExpressionBuilder: TypeAlias = Callable[
+    [Any, Callable[[type[Field]], Expression | None]],
+    Expression | None,
+]
 
 TOP_FIELD_PATH_INDEX = 1
 TOP_FIELD_PATH_LENGTH = TOP_FIELD_PATH_INDEX + 1
+EXPLODED_ELEMENT_COLUMN_NAME = "__element"
+PROJECTED_COLUMN_NAME = "__column"
+COMPUTED_FIELD_NAME = "__computed"
+LAMBDA_PARAMETER_NAME = "__x"
+FILE_ROW_NUMBER_COLUMN_NAME = "file_row_number"
+FILE_NAME_COLUMN_NAME = "filename"
+POSITION_FIELD_NAME = "__position"
+IN_SET_TABLE_NAME = "__in_set"
+MAX_IN_SET_COMPARISON_SIZE = 64
+DEFAULT_FETCH_BATCH_SIZE = 2048
+MAX_FETCH_RETRY = 5
+ATTRIBUTE_COLUMN_NAME = "__attribute"
+PROPERTY_COLUMN_NAME = "__property"
+
+
+@dataclass(frozen=True, kw_only=True)
+class DuckDBSettings:
+    """Settings of the duckdb connection owned by an acquisition context.
+
+    Settings left as None fall back to the defaults of duckdb.
+
+    Attributes:
+        threads: The number of threads duckdb may use.
+        memory_limit: The maximum memory duckdb may use, e.g. "8GB".
+        temp_directory: The directory duckdb spills to when the memory limit
+            is reached.
+        preserve_insertion_order: Whether query results keep the order of the
+            rows in the datasets. Disabling it lowers the memory usage of scans
+            at the cost of a nondeterministic order.
+        parquet_metadata_cache: Whether the metadata of parquet files is cached
+            between scans, which spares reading it again when a dataset is
+            scanned by multiple definitions.
+        config: Any other duckdb configuration options.
+    """
+
+    threads: int | None = None
+    memory_limit: str | None = None
+    temp_directory: str | PathLike[str] | None = None
+    preserve_insertion_order: bool = True
+    parquet_metadata_cache: bool = True
+    config: Mapping[str, str | int | bool] | None = None
+
+    def connect(self) -> DuckDBPyConnection:
+        """Open a new in-memory duckdb connection with these settings."""
+        config: dict[str, str | int | bool] = {"preserve_insertion_order": self.preserve_insertion_order}
+        if self.threads is not None:
+            config["threads"] = self.threads
+        if self.memory_limit is not None:
+            config["memory_limit"] = self.memory_limit
+        if self.temp_directory is not None:
+            config["temp_directory"] = str(self.temp_directory)
+        config.update(self.config or {})
+        connection = duckdb.connect(config=config)
+        # Options of the parquet extension are only available once it is
+        # loaded, which is not the case while connecting.
+        connection.execute(f"SET parquet_metadata_cache = {str(self.parquet_metadata_cache).lower()}")
+        return connection
+
+
+@dataclass(frozen=True)
+class AcquisitionQuery:
+    """A query computing the items of a definition entirely in duckdb.
+
+    Attributes:
+        relation: The query. Its columns are the attributes of the items, in
+            the order of the fields of `NodeInfo` or `EdgeInfo`, followed by
+            the values of the properties.
+        attribute_columns: The names of the columns of the attributes.
+        property_columns: The names of the columns of the properties, keyed by
+            the keys of the properties.
+    """
+
+    relation: DuckDBPyRelation
+    attribute_columns: Sequence[str]
+    property_columns: Mapping[str, str]
+
+
+@dataclass(frozen=True)
+class DatasetShard:
+    """A part of a dataset that could be scanned on its own.
+
+    A shard is either a contiguous run of whole files of the dataset or a
+    contiguous range of rows, aligned to row groups, of a single file.
+
+    Attributes:
+        files: The parquet files of the shard, in the order of the dataset.
+        row_range: The start and stop of the rows of the only file of the
+            shard. If None, the files are scanned as a whole.
+    """
+
+    files: tuple[str, ...]
+    row_range: tuple[int, int] | None = None
 
 
 class AcquisitionContext:
-    """An implementation of the acquisition context using duckdb."""
+    """An implementation of the acquisition context using duckdb.
+
+    The context owns a duckdb connection which is reused by all its scans. The
+    connection should be closed by `close` once the context is no longer used,
+    or by using the context as a context manager.
+    """
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         *,
         node_definitions: list[AcquisitionDefinition[NodeInfo]],
         edge_definitions: list[AcquisitionDefinition[EdgeInfo]],
         datasets_location: str | PathLike[str],
         limit: int | None = None,
+        fetch_batch_size: int | None = DEFAULT_FETCH_BATCH_SIZE,
+        duckdb_settings: DuckDBSettings | None = None,
+        dataset_shards: Mapping[type[Dataset], DatasetShard] | None = None,
+        expression_cache_size: int | None = DEFAULT_EXPRESSION_CACHE_SIZE,
+        deterministic_ids: bool = False,
+        node_deduplicator: NodeDeduplicator | None = None,
+        referential_integrity_checker: ReferentialIntegrityChecker | None = None,
+        result_cache: ResultCache | None = None,
+        metrics: AcquisitionMetrics | None = None,
     ) -> None:
         """Initialize the acquisition context.
 
@@ -54,6 +246,44 @@ class AcquisitionContext:
                 directory containing the datasets.
             limit (int | None): The maximum number of rows to retrieve from each
                 dataset. If None, all rows are retrieved.
+            fetch_batch_size (int | None): The number of rows fetched from the
+                query engine at a time. If None, rows are fetched one by one.
+            duckdb_settings (DuckDBSettings | None): The settings of the duckdb
+                connection of the context. If None, the defaults are used.
+            dataset_shards (Mapping[type[Dataset], DatasetShard] | None): The
+                shards the scans of the datasets are restricted to. Datasets not
+                present are scanned as a whole. Could not be used with a limit
+                as the limit applies to whole datasets.
+            expression_cache_size (int | None): The maximum number of values
+                cached per pure expression of each definition, see
+                `ExpressionCache`. If None, values are not cached.
+            deterministic_ids (bool): Whether the ids generated as random UUIDs
+                are derived from the label, the source, the target and the
+                position of the row in its file instead, see
+                `DeterministicIdExpression`. Acquiring the same data twice then
+                gives the same ids, whether the datasets are sharded or not.
+            node_deduplicator (NodeDeduplicator | None): The deduplicator
+                dropping the nodes acquired with a label and an id already
+                seen, whichever their definition. It could be shared with
+                other contexts. If None, nodes are not deduplicated.
+            referential_integrity_checker (ReferentialIntegrityChecker | None):
+                The checker recording the ids of the nodes acquired and
+                reporting, or dropping, the edges acquired with an endpoint
+                not among the nodes recorded before them. Node definitions
+                should therefore be acquired before edge definitions, as
+                `get_acquisition_generators` and
+                `get_fused_acquisition_generators` do. If None, edges are not
+                checked.
+            result_cache (ResultCache | None): The cache the batches of the
+                definitions are replayed from when their definitions, the data
+                version, their datasets and the options of the context are
+                unchanged, and stored to otherwise. Fused streams are not
+                cached. If None, definitions are always acquired.
+            metrics (AcquisitionMetrics | None): The registry recording the
+                rows scanned, the items emitted, the failures and the time
+                spent by each definition acquired, see `AcquisitionMetrics`.
+                Fused streams are not instrumented. If None, nothing is
+                recorded.
 
         Returns:
             AcquisitionContext: The handler for an acquisition which could be
@@ -70,11 +300,110 @@ class AcquisitionContext:
         self.datasets: Final[frozenset[type[Dataset]]] = all_datasets_required
         self.datasets_location: Final[str | PathLike[str]] = datasets_location
         self.limit: Final[int | None] = limit
+        if fetch_batch_size is not None and fetch_batch_size < 1:
+            msg = f"Fetch batch size must be positive, got {fetch_batch_size}."
+            raise ValueError(msg)
+        self.fetch_batch_size: Final[int | None] = fetch_batch_size
+        if limit is not None and dataset_shards:
+            msg = "Dataset shards could not be used with a limit."
+            raise ValueError(msg)
+        self.dataset_shards: Final[Mapping[type[Dataset], DatasetShard]] = dataset_shards or {}
+        if expression_cache_size is not None and expression_cache_size < 1:
+            msg = f"Expression cache size must be positive, got {expression_cache_size}."
+            raise ValueError(msg)
+        self.expression_cache_size: Final[int | None] = expression_cache_size
+        self.deterministic_ids: Final[bool] = deterministic_ids
+        self.node_deduplicator: Final[NodeDeduplicator | None] = node_deduplicator
+        self.referential_integrity_checker: Final[ReferentialIntegrityChecker | None] = referential_integrity_checker
+        self.result_cache: Final[ResultCache | None] = result_cache
+        self.metrics: Final[AcquisitionMetrics | None] = metrics
+        self.duckdb_settings: Final[DuckDBSettings] = duckdb_settings or DuckDBSettings()
+        self.connection: Final[DuckDBPyConnection] = self.duckdb_settings.connect()
+        register_functions(self.connection)
+        # Temporary tables live as long as the connection, hence one per set.
+        self._in_set_tables: dict[tuple[tuple[type, Any], ...], str] = {}
+        self._computed_fields: dict[Hashable, type[_ComputedField]] = {}
+        self._position_fields: dict[type[Dataset], type[_PositionField]] = {}
+        # Definitions are not hashable, hence keyed by identity.
+        self._expression_caches: dict[int, ExpressionCache] = {}
+        self._expression_cache_stats: dict[int, ExpressionCacheStats] = {}
+
+    def __enter__(self) -> Self:
+        """Enter the runtime context of the acquisition context."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the connection when leaving the runtime context."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the duckdb connection of the context.
+
+        Streams of the context cannot be consumed once it is closed.
+        """
+        self.connection.close()
 
     def get_dataset_path(self, dataset: type[Dataset]) -> Path:
         """Get the path to the dataset."""
         return Path(self.datasets_location) / dataset.id / "**" / "*.parquet"
 
+    def get_dataset_files(self, dataset: type[Dataset]) -> list[str]:
+        """Get the parquet files of a dataset, in the order they are scanned."""
+        return [
+            cast("str", row[0])
+            for row in self.connection.execute(
+                "SELECT file FROM glob(?)",
+                [str(self.get_dataset_path(dataset))],
+            ).fetchall()
+        ]
+
+    def get_dataset_shards(self, dataset: type[Dataset], num_shards: int) -> list[DatasetShard]:
+        """Split a dataset into at most the given number of shards.
+
+        The files of the dataset are split into runs of files of similar sizes.
+        If there are fewer files than shards, the row groups of each file are
+        split instead, each file getting a number of shards in proportion to
+        its number of rows. Scanning the shards in order scans the rows in the
+        same order as scanning the whole dataset.
+        """
+        if num_shards < 1:
+            msg = f"Number of shards must be positive, got {num_shards}."
+            raise ValueError(msg)
+        files = self.get_dataset_files(dataset)
+        if len(files) >= num_shards:
+            return [
+                DatasetShard(files=tuple(files[part.start : part.stop]))
+                for part in _partition_contiguously([Path(file).stat().st_size for file in files], num_shards)
+            ]
+
+        row_group_sizes = [
+            [
+                cast("int", row[0])
+                for row in self.connection.execute(
+                    "SELECT row_group_num_rows FROM ("
+                    "SELECT DISTINCT row_group_id, row_group_num_rows FROM parquet_metadata(?)"
+                    ") ORDER BY row_group_id",
+                    [file],
+                ).fetchall()
+            ]
+            for file in files
+        ]
+        num_rows = sum(sum(sizes) for sizes in row_group_sizes) or 1
+        shards: list[DatasetShard] = []
+        for file, sizes in zip(files, row_group_sizes, strict=True):
+            row_group_offsets = [sum(sizes[:index]) for index in range(len(sizes) + 1)]
+            num_file_shards = max(1, round(num_shards * sum(sizes) / num_rows))
+            shards.extend(
+                DatasetShard(files=(file,), row_range=(row_group_offsets[part.start], row_group_offsets[part.stop]))
+                for part in _partition_contiguously(sizes, num_file_shards)
+            )
+        return shards
+
     def get_scan_result_stream(
         self,
         scan_operation: ScanOperation,
@@ -90,10 +419,152 @@ class AcquisitionContext:
                 msg = f"Unsupported scan operation: {scan_operation}"
                 raise ValueError(msg)
 
+    def compile_expression(
+        self,
+        scan_operation: ScanOperation,
+        expression: AcquisitionExpression[Any],
+    ) -> AcquisitionExpression[Any]:
+        """Compile the parts of an expression duckdb could compute.
+
+        The largest subtrees duckdb could compute with the same results as
+        Python are replaced by fields computed by the query of the scan, the
+        rest of the expression being still evaluated in Python. A computed
+        value is null where the evaluation in Python would fail, in which case
+        reading it fails as well.
+        """
+        # Leaves are left as they are as well as constant subtrees, which are
+        # not worth computing for every row.
+        if (
+            not isinstance(expression, FieldExpression | LiteralExpression)
+            and recursive_get_dependent_fields(expression)
+            and _build_duckdb_computed_expression(
+                expression,
+                partial(_build_duckdb_placeholder_field_expression, scan_operation),
+            )
+            is not None
+        ):
+            return TransformExpression(
+                FieldExpression(self._get_computed_field(scan_operation.dataset, expression)),
+                _require_computed_value,
+            )
+        return replace_dependents(expression, partial(self.compile_expression, scan_operation))
+
+    def create_expression_cache(self, definition: object) -> ExpressionCache | None:
+        """Create the cache of the values of the expressions of a definition.
+
+        Only the last cache of each definition is held by the context, the
+        hits and misses of the previous ones being kept for the statistics.
+        """
+        if self.expression_cache_size is None:
+            return None
+        previous_cache = self._expression_caches.get(id(definition))
+        if previous_cache is not None:
+            previous_stats = previous_cache.get_stats()
+            stats = self._expression_cache_stats.get(id(definition), ExpressionCacheStats())
+            stats += ExpressionCacheStats(previous_stats.hits, previous_stats.misses)
+            self._expression_cache_stats[id(definition)] = stats
+        cache = ExpressionCache(self.expression_cache_size)
+        self._expression_caches[id(definition)] = cache
+        return cache
+
+    def create_deterministic_id_expression(
+        self,
+        scan_operation: ScanOperation,
+        components: Sequence[AcquisitionExpression[Any]],
+    ) -> AcquisitionExpression[str] | None:
+        """Create the expression of deterministic ids if they are enabled.
+
+        Ids are namespaced by the dataset and positioned by the path of the
+        file of the row, relative to the dataset, and the number of the row in
+        the file. Neither depends on how the dataset is sharded, so that items
+        acquired from different shards get the same ids as from the whole
+        dataset.
+        """
+        if not self.deterministic_ids:
+            return None
+        dataset = scan_operation.dataset
+        if dataset not in self._position_fields:
+            self._position_fields[dataset] = _create_position_field(dataset)
+        return DeterministicIdExpression(
+            namespace=dataset.id,
+            components=list(components),
+            position=FieldExpression(self._position_fields[dataset]),
+        )
+
+    def record_acquisition_failure(self, definition: object) -> None:
+        """Record an item of a definition which could not be acquired."""
+        if self.metrics is not None:
+            self.metrics.get_metrics(definition).failures += 1
+
+    def get_expression_cache_stats(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> ExpressionCacheStats:
+        """Get the statistics of the expression caches of a definition.
+
+        The hits and misses cover all the acquisitions of the definition by
+        this context so far, which helps tuning the size of the caches, and the
+        size is the one of the cache of its last acquisition.
+        """
+        stats = self._expression_cache_stats.get(id(definition), ExpressionCacheStats())
+        cache = self._expression_caches.get(id(definition))
+        return stats if cache is None else stats + cache.get_stats()
+
+    def _get_computed_field(
+        self,
+        dataset: type[Dataset],
+        expression: AcquisitionExpression[Any],
+    ) -> type["_ComputedField"]:
+        # The same field is returned for equal expressions so that the fields
+        # requested by a definition match the fields read by its converter.
+        key = (dataset, get_expression_key(expression))
+        if key not in self._computed_fields:
+            self._computed_fields[key] = _create_computed_field(dataset, expression, len(self._computed_fields))
+        return self._computed_fields[key]
+
     def get_acquisition_generators(self) -> Iterable[Iterable[NodeInfo] | Iterable[EdgeInfo]]:
         """Get the acquisition generators of all definitions registered."""
         for definition in self.node_definitions + self.edge_definitions:
-            yield definition.acquire(self)
+            yield self.get_acquisition_generator(definition)
+
+    def get_fused_acquisition_generators(self) -> Iterable[Iterable[FusedAcquisitionItem]]:
+        """Get acquisition generators that share scans between definitions.
+
+        Registered expression definitions scanning the same dataset in the same
+        fashion are grouped so that each group issues a single query over the
+        union of the fields they require. Every scanned item is fanned out to
+        the converter of each definition in the group. Definitions with
+        different predicates are routed by boolean columns computed in the same
+        query. Each generator yields pairs of the producing definition and the
+        acquired node or edge, interleaved in scan order.
+
+        When a limit is set, only definitions with identical predicates are
+        grouped so that each definition still receives the same rows as if it
+        was acquired on its own.
+
+        Definitions that cannot be fused are acquired on their own and their
+        output is tagged the same way.
+
+        When the context has a referential integrity checker, node and edge
+        definitions are not grouped together and the generators of the nodes
+        come first, so that all the nodes are recorded before any edge is
+        checked, as with `get_acquisition_generators`.
+        """
+        fused_groups, unfused_definitions = self._group_definitions_by_scan()
+        streams = [
+            *((group[0], self._get_fused_acquisition_stream(group)) for group in fused_groups),
+            *((definition, self._get_tagged_acquisition_stream(definition)) for definition in unfused_definitions),
+        ]
+        if self.referential_integrity_checker is not None:
+            # Stable sort, the streams of the nodes keep their order.
+            streams.sort(key=lambda stream: stream[0] not in self.node_definitions)
+        for _, stream in streams:
+            processed_stream = stream
+            if self.node_deduplicator is not None:
+                processed_stream = self._deduplicate_fused_stream(processed_stream)
+            if self.referential_integrity_checker is not None:
+                processed_stream = self._check_fused_stream(processed_stream)
+            yield processed_stream
 
     @overload
     def get_acquisition_generator(self, definition: AcquisitionDefinition[NodeInfo]) -> Iterable[NodeInfo]: ...
@@ -105,153 +576,1461 @@ class AcquisitionContext:
         self,
         definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
     ) -> Iterable[NodeInfo] | Iterable[EdgeInfo]:
-        """Get the acquisition generator for a registered definition."""
-        if definition not in self.node_definitions + self.edge_definitions:
-            msg = f"Definition {definition} was not registered."
+        """Get the acquisition generator for a registered definition.
+
+        Nodes already seen are dropped if the context has a deduplicator. Edges
+        are checked if the context has a referential integrity checker. If the
+        context has a result cache, items are acquired in batches which are
+        cached, see `get_acquisition_batch_generator`.
+        """
+        if self.result_cache is not None and definition in self.node_definitions + self.edge_definitions:
+            return chain.from_iterable(self.get_acquisition_batch_generator(definition))
+        if definition in self.node_definitions:
+            node_definition = cast("AcquisitionDefinition[NodeInfo]", definition)
+            nodes = node_definition.acquire(self)
+            if self.node_deduplicator is not None:
+                nodes = self.node_deduplicator.deduplicate(node_definition, nodes)
+            if self.referential_integrity_checker is not None:
+                nodes = self.referential_integrity_checker.record(nodes)
+            return nodes if self.metrics is None else self.metrics.instrument(node_definition, nodes)
+        if definition in self.edge_definitions:
+            edge_definition = cast("AcquisitionDefinition[EdgeInfo]", definition)
+            edges = edge_definition.acquire(self)
+            if self.referential_integrity_checker is not None:
+                edges = self.referential_integrity_checker.check(edge_definition, edges)
+            return edges if self.metrics is None else self.metrics.instrument(edge_definition, edges)
+        msg = f"Definition {definition} was not registered."
+        raise ValueError(msg)
+
+    @overload
+    def get_acquisition_batch_generator(
+        self,
+        definition: AcquisitionDefinition[NodeInfo],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterable[NodeBatch]: ...
+
+    @overload
+    def get_acquisition_batch_generator(
+        self,
+        definition: AcquisitionDefinition[EdgeInfo],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterable[EdgeBatch]: ...
+
+    def get_acquisition_batch_generator(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterable[NodeBatch] | Iterable[EdgeBatch]:
+        """Get the generator of batches of items for a registered definition.
+
+        Expression definitions convert scanned items directly into batches,
+        other definitions have their items grouped into batches. See
+        `NodeBatch` and `EdgeBatch`. Batches replayed from the result cache of
+        the context keep the size they were stored with.
+
+        Args:
+            definition (AcquisitionDefinition): The definition to acquire.
+            batch_size (int): The maximum number of items per batch.
+        """
+        if batch_size < 1:
+            msg = f"Batch size must be positive, got {batch_size}."
             raise ValueError(msg)
-        return definition.acquire(self)
+        if definition in self.node_definitions:
+            node_definition = cast("AcquisitionDefinition[NodeInfo]", definition)
+            batches = cast("Iterable[NodeBatch]", self._get_cached_batch_stream(node_definition, batch_size))
+            if self.node_deduplicator is not None:
+                batches = self.node_deduplicator.deduplicate_batches(node_definition, batches)
+            if self.referential_integrity_checker is not None:
+                batches = self.referential_integrity_checker.record_batches(batches)
+            return batches if self.metrics is None else self.metrics.instrument(node_definition, batches, len)
+        if definition in self.edge_definitions:
+            edge_definition = cast("AcquisitionDefinition[EdgeInfo]", definition)
+            edge_batches = cast("Iterable[EdgeBatch]", self._get_cached_batch_stream(edge_definition, batch_size))
+            if self.referential_integrity_checker is not None:
+                edge_batches = self.referential_integrity_checker.check_batches(edge_definition, edge_batches)
+            return edge_batches if self.metrics is None else self.metrics.instrument(edge_definition, edge_batches, len)
+        msg = f"Definition {definition} was not registered."
+        raise ValueError(msg)
+
+    def get_result_cache_key(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> str | None:
+        """Get the key of the result of a definition in the result cache.
+
+        Returns:
+            str | None: The key, or None if the context has no result cache or
+                the definition could not be cached.
+        """
+        if self.result_cache is None:
+            return None
+        files: list[str] = []
+        row_ranges: list[tuple[int, int] | None] = []
+        for dataset in sorted(definition.get_required_datasets(), key=lambda dataset: dataset.id):
+            shard = self.dataset_shards.get(dataset)
+            files.extend(self.get_dataset_files(dataset) if shard is None else shard.files)
+            row_ranges.append(None if shard is None else shard.row_range)
+        return self.result_cache.get_key(
+            definition,
+            files,
+            limit=self.limit,
+            deterministic_ids=self.deterministic_ids,
+            row_ranges=row_ranges,
+        )
+
+    def build_acquisition_query(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> AcquisitionQuery | None:
+        """Build the query computing the items of a definition in duckdb.
+
+        The query gives the same items as the converter of the definition,
+        rows for which the converter fails on a computed value being filtered
+        out. It is only built if all the expressions of the definition could be
+        computed by duckdb, see `compile_expression`, and its property keys
+        are literals. Random UUIDs are generated by duckdb as well.
+
+        Returns:
+            AcquisitionQuery | None: The query, or None if the definition could
+                not be computed by duckdb.
+        """
+        if not isinstance(definition, _ExpressionAcquisitionDefinition):
+            return None
+        scan_operation = definition.scan_operation
+        key_exprs = [
+            fold_constants(self.compile_expression(scan_operation, key_expr))
+            for key_expr, _ in definition._property_exprs  # noqa: SLF001
+        ]
+        keys = [key_expr.value for key_expr in key_exprs if isinstance(key_expr, LiteralExpression)]
+        if not all(isinstance(key, str) for key in keys) or len(set(keys)) < len(key_exprs):
+            return None
+        attribute_exprs = definition._get_attribute_expressions(self)  # noqa: SLF001
+        value_exprs = [
+            self.compile_expression(scan_operation, expression)
+            for expression in [*attribute_exprs, *(value_expr for _, value_expr in definition._property_exprs)]  # noqa: SLF001
+        ]
+        if not all(_is_output_expression(scan_operation, expression) for expression in value_exprs):
+            return None
+
+        requested_fields = list(
+            dict.fromkeys(field for expression in value_exprs for field in recursive_get_dependent_fields(expression)),
+        )
+        query, field_path_map = self._build_scan_query(scan_operation, requested_fields)
+        columns = query.columns
+
+        def build_field_expression(field: type[Field]) -> Expression:
+            path = field_path_map[field]
+            if isinstance(path, int):
+                return ColumnExpression(columns[path])
+            return _build_duckdb_field_expression([columns[cast("int", field_path_map[path[0]])]], path[1:])
+
+        required_columns: list[Expression] = []
+        selection: list[Expression] = []
+        for expression in value_exprs:
+            if isinstance(expression, TransformExpression):
+                required_columns.append(
+                    build_field_expression(cast("FieldExpression[Any]", expression.expression).field),
+                )
+            selection.append(_build_duckdb_output_expression(expression, build_field_expression))
+        if required_columns:
+            query = query.filter(reduce(lambda a, b: a & b, [column.isnotnull() for column in required_columns]))
+        attribute_columns = [f"{ATTRIBUTE_COLUMN_NAME}_{index}" for index in range(len(attribute_exprs))]
+        property_columns = {key: f"{PROPERTY_COLUMN_NAME}_{index}" for index, key in enumerate(keys)}
+        query = query.select(
+            *[
+                expression.alias(name)
+                for expression, name in zip(selection, [*attribute_columns, *property_columns.values()], strict=True)
+            ],
+        )
+        return AcquisitionQuery(query, attribute_columns, property_columns)
+
+    def _get_cached_batch_stream(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        batch_size: int,
+    ) -> Iterable[NodeBatch | EdgeBatch]:
+        """Get the batches of a definition, through the result cache if any."""
+        key = self.get_result_cache_key(definition)
+        if key is not None:
+            cached_batches = cast("ResultCache", self.result_cache).get(key)
+            if cached_batches is not None:
+                return cached_batches
+        if isinstance(definition, ExpressionNodeAcquisitionDefinition | ExpressionEdgeAcquisitionDefinition):
+            batches: Iterable[NodeBatch | EdgeBatch] = definition.acquire_batches(self, batch_size)
+        elif definition in self.node_definitions:
+            batches = batch_nodes(cast("AcquisitionDefinition[NodeInfo]", definition).acquire(self), batch_size)
+        else:
+            batches = batch_edges(cast("AcquisitionDefinition[EdgeInfo]", definition).acquire(self), batch_size)
+        if key is None:
+            return batches
+        return cast("ResultCache", self.result_cache).put(key, batches)
+
+    def _group_definitions_by_scan(
+        self,
+    ) -> tuple[list[list[_FusibleDefinition]], list[AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo]]]:
+        keys: list[tuple[Any, ...]] = []
+        groups: list[list[_FusibleDefinition]] = []
+        unfused_definitions: list[AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo]] = []
+        for definition in self.node_definitions + self.edge_definitions:
+            key = self._get_scan_fusion_key(definition)
+            if key is None:
+                unfused_definitions.append(definition)
+                continue
+            # Predicates are not guaranteed to be hashable, hence the linear
+            # search over a short list of keys.
+            if key in keys:
+                groups[keys.index(key)].append(cast("_FusibleDefinition", definition))
+            else:
+                keys.append(key)
+                groups.append([cast("_FusibleDefinition", definition)])
+        return groups, unfused_definitions
+
+    def _get_scan_fusion_key(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> tuple[Any, ...] | None:
+        if not isinstance(definition, _ExpressionAcquisitionDefinition):
+            return None
+        scan_operation = definition.scan_operation
+        match scan_operation:
+            case RowScanOperation():
+                key: tuple[Any, ...] = (RowScanOperation, scan_operation.dataset)
+            case ExplodingScanOperation():
+                key = (
+                    ExplodingScanOperation,
+                    scan_operation.dataset,
+                    scan_operation.exploded_field,
+                    scan_operation.element_predicate,
+                )
+            case _:
+                return None
+        if self.limit is not None:
+            key = (*key, scan_operation.predicate)
+        if self.referential_integrity_checker is not None:
+            key = (*key, definition in self.node_definitions)
+        return key
+
+    def _get_tagged_acquisition_stream(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> Iterable[FusedAcquisitionItem]:
+        for item in definition.acquire(self):
+            yield cast("FusedAcquisitionItem", (definition, item))
+
+    def _deduplicate_fused_stream(self, stream: Iterable[FusedAcquisitionItem]) -> Iterable[FusedAcquisitionItem]:
+        """Drop the nodes already seen from a stream of tagged items."""
+        node_deduplicator = cast("NodeDeduplicator", self.node_deduplicator)
+        iterator = iter(stream)
+        while batch := list(islice(iterator, node_deduplicator.batch_size)):
+            keep = [True] * len(batch)
+            node_indices = [index for index, (_, item) in enumerate(batch) if isinstance(item, NodeInfo)]
+            is_new = node_deduplicator.filter_tagged(
+                [cast("tuple[AcquisitionDefinition[NodeInfo], NodeInfo]", batch[index]) for index in node_indices],
+            )
+            for index, is_node_new in zip(node_indices, is_new, strict=True):
+                keep[index] = is_node_new
+            yield from (item for item, keep_item in zip(batch, keep, strict=True) if keep_item)
+
+    def _check_fused_stream(self, stream: Iterable[FusedAcquisitionItem]) -> Iterable[FusedAcquisitionItem]:
+        """Record the nodes and check the edges of a stream of tagged items.
+
+        The nodes of each chunk of the stream are recorded before its edges
+        are checked.
+        """
+        checker = cast("ReferentialIntegrityChecker", self.referential_integrity_checker)
+        iterator = iter(stream)
+        while batch := list(islice(iterator, checker.batch_size)):
+            checker.record_node_ids([item.id for _, item in batch if isinstance(item, NodeInfo)])
+            keep = [True] * len(batch)
+            edge_indices: dict[int, list[int]] = {}
+            for index, (definition, item) in enumerate(batch):
+                if isinstance(item, EdgeInfo):
+                    edge_indices.setdefault(id(definition), []).append(index)
+            for indices in edge_indices.values():
+                is_kept = checker.filter(
+                    cast("AcquisitionDefinition[EdgeInfo]", batch[indices[0]][0]),
+                    [cast("EdgeInfo", batch[index][1]) for index in indices],
+                )
+                for index, is_edge_kept in zip(indices, is_kept, strict=True):
+                    keep[index] = is_edge_kept
+            yield from (item for item, keep_item in zip(batch, keep, strict=True) if keep_item)
+
+    def _get_fused_acquisition_stream(
+        self,
+        definitions: Sequence[_FusibleDefinition],
+    ) -> Iterable[FusedAcquisitionItem]:
+        scan_operation, predicate_fields = self._create_fused_scan_operation(definitions)
+        requested_fields: list[type[Field]] = list(
+            dict.fromkeys(
+                field
+                for definition in definitions
+                for field in definition._get_required_fields(self)  # noqa: SLF001
+            ),
+        )
+        requested_fields.extend(predicate_fields)
+
+        routes = [
+            (
+                definition,
+                definition._create_converter(self),  # noqa: SLF001
+                next(
+                    (field for field in predicate_fields if field.predicate == definition.scan_operation.predicate),
+                    None,
+                ),
+            )
+            for definition in definitions
+        ]
+
+        for data in self.get_scan_result_stream(scan_operation, requested_fields):
+            for definition, convert, predicate_field in routes:
+                if predicate_field is not None and not data[predicate_field]:
+                    continue
+                try:
+                    yield cast("FusedAcquisitionItem", (definition, convert(data)))
+                except Exception:
+                    logger.exception("Failed to acquire from data: %s", data)
+
+    def _create_fused_scan_operation(
+        self,
+        definitions: Sequence[_FusibleDefinition],
+    ) -> tuple[ScanOperation, list[type["_PredicateField"]]]:
+        """Create the scan operation shared by the definitions of a group.
+
+        If the definitions do not share the same predicate, a predicate field is
+        created for each distinct predicate to route the scanned items and the
+        shared scan is filtered by the disjunction of the predicates.
+        """
+        reference_scan_operation = definitions[0].scan_operation
+        dataset = reference_scan_operation.dataset
+        predicates: list[ScanOperationPredicateExpression | None] = []
+        for definition in definitions:
+            if definition.scan_operation.predicate not in predicates:
+                predicates.append(definition.scan_operation.predicate)
+
+        predicate_fields: list[type[_PredicateField]] = []
+        shared_predicate = predicates[0]
+        if len(predicates) > 1:
+            predicate_fields = [
+                _create_predicate_field(dataset, predicate, index)
+                for index, predicate in enumerate(predicates)
+                if predicate is not None
+            ]
+            shared_predicate = (
+                OrExpression(cast("list[ScanOperationPredicateExpression]", predicates))
+                if None not in predicates
+                else None
+            )
+
+        if isinstance(reference_scan_operation, ExplodingScanOperation):
+            return (
+                ExplodingScanOperation(
+                    dataset=dataset,
+                    predicate=shared_predicate,
+                    exploded_field=reference_scan_operation.exploded_field,
+                    element_predicate=reference_scan_operation.element_predicate,
+                ),
+                predicate_fields,
+            )
+        return RowScanOperation(dataset=dataset, predicate=shared_predicate), predicate_fields
 
     def _get_row_scan_result_stream(
         self,
         scan_operation: RowScanOperation,
         requested_fields: Sequence[type[Field]],
     ) -> Iterable[DataView]:
-        dataset = scan_operation.dataset
-        top_fields, nested_fields = self._compute_field_hierarchy(requested_fields, TOP_FIELD_PATH_INDEX)
-        field_index_map = {field: index for index, field in enumerate(top_fields)}
-        field_path_map: dict[type[Field], int | Sequence[type[Field]]] = {
-            field: cast("Sequence[type[Field]]", field.path[TOP_FIELD_PATH_INDEX:]) for field in nested_fields
-        }
-        field_path_map.update(field_index_map)
-        query_result_stream = self._get_query_result(dataset, scan_operation.predicate, top_fields)
-        for data in query_result_stream:
-            yield SequenceBackedDataView(field_path_map, data, requested_fields)
+        """Get the scan result stream of a row scan."""
+        return self._get_data_view_stream(partial(self._build_row_scan_query, scan_operation), requested_fields)
 
     def _get_exploded_scan_result_stream(
         self,
         scan_operation: ExplodingScanOperation,
         requested_fields: Sequence[type[Field]],
     ) -> Iterable[DataView]:
+        """Get the scan result stream with the explosion done by the engine."""
+        return self._get_data_view_stream(partial(self._build_exploded_scan_query, scan_operation), requested_fields)
+
+    def _get_data_view_stream(
+        self,
+        build_query: Callable[
+            [Sequence[type[Field]]],
+            tuple[DuckDBPyRelation, dict[type[Field], int | Sequence[type[Field]]]],
+        ],
+        requested_fields: Sequence[type[Field]],
+    ) -> Iterable[DataView]:
+        """Build the query of a scan once started and wrap its rows.
+
+        The rows scanned and the time spent building the query, fetching the
+        rows and building their data views are recorded to the definition being
+        acquired, if any.
+        """
+        # Read once the stream is started, hence while its definition is the
+        # one being acquired.
+        metrics = None if self.metrics is None else self.metrics.active
+        if metrics is None:
+            query, field_path_map = build_query(requested_fields)
+            for data in self._get_query_result_stream(query):
+                yield SequenceBackedDataView(field_path_map, data, requested_fields)
+            return
+        clock = time.perf_counter
+        start_time = clock()
+        query, field_path_map = build_query(requested_fields)
+        metrics.fetch_time += clock() - start_time
+        for data in self._get_query_result_stream(query, metrics):
+            start_time = clock()
+            data_view = SequenceBackedDataView(field_path_map, data, requested_fields)
+            metrics.data_view_time += clock() - start_time
+            metrics.rows_scanned += 1
+            yield data_view
+
+    def _build_scan_query(
+        self,
+        scan_operation: ScanOperation,
+        requested_fields: Sequence[type[Field]],
+    ) -> tuple[DuckDBPyRelation, dict[type[Field], int | Sequence[type[Field]]]]:
+        """Build the query of a scan and the paths of the fields in it."""
+        match scan_operation:
+            case RowScanOperation():
+                return self._build_row_scan_query(scan_operation, requested_fields)
+            case ExplodingScanOperation():
+                return self._build_exploded_scan_query(scan_operation, requested_fields)
+            case _:
+                msg = f"Unsupported scan operation: {scan_operation}"
+                raise ValueError(msg)
+
+    def _build_row_scan_query(
+        self,
+        scan_operation: RowScanOperation,
+        requested_fields: Sequence[type[Field]],
+    ) -> tuple[DuckDBPyRelation, dict[type[Field], int | Sequence[type[Field]]]]:
+        """Build the query of a row scan and the paths of the fields in it.
+
+        Only the paths leading to the requested fields are projected so that
+        wide structs are not fetched as a whole when a few of their fields are
+        requested.
+        """
         dataset = scan_operation.dataset
-        exploded_field = scan_operation.exploded_field
-        required_fields = [exploded_field, *requested_fields]
-        top_fields, nested_fields = self._compute_field_hierarchy(required_fields, TOP_FIELD_PATH_INDEX)
-        field_index_map = {field: index for index, field in enumerate([*top_fields, exploded_field.element])}
-        nested_fields_above_exploded_field = [
-            field for field in nested_fields if len(field.path) <= len(exploded_field.path)
-        ]
-        nested_fields_under_exploded_field = [
-            field for field in nested_fields if len(field.path) > len(exploded_field.element.path)
-        ]
-        field_path_map: dict[type[Field], int | Sequence[type[Field]]] = {}
-        field_path_map.update(field_index_map)
-        field_path_map.update(
-            {
-                field: cast("Sequence[type[Field]]", field.path[TOP_FIELD_PATH_INDEX:])
-                for field in nested_fields_above_exploded_field
-            },
-        )
-        field_path_map.update(
-            {
-                field: cast("Sequence[type[Field]]", field.path[len(exploded_field.path) :])
-                for field in nested_fields_under_exploded_field
-            },
+        fields, computed_fields = _split_computed_fields(requested_fields)
+        projected_fields, field_path_map = _plan_projection(
+            [*fields, *_get_computed_field_dependencies(computed_fields, fields)],
+            TOP_FIELD_PATH_INDEX,
+            0,
         )
+        selection, field_path_map = _plan_computed_selection(field_path_map, fields, computed_fields)
+        return self._build_query(dataset, scan_operation.predicate, projected_fields, selection), field_path_map
 
-        if exploded_field.element.data_type in (OpenTargetsDatasetFieldType.ARRAY, OpenTargetsDatasetFieldType.STRUCT):
+    def _build_exploded_scan_query(
+        self,
+        scan_operation: ExplodingScanOperation,
+        requested_fields: Sequence[type[Field]],
+    ) -> tuple[DuckDBPyRelation, dict[type[Field], int | Sequence[type[Field]]]]:
+        """Build the query of an exploding scan and the paths of the fields.
 
-            def exploded_field_element_raw_data_getter(item: Any) -> Any:
-                return cast("DataViewProtocol", item).raw_data
-        else:
+        The exploded field, and every sequence it is nested under, is unnested
+        by the query engine so rows arrive already flattened. Fields under an
+        exploded element are projected from the element and the other fields
+        are projected from the row, in the same fashion as in a row scan.
+        """
+        dataset = scan_operation.dataset
+        exploded_sequences = _get_exploded_sequences(scan_operation.exploded_field)
+        fields, computed_fields = _split_computed_fields(requested_fields)
+        remaining_fields = [*fields, *_get_computed_field_dependencies(computed_fields, fields)]
+        fields_by_level: list[list[type[Field]]] = []
+        for sequence in reversed(exploded_sequences):
+            fields_by_level.insert(0, [field for field in remaining_fields if _is_under(field, sequence.element)])
+            remaining_fields = [field for field in remaining_fields if field not in fields_by_level[0]]
 
-            def exploded_field_element_raw_data_getter(item: Any) -> Any:
-                return item
-
-        for data in self._get_query_result(dataset, scan_operation.predicate, top_fields):
-            view = SequenceBackedDataView(field_path_map, data, required_fields)
-            sequence_data = cast("Sequence[DataView] | None", view[exploded_field])
-            if sequence_data is None:
-                yield SequenceBackedDataView(
-                    field_path_map,
-                    [*data, None],
-                    requested_fields,
-                )
-            else:
-                for item in sequence_data:
-                    yield SequenceBackedDataView(
-                        field_path_map,
-                        [*data, exploded_field_element_raw_data_getter(item)],
-                        requested_fields,
-                    )
+        projected_fields, field_path_map = _plan_projection(remaining_fields, TOP_FIELD_PATH_INDEX, 0)
+        projected_fields_by_level: list[list[type[Field]]] = []
+        offset = len(projected_fields)
+        for sequence, level_fields in zip(exploded_sequences, fields_by_level, strict=True):
+            level_projected_fields, level_field_path_map = _plan_projection(
+                level_fields,
+                len(sequence.element.path),
+                offset,
+            )
+            field_path_map.update(level_field_path_map)
+            projected_fields_by_level.append(level_projected_fields)
+            offset += len(level_projected_fields)
 
-    def _compute_field_hierarchy(
+        selection, field_path_map = _plan_computed_selection(field_path_map, fields, computed_fields)
+        query = self._build_exploded_query(
+            dataset,
+            scan_operation.predicate,
+            projected_fields,
+            exploded_sequences,
+            projected_fields_by_level,
+            scan_operation.element_predicate,
+            selection,
+        )
+        return query, field_path_map
+
+    def _build_query(
         self,
+        dataset: type[Dataset],
+        predicate: ScanOperationPredicateExpression | None,
         fields: Iterable[type[Field]],
-        starting_position: int,
-    ) -> tuple[list[type[Field]], list[type[Field]]]:
-        top_fields = list({cast("type[Field]", field.path[starting_position]) for field in fields})
-        nested_fields = [field for field in fields if field not in top_fields]
-        return top_fields, nested_fields
+        selection: Sequence[Expression] | None = None,
+    ) -> DuckDBPyRelation:
+        query = self._build_base_query(dataset, predicate)
+        query = query.select(
+            *[
+                self._build_duckdb_projection_expression(field, f"{PROJECTED_COLUMN_NAME}_{index}")
+                for index, field in enumerate(fields)
+            ],
+        )
+        if selection is not None:
+            query = query.select(*selection)
+        return query
 
-    def _get_query_result(
+    def _build_exploded_query(  # noqa: PLR0913, PLR0917
         self,
         dataset: type[Dataset],
         predicate: ScanOperationPredicateExpression | None,
-        fields: Iterable[type[Field]],
-    ) -> Iterable[tuple[Any]]:
-        query = read_parquet(str(self.get_dataset_path(dataset)), hive_partitioning=True)
+        fields: Sequence[type[Field]],
+        exploded_sequences: Sequence[type[SequenceField]],
+        element_fields_by_level: Sequence[Sequence[type[Field]]],
+        element_predicate: ScanOperationPredicateExpression | None = None,
+        selection: Sequence[Expression] | None = None,
+    ) -> DuckDBPyRelation:
+        """Build the query with the sequences exploded by chained unnests.
+
+        Each level unnests the next sequence from the element of the previous
+        level, projecting the requested fields of the previous element along
+        the way, so that only the current element is carried to the next level.
+        The element predicate is applied to the elements of the last level as
+        soon as they are unnested. Projected columns are named by their
+        position in the query result, in the same fashion as in a row scan.
+        """
+        query = self._build_base_query(dataset, predicate)
+        carried_columns = [
+            self._build_duckdb_projection_expression(field, f"{PROJECTED_COLUMN_NAME}_{index}")
+            for index, field in enumerate(fields)
+        ]
+        source: Sequence[str] = [field.name for field in exploded_sequences[0].path[TOP_FIELD_PATH_INDEX:]]
+        for level, sequence in enumerate(exploded_sequences):
+            element_column_name = f"{EXPLODED_ELEMENT_COLUMN_NAME}_{level}"
+            query = query.select(
+                *carried_columns,
+                FunctionExpression("unnest", _build_duckdb_sequence_expression(sequence, source)).alias(
+                    element_column_name,
+                ),
+            )
+            if element_predicate is not None and level + 1 == len(exploded_sequences):
+                query = query.filter(
+                    self._build_duckdb_filter_expression(
+                        None,
+                        element_predicate,
+                        partial(_build_duckdb_element_field_expression, element_column_name, sequence.element),
+                    ),
+                )
+            element_path_length = len(sequence.element.path)
+            projected_column_names = [
+                f"{PROJECTED_COLUMN_NAME}_{len(carried_columns) + index}"
+                for index in range(len(element_fields_by_level[level]))
+            ]
+            carried_columns = [
+                *[ColumnExpression(column.get_name()) for column in carried_columns],
+                *[
+                    _build_duckdb_field_expression(
+                        [element_column_name],
+                        cast("Sequence[type[Field]]", field.path[element_path_length:]),
+                    ).alias(column_name)
+                    for field, column_name in zip(element_fields_by_level[level], projected_column_names, strict=True)
+                ],
+            ]
+            if level + 1 < len(exploded_sequences):
+                source = [
+                    element_column_name,
+                    *[path_field.name for path_field in exploded_sequences[level + 1].path[element_path_length:]],
+                ]
+        query = query.select(*carried_columns)
+        if selection is not None:
+            query = query.select(*selection)
+        return query
+
+    def _build_base_query(
+        self,
+        dataset: type[Dataset],
+        predicate: ScanOperationPredicateExpression | None,
+    ) -> DuckDBPyRelation:
+        # Files are read by absolute paths so that their paths relative to the
+        # dataset could be told, see `_build_duckdb_position_expression`.
+        shard = self.dataset_shards.get(dataset)
+        query = self.connection.read_parquet(
+            str(self.get_dataset_path(dataset).absolute())
+            if shard is None
+            else [str(Path(file).absolute()) for file in shard.files],
+            hive_partitioning=True,
+            filename=True,
+            file_row_number=True,
+        )
+        if shard is not None and shard.row_range is not None:
+            start, stop = shard.row_range
+            query = query.filter(
+                (ColumnExpression(FILE_ROW_NUMBER_COLUMN_NAME) >= ConstantExpression(start))
+                & (ColumnExpression(FILE_ROW_NUMBER_COLUMN_NAME) < ConstantExpression(stop)),
+            )
 
         if predicate is not None:
             query = query.filter(self._build_duckdb_filter_expression(None, predicate))
 
-        query = query.select(*[field.name for field in fields])
-
         if self.limit is not None:
             query = query.limit(self.limit)
 
-        return self._get_query_result_stream(query)
+        return query
+
+    def _get_query_result_stream(
+        self,
+        query: DuckDBPyRelation,
+        metrics: DefinitionMetrics | None = None,
+    ) -> Iterable[tuple[Any]]:
+        if self.fetch_batch_size is None:
+            return self._get_query_result_row_stream(query, metrics)
+        return self._get_query_result_batch_stream(query, self.fetch_batch_size, metrics)
 
-    def _get_query_result_stream(self, query: DuckDBPyRelation) -> Iterable[tuple[Any]]:
-        # TODO(<Paul>): Proper logging here
-        # https://github.com/biocypher/open-targets/issues/72
+    def _get_query_result_row_stream(
+        self,
+        query: DuckDBPyRelation,
+        metrics: DefinitionMetrics | None,
+    ) -> Iterable[tuple[Any]]:
         retry = 0
         while True:
             try:
+                start_time = time.perf_counter() if metrics is not None else 0.0
                 item = cast("tuple[Any] | None", query.fetchone())
+                if metrics is not None:
+                    metrics.fetch_time += time.perf_counter() - start_time
                 if item is None:
                     break
                 retry = 0
                 yield item
             except Exception as e:
-                print(f"Error {e}")
-                if retry < 5:
-                    print(f"Retry {retry}")
+                if self._should_retry_fetch(e, retry, metrics):
+                    retry = retry + 1
+                    continue
+                break
+
+    def _get_query_result_batch_stream(
+        self,
+        query: DuckDBPyRelation,
+        batch_size: int,
+        metrics: DefinitionMetrics | None,
+    ) -> Iterable[tuple[Any]]:
+        # Same retry semantics as the row stream but a whole batch crosses the
+        # boundary of the query engine at once.
+        retry = 0
+        while True:
+            try:
+                start_time = time.perf_counter() if metrics is not None else 0.0
+                batch = cast("list[tuple[Any]]", query.fetchmany(batch_size))
+                if metrics is not None:
+                    metrics.fetch_time += time.perf_counter() - start_time
+            except Exception as e:  # noqa: BLE001
+                if self._should_retry_fetch(e, retry, metrics):
                     retry = retry + 1
                     continue
                 break
+            if not batch:
+                break
+            retry = 0
+            yield from batch
+
+    def _should_retry_fetch(self, error: Exception, retry: int, metrics: DefinitionMetrics | None) -> bool:
+        """Log a failed fetch and tell whether it should be retried."""
+        if metrics is not None:
+            metrics.failures += 1
+        if retry < MAX_FETCH_RETRY:
+            logger.warning("Failed to fetch from the query engine, retrying (%d): %s", retry, error)
+            return True
+        logger.error("Failed to fetch from the query engine, giving up: %s", error)
+        return False
+
+    def _build_duckdb_projection_expression(self, field: type[Field], alias: str) -> Expression:
+        if issubclass(field, _PredicateField):
+            expression: Expression = CoalesceOperator(
+                self._build_duckdb_filter_expression(None, field.predicate),
+                ConstantExpression(value=False),
+            )
+        elif issubclass(field, _PositionField):
+            expression = self._build_duckdb_position_expression(field.dataset)
+        else:
+            expression = _build_duckdb_field_expression(
+                [],
+                cast("Sequence[type[Field]]", field.path[TOP_FIELD_PATH_INDEX:]),
+            )
+        return expression.alias(alias)
+
+    def _build_duckdb_position_expression(self, dataset: type[Dataset]) -> Expression:
+        """Build the expression of the position of a row in its dataset.
+
+        The position is the path of the file of the row relative to the
+        dataset, or its name for a file out of the dataset, and the number of
+        the row in the file.
+        """
+        directory = f"{(Path(self.datasets_location) / dataset.id).absolute().as_posix()}/"
+        file_name = ColumnExpression(FILE_NAME_COLUMN_NAME)
+        relative_path = CaseExpression(
+            FunctionExpression("starts_with", file_name, ConstantExpression(directory)),
+            FunctionExpression("substr", file_name, ConstantExpression(len(directory) + 1)),
+        ).otherwise(FunctionExpression("parse_filename", file_name))
+        return FunctionExpression(
+            "concat",
+            relative_path,
+            ConstantExpression(":"),
+            ColumnExpression(FILE_ROW_NUMBER_COLUMN_NAME),
+        )
 
     def _build_duckdb_filter_expression(
         self,
         duckdb_expression: Expression | None,
         expression: ScanOperationPredicateExpression,
+        build_field_expression: Callable[[type[Field]], Expression] | None = None,
     ) -> Expression:
+        """Build the filter of a predicate.
+
+        Fields are resolved against the row unless a function building the
+        expressions of the fields is provided.
+        """
+        build_field_expression = build_field_expression or _build_duckdb_predicate_field_expression
         match expression:
-            case EqualityExpression():
-                if expression.value is None:
-                    return ColumnExpression(expression.field.name).isnull()
-                return ColumnExpression(expression.field.name) == ConstantExpression(expression.value)
+            case InExpression():
+                return self._build_duckdb_in_expression(expression, build_field_expression)
             case NotExpression():
-                return ~self._build_duckdb_filter_expression(duckdb_expression, expression.expression)
+                return ~self._build_duckdb_filter_expression(
+                    duckdb_expression,
+                    expression.expression,
+                    build_field_expression,
+                )
             case AndExpression():
                 return reduce(
                     lambda a, b: a & b,
-                    [self._build_duckdb_filter_expression(duckdb_expression, e) for e in expression.expressions],
+                    [
+                        self._build_duckdb_filter_expression(duckdb_expression, e, build_field_expression)
+                        for e in expression.expressions
+                    ],
                 )
             case OrExpression():
                 return reduce(
                     lambda a, b: a | b,
-                    [self._build_duckdb_filter_expression(duckdb_expression, e) for e in expression.expressions],
+                    [
+                        self._build_duckdb_filter_expression(duckdb_expression, e, build_field_expression)
+                        for e in expression.expressions
+                    ],
                 )
             case _:
-                msg = f"Unsupported predicate: {expression}"
-                raise ValueError(msg)
+                return _build_duckdb_field_predicate_expression(expression, build_field_expression)
+
+    def _build_duckdb_in_expression(
+        self,
+        expression: InExpression,
+        build_field_expression: Callable[[type[Field]], Expression],
+    ) -> Expression:
+        """Build the filter of a membership predicate.
+
+        Small sets are compared value by value, which duckdb could push into
+        the parquet reader. Large sets are registered as a temporary table,
+        shared by the scans filtering by the same set, and matched by a
+        subquery, which duckdb plans as a join. The subquery is
+        wrapped so that it is planned as a mark join, which keeps the order of
+        the rows, rather than as a semi join. A null is never a member of the
+        set.
+        """
+        field_expression = build_field_expression(expression.field)
+        values = list(dict.fromkeys(expression.values))
+        if not values:
+            return ConstantExpression(value=False)
+        if len(values) <= MAX_IN_SET_COMPARISON_SIZE:
+            return CoalesceOperator(
+                field_expression.isin(*[ConstantExpression(value) for value in values]),
+                ConstantExpression(value=False),
+            )
+        # Values equal across types, e.g. 1 and True, are told apart.
+        key = tuple((type(value), value) for value in values)
+        table_name = self._in_set_tables.get(key)
+        if table_name is None:
+            table_name = f"{IN_SET_TABLE_NAME}_{len(self._in_set_tables)}"
+            self.connection.execute(
+                f'CREATE TEMPORARY TABLE "{table_name}" AS SELECT unnest($values) AS value',
+                {"values": values},
+            )
+            self._in_set_tables[key] = table_name
+        return SQLExpression(f'coalesce({field_expression} IN (SELECT value FROM "{table_name}"), false)')  # noqa: S608
+
+
+def _build_duckdb_field_predicate_expression(
+    expression: ScanOperationPredicateExpression,
+    build_field_expression: Callable[[type[Field]], Expression],
+) -> Expression:
+    """Build the filter of a predicate on the value of a field."""
+    match expression:
+        case EqualityExpression(value=None):
+            return build_field_expression(expression.field).isnull()
+        case EqualityExpression():
+            return build_field_expression(expression.field) == ConstantExpression(expression.value)
+        case IsNotNullExpression():
+            return build_field_expression(expression.field).isnotnull()
+        case ComparisonExpression():
+            return _build_duckdb_comparison_expression(
+                build_field_expression(expression.field),
+                expression.operator,
+                ConstantExpression(expression.value),
+            )
+        case LikeExpression():
+            # `~~` is the function behind the LIKE operator, which the optimiser
+            # of duckdb rewrites into prefix or suffix matches.
+            return FunctionExpression(
+                "~~",
+                build_field_expression(expression.field),
+                ConstantExpression(expression.pattern),
+            )
+        case PrefixExpression():
+            return FunctionExpression(
+                "starts_with",
+                build_field_expression(expression.field),
+                ConstantExpression(expression.prefix),
+            )
+        case _:
+            msg = f"Unsupported predicate: {expression}"
+            raise ValueError(msg)
+
+
+def _build_duckdb_predicate_field_expression(field: type[Field]) -> Expression:
+    """Build the expression of a field a predicate applies to.
+
+    The field could be nested in structs but not in sequences as predicates
+    apply to rows.
+    """
+    path = cast("Sequence[type[Field]]", field.path[TOP_FIELD_PATH_INDEX:])
+    if any(issubclass(path_field, SequenceField) for path_field in path[:-1]):
+        msg = f"Predicates could not apply to fields nested in sequences: {field}"
+        raise ValueError(msg)
+    return _build_duckdb_field_expression([], path)
+
+
+def _build_duckdb_element_field_expression(
+    element_column_name: str,
+    element: type[Field],
+    field: type[Field],
+) -> Expression:
+    """Build the expression of a field an element predicate applies to.
+
+    The field must be the exploded element or nested in it through structs.
+    """
+    if not _is_under(field, element):
+        msg = f"Element predicates could only apply to fields of the exploded element {element}: {field}"
+        raise ValueError(msg)
+    path = cast("Sequence[type[Field]]", field.path[len(element.path) :])
+    if any(issubclass(path_field, SequenceField) for path_field in path[:-1]):
+        msg = f"Predicates could not apply to fields nested in sequences: {field}"
+        raise ValueError(msg)
+    return _build_duckdb_field_expression([element_column_name], path)
+
+
+def _build_duckdb_comparison_expression(
+    left: Expression,
+    operator: ComparisonOperator,
+    right: Expression,
+) -> Expression:
+    match operator:
+        case ComparisonOperator.LESS_THAN:
+            return left < right
+        case ComparisonOperator.LESS_THAN_OR_EQUAL:
+            return left <= right
+        case ComparisonOperator.GREATER_THAN:
+            return left > right
+        case ComparisonOperator.GREATER_THAN_OR_EQUAL:
+            return left >= right
+
+
+def _partition_contiguously(weights: Sequence[int], num_parts: int) -> list[range]:
+    """Partition items into contiguous runs of similar total weights.
+
+    Items are assigned to a part by the position of their midpoint within the
+    total weight. Parts left empty are dropped.
+    """
+    total_weight = sum(weights) or 1
+    boundaries = [0]
+    previous_part = 0
+    cumulative_weight = 0
+    for index, weight in enumerate(weights):
+        part = min(num_parts - 1, (2 * cumulative_weight + weight) * num_parts // (2 * total_weight))
+        if part != previous_part:
+            boundaries.append(index)
+            previous_part = part
+        cumulative_weight += weight
+    boundaries.append(len(weights))
+    return [range(start, stop) for start, stop in pairwise(boundaries) if start < stop]
+
+
+def _get_exploded_sequences(exploded_field: type[SequenceField]) -> list[type[SequenceField]]:
+    """Get the sequences to explode to reach the elements of the field.
+
+    These are the sequences the field is nested under, from the outermost, and
+    the field itself.
+    """
+    return [
+        cast("type[SequenceField]", field)
+        for field in exploded_field.path
+        if isinstance(field, type) and issubclass(field, SequenceField)
+    ]
+
+
+def _build_duckdb_sequence_expression(sequence: type[SequenceField], source: Sequence[str]) -> Expression:
+    """Build the expression of a sequence to be unnested.
+
+    A null sequence of primitives is replaced by a sequence of a single null so
+    that the row is kept with a null element. Null sequences of structs and
+    empty sequences yield no rows.
+    """
+    expression: Expression = ColumnExpression(*source)
+    if not issubclass(sequence.element, StructField):
+        expression = CoalesceOperator(expression, ConstantExpression([None]))
+    return expression
+
+
+def _is_under(field: type[Field], ancestor: type[Field]) -> bool:
+    """Whether the field is the ancestor itself or nested under it."""
+    return list(field.path[: len(ancestor.path)]) == list(ancestor.path)
+
+
+def _is_accessible_from(field: type[Field], ancestor: type[Field]) -> bool:
+    """Whether the field could be accessed by name from the ancestor.
+
+    This is the case if the field is the ancestor itself or is nested under it
+    through structs only.
+    """
+    return field is ancestor or (
+        _is_under(field, ancestor)
+        and not any(issubclass(path_field, SequenceField) for path_field in field.path[len(ancestor.path) - 1 : -1])
+    )
+
+
+def _has_raw_view_value(field: type[Field]) -> bool:
+    """Whether the field is presented as its raw value by data views."""
+    return not issubclass(field, StructField) and not (
+        issubclass(field, SequenceField) and issubclass(field.element, StructField)
+    )
+
+
+def _get_projection_target(field: type[Field], base_path_length: int) -> type[Field]:
+    """Get the field to project from a base to access the field.
+
+    The base is the row or an exploded element whose path has the given
+    length. This is the field itself unless a sequence is on its path, in which
+    case the outermost sequence is projected. Fields presented as raw values
+    are still projected by themselves by mapping the rest of the path over the
+    elements of the sequences, and are accessed as lists of values.
+    """
+    for path_field in field.path[base_path_length:-1]:
+        if issubclass(path_field, SequenceField):
+            return field if _has_raw_view_value(field) else cast("type[Field]", path_field)
+    return field
+
+
+def _plan_projection(
+    fields: Sequence[type[Field]],
+    base_path_length: int,
+    offset: int,
+) -> tuple[list[type[Field]], dict[type[Field], int | Sequence[type[Field]]]]:
+    """Plan the projection of fields from a base.
+
+    A field is not projected if it is accessible from another projected field,
+    in which case it is accessed by its path from that field.
+
+    Args:
+        fields: The fields to access.
+        base_path_length: The length of the path of the base, which is the row
+            or an exploded element, the fields are projected from.
+        offset: The index of the first projected field in the query result.
+
+    Returns:
+        The fields to project and the mapping of fields to their indices or
+        paths in the query result.
+    """
+    targets = {field: _get_projection_target(field, base_path_length) for field in fields}
+    projected_fields = [
+        target
+        for target in dict.fromkeys(targets.values())
+        if not any(other is not target and _is_accessible_from(target, other) for other in targets.values())
+    ]
+    field_path_map: dict[type[Field], int | Sequence[type[Field]]] = {}
+    for field, target in targets.items():
+        projected_field = next(candidate for candidate in projected_fields if _is_accessible_from(target, candidate))
+        field_path_map[projected_field] = offset + projected_fields.index(projected_field)
+        if field is not projected_field:
+            field_path_map[field] = cast("Sequence[type[Field]]", field.path[len(projected_field.path) - 1 :])
+    return projected_fields, field_path_map
+
+
+def _build_duckdb_field_expression(source: Sequence[str], path: Sequence[type[Field]], depth: int = 0) -> Expression:
+    """Build the expression accessing a field by its path from a column.
+
+    Structs on the path are accessed by name. If the path goes through the
+    element of a sequence, the rest of the path is mapped over the elements by
+    `list_transform`, resulting in a list of the values of the field.
+    """
+    names = list(source)
+    for index, path_field in enumerate(path):
+        names.append(path_field.name)
+        if issubclass(path_field, SequenceField) and index + 2 < len(path):
+            parameter_name = f"{LAMBDA_PARAMETER_NAME}_{depth}"
+            return FunctionExpression(
+                "list_transform",
+                ColumnExpression(*names),
+                LambdaExpression(
+                    parameter_name,
+                    _build_duckdb_field_expression([parameter_name], path[index + 2 :], depth + 1),
+                ),
+            )
+    return ColumnExpression(*names)
+
+
+class _PredicateField(ScalarField):
+    """Virtual boolean field computed from a predicate by the query engine."""
+
+    predicate: Final[ScanOperationPredicateExpression]
+
+
+def _create_predicate_field(
+    dataset: type[Dataset],
+    predicate: ScanOperationPredicateExpression,
+    index: int,
+) -> type[_PredicateField]:
+    field = cast("type[_PredicateField]", type(f"_PredicateField{index}", (_PredicateField,), {}))
+    field.name = f"__predicate_{index}"  # type: ignore[misc]
+    field.data_type = OpenTargetsDatasetFieldType.BOOLEAN  # type: ignore[misc]
+    field.dataset = dataset  # type: ignore[misc]
+    field.path = [dataset, field]  # type: ignore[misc]
+    field.predicate = predicate  # type: ignore[misc]
+    return field
+
+
+class _ComputedField(ScalarField):
+    """Virtual string field computed from an expression by the query engine."""
+
+    expression: Final[AcquisitionExpression[Any]]
+
+
+def _create_computed_field(
+    dataset: type[Dataset],
+    expression: AcquisitionExpression[Any],
+    index: int,
+) -> type[_ComputedField]:
+    field = cast("type[_ComputedField]", type(f"_ComputedField{index}", (_ComputedField,), {}))
+    field.name = f"{COMPUTED_FIELD_NAME}_{index}"  # type: ignore[misc]
+    field.data_type = OpenTargetsDatasetFieldType.STRING  # type: ignore[misc]
+    field.dataset = dataset  # type: ignore[misc]
+    field.path = [dataset, field]  # type: ignore[misc]
+    field.expression = expression  # type: ignore[misc]
+    return field
+
+
+class _PositionField(ScalarField):
+    """Virtual string field of the position of a row in its dataset."""
+
+
+def _create_position_field(dataset: type[Dataset]) -> type[_PositionField]:
+    field = cast("type[_PositionField]", type("_PositionField", (_PositionField,), {}))
+    field.name = POSITION_FIELD_NAME  # type: ignore[misc]
+    field.data_type = OpenTargetsDatasetFieldType.STRING  # type: ignore[misc]
+    field.dataset = dataset  # type: ignore[misc]
+    field.path = [dataset, field]  # type: ignore[misc]
+    return field
+
+
+def _require_computed_value(value: object) -> object:
+    if value is None:
+        msg = "Failed to compute the value of the expression."
+        raise ValueError(msg)
+    return value
+
+
+def _split_computed_fields(
+    fields: Sequence[type[Field]],
+) -> tuple[list[type[Field]], list[type[_ComputedField]]]:
+    return (
+        [field for field in fields if not issubclass(field, _ComputedField)],
+        [field for field in fields if issubclass(field, _ComputedField)],
+    )
+
+
+def _get_computed_field_dependencies(
+    computed_fields: Sequence[type[_ComputedField]],
+    fields: Sequence[type[Field]],
+) -> list[type[Field]]:
+    """Get the fields the computed fields depend on, other than the fields."""
+    dependencies = dict.fromkeys(
+        field
+        for computed_field in computed_fields
+        for field in sorted(
+            recursive_get_dependent_fields(computed_field.expression),
+            key=lambda field: [path_field.name for path_field in field.path[TOP_FIELD_PATH_INDEX:]],
+        )
+    )
+    return [field for field in dependencies if field not in fields]
+
+
+def _plan_computed_selection(
+    field_path_map: Mapping[type[Field], int | Sequence[type[Field]]],
+    fields: Sequence[type[Field]],
+    computed_fields: Sequence[type[_ComputedField]],
+) -> tuple[list[Expression] | None, dict[type[Field], int | Sequence[type[Field]]]]:
+    """Plan the selection of the query result computing fields.
+
+    The computed fields are appended to the columns projected for the fields,
+    while the columns only projected for computing fields are dropped.
+
+    Returns:
+        The columns to select from the projected columns, or None if there is
+        no computed field, and the mapping of fields to their indices or paths
+        in the query result.
+    """
+    if not computed_fields:
+        return None, dict(field_path_map)
+
+    def get_column_index(field: type[Field]) -> int:
+        path = field_path_map[field]
+        return path if isinstance(path, int) else cast("int", field_path_map[path[0]])
+
+    def build_field_expression(field: type[Field]) -> Expression:
+        path = field_path_map[field]
+        column_name = f"{PROJECTED_COLUMN_NAME}_{get_column_index(field)}"
+        if isinstance(path, int):
+            return ColumnExpression(column_name)
+        return _build_duckdb_field_expression([column_name], path[1:])
+
+    kept_column_indices = sorted({get_column_index(field) for field in fields})
+    selected_field_path_map: dict[type[Field], int | Sequence[type[Field]]] = {}
+    for field in fields:
+        path = field_path_map[field]
+        if isinstance(path, int):
+            selected_field_path_map[field] = kept_column_indices.index(path)
+        else:
+            selected_field_path_map[field] = path
+            selected_field_path_map[path[0]] = kept_column_indices.index(get_column_index(field))
+    selection: list[Expression] = [
+        ColumnExpression(f"{PROJECTED_COLUMN_NAME}_{index}") for index in kept_column_indices
+    ]
+    for computed_field in computed_fields:
+        selected_field_path_map[computed_field] = len(selection)
+        expression = _build_duckdb_computed_expression(computed_field.expression, build_field_expression)
+        if expression is None:
+            msg = f"Expression could not be computed by duckdb: {computed_field.expression}"
+            raise ValueError(msg)
+        selection.append(expression.alias(computed_field.name))
+    return selection, selected_field_path_map
+
+
+def _is_computable_field(scan_operation: ScanOperation, field: type[Field]) -> bool:
+    """Whether the value of a field could be read by the query of a scan.
+
+    The field must be a scalar of the scanned dataset whose path does not cross
+    any sequence other than the ones exploded by the scan.
+    """
+    if (
+        not issubclass(field, ScalarField)
+        or issubclass(field, _PredicateField | _ComputedField | _PositionField)
+        or field.dataset is not scan_operation.dataset
+    ):
+        return False
+    return _crosses_exploded_sequences_only(scan_operation, field)
+
+
+def _crosses_exploded_sequences_only(scan_operation: ScanOperation, field: type[Field]) -> bool:
+    """Whether the only sequences the path of a field crosses are exploded."""
+    exploded_sequences = (
+        _get_exploded_sequences(scan_operation.exploded_field)
+        if isinstance(scan_operation, ExplodingScanOperation)
+        else []
+    )
+    return all(
+        path_field in exploded_sequences
+        for path_field in field.path[TOP_FIELD_PATH_INDEX:-1]
+        if issubclass(path_field, SequenceField)
+    )
+
+
+def _is_output_expression(scan_operation: ScanOperation, expression: AcquisitionExpression[Any]) -> bool:
+    """Whether an expression compiled by a context could be output by duckdb.
+
+    Such an expression is a literal, a random UUID, a computed field, or a
+    scalar or sequence of scalars read by the query of the scan.
+    """
+    match expression:
+        case LiteralExpression():
+            return expression.value is None or isinstance(expression.value, str | int | float | bool)
+        case NewUuidExpression():
+            return True
+        case TransformExpression(expression=FieldExpression(field=field)) if (
+            expression.function is _require_computed_value
+        ):
+            return issubclass(field, _ComputedField)
+        case FieldExpression(field=field) if issubclass(field, SequenceField):
+            return (
+                issubclass(field.element, ScalarField)
+                and field.dataset is scan_operation.dataset
+                and _crosses_exploded_sequences_only(scan_operation, field)
+            )
+        case FieldExpression(field=field):
+            return _is_computable_field(scan_operation, field)
+        case _:
+            return False
+
+
+def _build_duckdb_output_expression(
+    expression: AcquisitionExpression[Any],
+    build_field_expression: Callable[[type[Field]], Expression],
+) -> Expression:
+    """Build the duckdb expression of an expression output by duckdb.
+
+    See `_is_output_expression`.
+    """
+    match expression:
+        case LiteralExpression(value=None):
+            # Untyped nulls would otherwise be taken as integers.
+            return ConstantExpression(None).cast(VARCHAR)
+        case LiteralExpression():
+            return ConstantExpression(expression.value)
+        case NewUuidExpression():
+            return FunctionExpression("uuid").cast(VARCHAR)
+        case TransformExpression(expression=FieldExpression(field=field)) | FieldExpression(field=field):
+            return build_field_expression(field)
+        case _:
+            msg = f"Expression could not be output by duckdb: {expression}"
+            raise ValueError(msg)
+
+
+def _build_duckdb_placeholder_field_expression(scan_operation: ScanOperation, field: type[Field]) -> Expression | None:
+    """Build a stand-in for a field to check if an expression is computable."""
+    return ColumnExpression(field.name) if _is_computable_field(scan_operation, field) else None
+
+
+def _build_duckdb_computed_expression(
+    expression: AcquisitionExpression[Any],
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    """Build the duckdb expression computing a string expression.
+
+    Only expressions whose results in duckdb and Python are the same are
+    supported. Nulls propagate where the evaluation in Python would fail, for
+    example when concatenating a null. Each kind of expression is built by its
+    builder in `_COMPUTED_EXPRESSION_BUILDERS`.
+
+    Returns:
+        The duckdb expression, or None if the expression is not supported or
+        depends on a field for which no expression could be built.
+    """
+    build = _COMPUTED_EXPRESSION_BUILDERS.get(type(expression))
+    return None if build is None else build(expression, build_field_expression)
+
+
+def _build_duckdb_computed_field_expression(
+    expression: FieldExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    if expression.field.data_type != OpenTargetsDatasetFieldType.STRING:
+        return None
+    return build_field_expression(expression.field)
+
+
+def _build_duckdb_computed_literal_expression(
+    expression: LiteralExpression[Any],
+    _: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    return ConstantExpression(expression.value) if isinstance(expression.value, str) else None
+
+
+def _build_duckdb_computed_to_string_expression(
+    expression: ToStringExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    return _build_duckdb_to_string_expression(expression.expression, build_field_expression)
+
+
+def _build_duckdb_concatenation_expression(
+    expression: StringConcatenationExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    operands = [_build_duckdb_computed_expression(e, build_field_expression) for e in expression.expressions]
+    if any(operand is None for operand in operands):
+        return None
+    if not operands:
+        return ConstantExpression("")
+    # Unlike `concat`, the operator propagates nulls.
+    return reduce(lambda a, b: FunctionExpression("||", a, b), cast("list[Expression]", operands))
+
+
+def _build_duckdb_lower_expression(
+    expression: StringLowerExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    operand = _build_duckdb_computed_expression(expression.expression, build_field_expression)
+    return None if operand is None else FunctionExpression("lower", operand)
+
+
+def _build_duckdb_substring_expression(
+    expression: ExtractSubstringExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    separator = expression.separator
+    if not isinstance(separator, LiteralExpression) or not isinstance(separator.value, str) or not separator.value:
+        return None
+    operand = _build_duckdb_computed_expression(expression.expression, build_field_expression)
+    if operand is None:
+        return None
+    # Lists of duckdb are indexed from 1, negative indices being the same as
+    # in Python. Indices out of range result in null.
+    index = expression.index + 1 if expression.index >= 0 else expression.index
+    return FunctionExpression(
+        "list_extract",
+        FunctionExpression("string_split", operand, ConstantExpression(separator.value)),
+        ConstantExpression(index),
+    )
+
+
+def _build_duckdb_hash_expression(
+    expression: StringHashExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    if expression.algorithm != HashAlgorithm.xxh3:
+        return None
+    return _build_duckdb_function_expression(XXH3_FUNCTION_NAME, [expression.expression], build_field_expression)
+
+
+def _build_duckdb_normalise_curie_expression(
+    expression: NormaliseCurieExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    return _build_duckdb_function_expression(
+        NORMALISE_CURIE_FUNCTION_NAME,
+        [expression.expression],
+        build_field_expression,
+    )
+
+
+def _build_duckdb_curie_prefix_expression(
+    expression: ExtractCuriePrefixExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    # A normalised prefix is None if the prefix is unknown, which could not be
+    # told apart from a failure.
+    if expression.normalise:
+        return None
+    return _build_duckdb_function_expression(
+        EXTRACT_CURIE_PREFIX_FUNCTION_NAME,
+        [expression.expression],
+        build_field_expression,
+    )
+
+
+def _build_duckdb_curie_expression(
+    expression: BuildCurieExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    if expression.normalise:
+        return _build_duckdb_function_expression(
+            BUILD_NORMALISED_CURIE_FUNCTION_NAME,
+            [expression.prefix, expression.reference],
+            build_field_expression,
+        )
+    # Parts are formatted in the same way as by `str`.
+    operands = [
+        _build_duckdb_to_string_expression(e, build_field_expression) for e in [expression.prefix, expression.reference]
+    ]
+    if operands[0] is None or operands[1] is None:
+        return None
+    return FunctionExpression("||", FunctionExpression("||", operands[0], ConstantExpression(":")), operands[1])
+
+
+def _build_duckdb_function_expression(
+    function_name: str,
+    expressions: Sequence[AcquisitionExpression[Any]],
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    """Build the call of a function registered by `register_functions`."""
+    operands = [_build_duckdb_computed_expression(e, build_field_expression) for e in expressions]
+    if any(operand is None for operand in operands):
+        return None
+    return _propagate_failures(
+        FunctionExpression(function_name, *cast("list[Expression]", operands)),
+        expressions,
+        cast("list[Expression]", operands),
+    )
+
+
+def _propagate_failures(
+    expression: Expression,
+    sources: Sequence[AcquisitionExpression[Any]],
+    operands: Sequence[Expression],
+) -> Expression:
+    """Make an expression null if any of its computed operands failed.
+
+    A null operand computed from a field is a value given to the expression
+    as it is, while a null operand computed otherwise is a failure which must
+    propagate.
+    """
+    failures = [
+        operand.isnull()
+        for source, operand in zip(sources, operands, strict=True)
+        if not isinstance(source, FieldExpression | LiteralExpression)
+    ]
+    if not failures:
+        return expression
+    return CaseExpression(reduce(lambda a, b: a | b, failures), ConstantExpression(None)).otherwise(expression)
+
+
+def _build_duckdb_to_string_expression(
+    expression: AcquisitionExpression[Any],
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    match expression:
+        case LiteralExpression():
+            return ConstantExpression(str(expression.value))
+        case FieldExpression() if expression.field.data_type in {
+            OpenTargetsDatasetFieldType.STRING,
+            OpenTargetsDatasetFieldType.INTEGER,
+        }:
+            field_expression = build_field_expression(expression.field)
+            if field_expression is None:
+                return None
+            # `str` formats a null as `None`.
+            return CoalesceOperator(field_expression.cast(VARCHAR), ConstantExpression("None"))
+        case _:
+            return _build_duckdb_computed_expression(expression, build_field_expression)
+
+
+def _build_duckdb_licence_expression(
+    licence_expression: DataSourceToLicenceExpression,
+    build_field_expression: Callable[[type[Field]], Expression | None],
+) -> Expression | None:
+    expression = licence_expression.datasource
+    operand = _build_duckdb_computed_expression(expression, build_field_expression)
+    if operand is None:
+        return None
+    cases = [
+        (operand == ConstantExpression(datasource), ConstantExpression(str(licence)))
+        for datasource, licence in DATASOURCE_LICENSES.items()
+    ]
+    case_expression = CaseExpression(*cases[0])
+    for condition, value in cases[1:]:
+        case_expression = case_expression.when(condition, value)
+    return _propagate_failures(
+        case_expression.otherwise(ConstantExpression(str(License.UNKNOWN))),
+        [expression],
+        [operand],
+    )
+
+
+_COMPUTED_EXPRESSION_BUILDERS: Final[Mapping[type[AcquisitionExpression[Any]], _ComputedExpressionBuilder]] = {
+    FieldExpression: _build_duckdb_computed_field_expression,
+    LiteralExpression: _build_duckdb_computed_literal_expression,
+    ToStringExpression: _build_duckdb_computed_to_string_expression,
+    StringConcatenationExpression: _build_duckdb_concatenation_expression,
+    StringLowerExpression: _build_duckdb_lower_expression,
+    ExtractSubstringExpression: _build_duckdb_substring_expression,
+    DataSourceToLicenceExpression: _build_duckdb_licence_expression,
+    StringHashExpression: _build_duckdb_hash_expression,
+    NormaliseCurieExpression: _build_duckdb_normalise_curie_expression,
+    ExtractCuriePrefixExpression: _build_duckdb_curie_prefix_expression,
+    BuildCurieExpression: _build_duckdb_curie_expression,
+}
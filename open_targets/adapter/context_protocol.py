@@ -2,9 +2,11 @@
 
 from collections.abc import Iterable, Sequence
 from pathlib import Path
-from typing import Protocol
+from typing import Any, Protocol
 
 from open_targets.adapter.data_view import DataView
+from open_targets.adapter.expression import Expression
+from open_targets.adapter.expression_cache import ExpressionCache
 from open_targets.adapter.scan_operation import ScanOperation
 from open_targets.data.schema_base import Dataset, Field
 
@@ -35,3 +37,45 @@ class AcquisitionContextProtocol(Protocol):
         guaranteed.
         """
         ...
+
+    def compile_expression(self, scan_operation: ScanOperation, expression: Expression[Any]) -> Expression[Any]:
+        """Compile the parts of an expression the query engine could compute.
+
+        The compiled expression evaluates to the same values as the original
+        one over the items of the scan operation. The subtrees computed by the
+        query engine are replaced by fields which must be requested from the
+        scan along with the other fields the compiled expression depends on. A
+        context without such ability returns the expression unchanged.
+        """
+        ...
+
+    def create_expression_cache(self, definition: object) -> ExpressionCache | None:
+        """Create the cache of the values of the expressions of a definition.
+
+        A definition creates a cache each time it builds the functions
+        evaluating its expressions. A context without caching returns None.
+        """
+        ...
+
+    def create_deterministic_id_expression(
+        self,
+        scan_operation: ScanOperation,
+        components: Sequence[Expression[Any]],
+    ) -> Expression[str] | None:
+        """Create the expression generating ids deterministically, if enabled.
+
+        Definitions whose ids are random, i.e. `NewUuidExpression`, use it
+        instead so that the same ids are generated across identical runs. The
+        components are the expressions identifying the items, e.g. the label,
+        source and target of edges. A context without deterministic ids
+        returns None.
+        """
+        ...
+
+    def record_acquisition_failure(self, definition: object) -> None:
+        """Record an item of a definition which could not be acquired.
+
+        Definitions call it for each scanned item whose conversion raised,
+        after logging the error. A context without instrumentation ignores it.
+        """
+        ...
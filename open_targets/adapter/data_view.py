@@ -148,22 +148,25 @@ class SequenceBackedDataView(DataViewProtocol, DataView):
 
     def _deep_create_view_value(
         self,
-        data: Any,
+        data: Sequence[Any],
         path: Sequence[type[Field]],
     ) -> DataViewValue:
-        field = cast("type[Field]", None)
-        for field in path:
-            if data is None:
-                break
-
-            if isinstance(data, Mapping):
-                data = data[field.name]
-            elif isinstance(data, Sequence):
-                data = data[cast("int", self._field_path_mapping[field])]
-            else:
-                msg = f"Path {path} involves non-container field {field} in the middle."
+        """Resolve a path of fields against the data.
+
+        The first field of the path is mapped to an index of the sequence and
+        the rest are resolved by name through nested structures of any depth.
+        If any value on the path is null, the value of the field is null.
+        """
+        head, *tail = path
+        value = data[cast("int", self._field_path_mapping[head])]
+        for field in tail:
+            if value is None:
+                return _create_view_value(None, path[-1])
+            if not isinstance(value, Mapping):
+                msg = f"Path {path} involves non-struct field before {field}."
                 raise KeyError(msg)
-        return _create_view_value(data, field)
+            value = cast("Mapping[str, Any]", value)[field.name]
+        return _create_view_value(value, path[-1])
 
     @property
     def raw_data(self) -> Any:
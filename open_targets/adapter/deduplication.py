@@ -0,0 +1,292 @@
+"""Streaming deduplication of nodes across definitions."""
+
+import logging
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
+from os import PathLike
+from pathlib import Path
+from types import TracebackType
+from typing import Final
+
+import numpy as np
+import numpy.typing as npt
+import xxhash
+from typing_extensions import Self
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition
+from open_targets.adapter.output import DEFAULT_BATCH_SIZE, NodeBatch, NodeInfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET = 64 << 20
+DIGEST_SIZE = 8
+KEY_SEPARATOR = "\x1f"
+
+Digests = npt.NDArray[np.uint64]
+
+
+class DigestSet:
+    """A set of 64-bit digests bounded in memory.
+
+    Digests are held in sorted runs of 8 bytes per digest. Runs are merged as
+    they are added so that there are few of them to search. Once the runs in
+    memory exceed the memory budget, they are merged into a single run which is
+    spilled to disk and memory-mapped, so that only the pages searched are
+    loaded.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        spill_directory: str | PathLike[str] | None = None,
+    ) -> None:
+        """Initialize the set.
+
+        Args:
+            memory_budget (int): The size in bytes of the digests held in
+                memory above which they are spilled to disk.
+            spill_directory (str | PathLike[str] | None): The directory under
+                which runs are spilled. If None, the default temporary
+                directory is used.
+        """
+        if memory_budget < DIGEST_SIZE:
+            msg = f"Memory budget must hold at least a digest, got {memory_budget}."
+            raise ValueError(msg)
+        self.memory_budget: Final[int] = memory_budget
+        self.spill_directory: Final[str | PathLike[str] | None] = spill_directory
+        self._memory_runs: list[Digests] = []
+        self._spilled_runs: list[Digests] = []
+        self._spill_path: Path | None = None
+
+    def __enter__(self) -> Self:
+        """Enter the runtime context of the set."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the set when leaving the runtime context."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Get the number of digests in the set."""
+        return sum(len(run) for run in self._memory_runs + self._spilled_runs)
+
+    @property
+    def num_spilled_runs(self) -> int:
+        """The number of runs spilled to disk."""
+        return len(self._spilled_runs)
+
+    def contains(self, digests: Digests) -> npt.NDArray[np.bool_]:
+        """Tell which digests are in the set."""
+        unique_digests, inverse = np.unique(digests, return_inverse=True)
+        found = np.zeros(len(unique_digests), dtype=np.bool_)
+        for run in self._memory_runs + self._spilled_runs:
+            found |= _contains(run, unique_digests)
+        return found[inverse]
+
+    def add(self, digests: Digests) -> npt.NDArray[np.bool_]:
+        """Add digests to the set.
+
+        Returns:
+            npt.NDArray[np.bool_]: Whether each digest was added, i.e. it was
+                neither in the set nor earlier in the digests given.
+        """
+        unique_digests, first_indices = np.unique(digests, return_index=True)
+        is_new = np.ones(len(unique_digests), dtype=np.bool_)
+        for run in self._memory_runs + self._spilled_runs:
+            is_new &= ~_contains(run, unique_digests)
+        added = np.zeros(len(digests), dtype=np.bool_)
+        added[first_indices[is_new]] = True
+        if is_new.any():
+            self._add_run(unique_digests[is_new])
+        return added
+
+    def close(self) -> None:
+        """Remove the runs of the set, including those spilled to disk."""
+        self._memory_runs.clear()
+        self._spilled_runs.clear()
+        if self._spill_path is not None:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+
+    def _add_run(self, run: Digests) -> None:
+        runs = self._memory_runs
+        runs.append(run)
+        # Runs are merged while the previous run is not much larger, keeping
+        # a logarithmic number of runs for a linearithmic cost of merging.
+        while len(runs) > 1 and len(runs[-2]) <= 2 * len(runs[-1]):
+            last = runs.pop()
+            runs.append(_merge(runs.pop(), last))
+        if sum(len(run) for run in runs) * DIGEST_SIZE > self.memory_budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        run = self._memory_runs[0]
+        for other_run in self._memory_runs[1:]:
+            run = _merge(run, other_run)
+        if self._spill_path is None:
+            self._spill_path = Path(tempfile.mkdtemp(prefix="open-targets-digests-", dir=self.spill_directory))
+        path = self._spill_path / f"{len(self._spilled_runs)}.npy"
+        np.save(path, run)
+        self._spilled_runs.append(np.load(path, mmap_mode="r"))
+        self._memory_runs.clear()
+
+
+class NodeDeduplicator:
+    """Deduplicator of nodes by label and id across definitions.
+
+    Nodes are keyed by the 64-bit xxh3 digest of their label and id, held in a
+    `DigestSet`. A node is kept the first time its key is seen, whichever the
+    definition, and dropped afterwards. The number of nodes dropped is counted
+    per definition. With 64-bit digests, distinct nodes are mistaken for
+    duplicates with a probability of about n^2 / 2^65 for n distinct nodes,
+    i.e. less than one in a million for 6 million nodes.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        spill_directory: str | PathLike[str] | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Initialize the deduplicator.
+
+        Args:
+            memory_budget (int): See `DigestSet`.
+            spill_directory (str | PathLike[str] | None): See `DigestSet`.
+            batch_size (int): The number of nodes looked up at a time when
+                deduplicating streams of nodes.
+        """
+        if batch_size < 1:
+            msg = f"Batch size must be positive, got {batch_size}."
+            raise ValueError(msg)
+        self.batch_size: Final[int] = batch_size
+        self._digests: Final[DigestSet] = DigestSet(memory_budget, spill_directory)
+        # Definitions are not hashable, so their counts are keyed by identity.
+        self._duplicate_counts: dict[int, int] = {}
+
+    def __enter__(self) -> Self:
+        """Enter the runtime context of the deduplicator."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the deduplicator when leaving the runtime context."""
+        self.close()
+
+    def close(self) -> None:
+        """Forget the nodes seen, removing any of them spilled to disk."""
+        self._digests.close()
+
+    def get_duplicate_count(self, definition: AcquisitionDefinition[NodeInfo]) -> int:
+        """Get the number of nodes of a definition dropped so far."""
+        return self._duplicate_counts.get(id(definition), 0)
+
+    def filter(
+        self,
+        definition: AcquisitionDefinition[NodeInfo],
+        labels: Sequence[str],
+        ids: Sequence[str],
+    ) -> list[bool]:
+        """Mark the nodes of a definition seen and tell which are new.
+
+        Returns:
+            list[bool]: Whether each node is kept, i.e. it was not seen before.
+        """
+        is_new = self._add(labels, ids)
+        self._duplicate_counts[id(definition)] = self.get_duplicate_count(definition) + len(ids) - int(is_new.sum())
+        return is_new.tolist()
+
+    def filter_tagged(self, tagged_nodes: Sequence[tuple[AcquisitionDefinition[NodeInfo], NodeInfo]]) -> list[bool]:
+        """Mark nodes of any definitions seen and tell which are new.
+
+        Returns:
+            list[bool]: Whether each node is kept, i.e. it was not seen before.
+        """
+        is_new = self._add([node.label for _, node in tagged_nodes], [node.id for _, node in tagged_nodes]).tolist()
+        for (definition, _), keep in zip(tagged_nodes, is_new, strict=True):
+            if not keep:
+                self._duplicate_counts[id(definition)] = self.get_duplicate_count(definition) + 1
+        return is_new
+
+    def deduplicate(
+        self,
+        definition: AcquisitionDefinition[NodeInfo],
+        nodes: Iterable[NodeInfo],
+    ) -> Iterator[NodeInfo]:
+        """Drop the nodes of a stream already seen."""
+        iterator = iter(nodes)
+        while batch := list(islice(iterator, self.batch_size)):
+            is_new = self.filter(definition, [node.label for node in batch], [node.id for node in batch])
+            yield from (node for node, keep in zip(batch, is_new, strict=True) if keep)
+        self._log_duplicate_count(definition)
+
+    def deduplicate_batches(
+        self,
+        definition: AcquisitionDefinition[NodeInfo],
+        batches: Iterable[NodeBatch],
+    ) -> Iterator[NodeBatch]:
+        """Drop the nodes of a stream of batches already seen.
+
+        Batches left empty are not yielded.
+        """
+        for batch in batches:
+            is_new = self.filter(definition, batch.labels, batch.ids)
+            if all(is_new):
+                yield batch
+                continue
+            deduplicated_batch = NodeBatch(batch.property_keys)
+            for keep, id, label, values in zip(  # noqa: A001
+                is_new,
+                batch.ids,
+                batch.labels,
+                batch.property_values,
+                strict=True,
+            ):
+                if keep:
+                    deduplicated_batch.append(id, label, values)
+            if deduplicated_batch:
+                yield deduplicated_batch
+        self._log_duplicate_count(definition)
+
+    def _add(self, labels: Sequence[str], ids: Sequence[str]) -> npt.NDArray[np.bool_]:
+        return self._digests.add(
+            hash_keys([f"{label}{KEY_SEPARATOR}{node_id}" for label, node_id in zip(labels, ids, strict=True)]),
+        )
+
+    def _log_duplicate_count(self, definition: AcquisitionDefinition[NodeInfo]) -> None:
+        logger.info(
+            "Dropped %d duplicate nodes of %s so far.",
+            self.get_duplicate_count(definition),
+            definition,
+        )
+
+
+def hash_keys(keys: Sequence[str]) -> Digests:
+    """Get the 64-bit xxh3 digests of keys."""
+    return np.fromiter((xxhash.xxh3_64_intdigest(key.encode()) for key in keys), dtype=np.uint64, count=len(keys))
+
+
+def _contains(run: Digests, digests: Digests) -> npt.NDArray[np.bool_]:
+    """Tell which sorted digests are in a sorted run."""
+    indices = np.searchsorted(run, digests)
+    found = indices < len(run)
+    found[found] = run[indices[found]] == digests[found]
+    return found
+
+
+def _merge(run: Digests, other_run: Digests) -> Digests:
+    """Merge two sorted runs of distinct digests."""
+    merged = np.concatenate((run, other_run))
+    merged.sort(kind="stable")
+    return merged
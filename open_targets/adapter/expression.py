@@ -53,10 +53,20 @@ class LiteralExpression(Expression[TValue]):
 
 @dataclass(frozen=True)
 class TransformExpression(HasDependentExpressionMixin, Expression[TValue]):
-    """Expression that transforms values using a custom function."""
+    """Expression that transforms values using a custom function.
+
+    The function should be defined at module level rather than as a lambda or
+    a closure so that definitions using it could be pickled, for instance to
+    be acquired in worker processes.
+
+    The function is assumed to be pure, i.e. to always return the same value
+    for the same input without side effects, so that its values could be
+    cached. Otherwise, `pure` should be set to False.
+    """
 
     expression: Expression[Any] | None
     function: Callable[[Any], TValue]
+    pure: bool = True
 
     @property
     def dependents(self) -> Sequence[Expression[Any]]:
@@ -69,6 +79,30 @@ class NewUuidExpression(Expression[str]):
     """Expression that generates a new UUID."""
 
 
+@dataclass(frozen=True)
+class DeterministicIdExpression(HasDependentExpressionMixin, Expression[str]):
+    """Expression that generates an id deterministically.
+
+    The id is a hash of the namespace, the values of the components, the
+    position of the item and its ordinal among the consecutive items at the
+    same position. Unlike `NewUuidExpression`, the same ids are generated
+    across runs evaluating the same values at the same positions. Positions,
+    e.g. the file and row number of the row giving an item, tell apart the
+    items having the same values, the ordinal telling apart the items of a row,
+    such as exploded elements. Without a position, the ordinal of the
+    evaluation is used.
+    """
+
+    namespace: str
+    components: Sequence[Expression[Any]]
+    position: Expression[Any] | None = None
+
+    @property
+    def dependents(self) -> Sequence[Expression[Any]]:
+        """The dependent expressions."""
+        return [*self.components, self.position] if self.position is not None else self.components
+
+
 class HashAlgorithm(str, Enum):
     """The algorithm to use for hashing."""
 
@@ -0,0 +1,80 @@
+"""Caches of the values of pure expressions."""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import _lru_cache_wrapper, lru_cache
+from typing import Any, Final, TypeVar
+
+DEFAULT_EXPRESSION_CACHE_SIZE = 4096
+
+TValue = TypeVar("TValue")
+
+
+@dataclass(frozen=True)
+class ExpressionCacheStats:
+    """Statistics of the caches of the values of expressions.
+
+    Attributes:
+        hits: The number of values found in the caches.
+        misses: The number of values computed and added to the caches.
+        size: The number of values currently held by the caches.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The proportion of lookups found in the caches, 0 if none."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __add__(self, other: "ExpressionCacheStats") -> "ExpressionCacheStats":
+        """Combine the statistics of two sets of caches."""
+        return ExpressionCacheStats(self.hits + other.hits, self.misses + other.misses, self.size + other.size)
+
+
+class ExpressionCache:
+    """Bounded caches of the values computed by pure expression functions.
+
+    Each function wrapped by the cache gets its own least recently used cache
+    of its values keyed by its arguments and their types, so that equal
+    arguments of different types such as 1 and True do not share values.
+    Calls with unhashable arguments are not cached and calls raising an error
+    are evaluated again next time.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_EXPRESSION_CACHE_SIZE) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_size (int): The maximum number of values cached per function.
+        """
+        if max_size < 1:
+            msg = f"Expression cache size must be positive, got {max_size}."
+            raise ValueError(msg)
+        self.max_size: Final[int] = max_size
+        self._functions: list[_lru_cache_wrapper[Any]] = []
+
+    def wrap(self, function: Callable[..., TValue]) -> Callable[..., TValue]:
+        """Wrap a function so that its values are cached."""
+        cached_function = lru_cache(maxsize=self.max_size, typed=True)(function)
+        self._functions.append(cached_function)
+
+        def evaluate(*arguments: object) -> TValue:
+            try:
+                hash(arguments)
+            except TypeError:
+                return function(*arguments)
+            return cached_function(*arguments)
+
+        return evaluate
+
+    def get_stats(self) -> ExpressionCacheStats:
+        """Get the statistics of the caches of all wrapped functions."""
+        stats = ExpressionCacheStats()
+        for function in self._functions:
+            info = function.cache_info()
+            stats += ExpressionCacheStats(info.hits, info.misses, info.currsize)
+        return stats
@@ -0,0 +1,268 @@
+"""Incremental builds writing the changes of the items between builds.
+
+The items of each definition are converted into Arrow record batches, see
+`ArrowOutputWriter`, and written to a parquet file in which duckdb computes the
+`hash` of every row. The ids and hashes of a build are kept in a manifest per
+definition. The next build, e.g. against a new Open Targets release, compares
+its rows to the manifest and only writes the items added, removed or changed
+as delta files, which could be applied to a graph database instead of loading
+all the items again.
+"""
+
+import re
+import shutil
+import tempfile
+from collections import Counter
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+from typing import Any, Final, Literal
+
+import pyarrow.parquet as pq
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition
+from open_targets.adapter.arrow_output import (
+    DEFAULT_COMPRESSION,
+    EDGE_ATTRIBUTE_COLUMN_NAMES,
+    NODE_ATTRIBUTE_COLUMN_NAMES,
+    ArrowOutputWriter,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.output import DEFAULT_BATCH_SIZE, EdgeInfo, NodeInfo
+from open_targets.config import DATA_VERSION
+
+HASH_COLUMN_NAME = "__hash"
+MANIFEST_SUFFIX = ".manifest.parquet"
+ADDED_FILE_NAME = "added.parquet"
+REMOVED_FILE_NAME = "removed.parquet"
+CHANGED_FILE_NAME = "changed.parquet"
+DATA_VERSION_METADATA_KEY = b"open_targets.data_version"
+
+
+@dataclass(frozen=True)
+class DefinitionDelta:
+    """The changes of the items of a definition since the previous build.
+
+    Attributes:
+        name: The name of the definition, see `get_definition_names`.
+        kind: Whether the items are nodes or edges.
+        num_added: The number of items whose id is new.
+        num_removed: The number of items whose id is gone.
+        num_changed: The number of items whose id is kept but whose content
+            changed.
+        paths: The delta files written, i.e. `added.parquet`,
+            `removed.parquet` and `changed.parquet` under
+            `<kind>/<name>/` for the non-empty changes.
+    """
+
+    name: str
+    kind: Literal["nodes", "edges"]
+    num_added: int
+    num_removed: int
+    num_changed: int
+    paths: tuple[Path, ...]
+
+
+class IncrementalBuilder:
+    """Builder of the definitions of a context writing their changes only.
+
+    Items are matched by id between builds, so definitions generating random
+    ids should be acquired with `deterministic_ids` set on the context. The
+    rows of items sharing an id are compared as a whole. Added and changed
+    items are written with all their columns, as by `ArrowOutputWriter`, and
+    removed items with their attribute columns only. The first build, without
+    manifests, writes all the items as added.
+
+    Manifests are only replaced once the delta files of their definition are
+    written, so that a failed build could be run again.
+    """
+
+    def __init__(
+        self,
+        context: AcquisitionContext,
+        manifest_directory: str | PathLike[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Initialize the builder.
+
+        Args:
+            context (AcquisitionContext): The context acquiring the
+                definitions.
+            manifest_directory (str | PathLike[str]): The directory of the
+                manifests, read and updated by each build.
+            batch_size (int): The maximum number of rows of the record batches
+                the items are converted into.
+        """
+        self.context: Final[AcquisitionContext] = context
+        self.manifest_directory: Final[Path] = Path(manifest_directory)
+        self.batch_size: Final[int] = batch_size
+        self._names: Final = get_definition_names([*context.node_definitions, *context.edge_definitions])
+
+    def build(self, output_directory: str | PathLike[str]) -> list[DefinitionDelta]:
+        """Build all the definitions of the context, nodes first."""
+        return [
+            self.build_definition(definition, output_directory)
+            for definition in [*self.context.node_definitions, *self.context.edge_definitions]
+        ]
+
+    def build_definition(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        output_directory: str | PathLike[str],
+    ) -> DefinitionDelta:
+        """Build a registered definition, writing its changes and manifest."""
+        definitions = [*self.context.node_definitions, *self.context.edge_definitions]
+        if definition not in definitions:
+            msg = f"Definition {definition} was not registered."
+            raise ValueError(msg)
+        name = self._names[definitions.index(definition)]
+        kind: Literal["nodes", "edges"] = "nodes" if definition in self.context.node_definitions else "edges"
+        attribute_columns = NODE_ATTRIBUTE_COLUMN_NAMES if kind == "nodes" else EDGE_ATTRIBUTE_COLUMN_NAMES
+        delta_directory = Path(output_directory) / kind / name
+        if delta_directory.exists():
+            shutil.rmtree(delta_directory)
+        delta_directory.mkdir(parents=True)
+        self.manifest_directory.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.manifest_directory / f"{name}{MANIFEST_SUFFIX}"
+
+        working_directory = Path(tempfile.mkdtemp(prefix="open-targets-incremental-", dir=self.manifest_directory))
+        try:
+            rows_path = working_directory / "rows.parquet"
+            if not self._write_rows(definition, rows_path):
+                rows_path = None
+            queries = _build_delta_queries(
+                rows_path,
+                manifest_path if manifest_path.exists() else None,
+                attribute_columns,
+            )
+            paths: list[Path] = []
+            counts: list[int] = []
+            for file_name, query in zip((ADDED_FILE_NAME, REMOVED_FILE_NAME, CHANGED_FILE_NAME), queries, strict=True):
+                count = 0
+                if query is not None:
+                    path = delta_directory / file_name
+                    count = self._copy(query, path)
+                    if count:
+                        paths.append(path)
+                    else:
+                        path.unlink()
+                counts.append(count)
+
+            new_manifest_path = working_directory / "manifest.parquet"
+            if rows_path is not None:
+                columns = ", ".join(_quote_identifier(column) for column in [*attribute_columns, HASH_COLUMN_NAME])
+                self._copy(f"SELECT {columns} FROM read_parquet({_quote_sql(str(rows_path))})", new_manifest_path)  # noqa: S608
+                new_manifest_path.replace(manifest_path)
+            else:
+                manifest_path.unlink(missing_ok=True)
+        finally:
+            shutil.rmtree(working_directory, ignore_errors=True)
+        return DefinitionDelta(name, kind, *counts, tuple(paths))
+
+    def _write_rows(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        path: Path,
+    ) -> bool:
+        """Write the items of a definition with the hashes of their rows.
+
+        Returns:
+            bool: Whether there was any item to write.
+        """
+        record_path = path.with_name("records.parquet")
+        writer: pq.ParquetWriter | None = None
+        try:
+            for record_batch in ArrowOutputWriter(self.context, self.batch_size).get_record_batch_generator(definition):
+                if writer is None:
+                    writer = pq.ParquetWriter(record_path, record_batch.schema, compression=DEFAULT_COMPRESSION)
+                writer.write_batch(record_batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            return False
+        schema = pq.read_schema(record_path)
+        hashed_columns = ", ".join(_quote_identifier(column) for column in schema.names)
+        source = f"read_parquet({_quote_sql(str(record_path))})"
+        self._copy(f"SELECT *, hash({hashed_columns}) AS {HASH_COLUMN_NAME} FROM {source}", path)  # noqa: S608
+        record_path.unlink()
+        return True
+
+    def _copy(self, query: str, path: Path) -> int:
+        """Write the result of a query as a parquet file.
+
+        Returns:
+            int: The number of rows written.
+        """
+        metadata = f"KV_METADATA {{{_quote_sql(DATA_VERSION_METADATA_KEY.decode())}: {_quote_sql(DATA_VERSION)}}}"
+        options = f"FORMAT parquet, COMPRESSION {DEFAULT_COMPRESSION}, {metadata}"
+        result = self.context.connection.execute(f"COPY ({query}) TO {_quote_sql(str(path))} ({options})").fetchone()
+        return int(result[0]) if result is not None else 0
+
+
+def get_definition_names(definitions: list[AcquisitionDefinition[Any]]) -> list[str]:
+    """Get names identifying definitions between builds.
+
+    A name is made of the ids of the datasets of a definition and its label if
+    it is a string. Definitions with the same name are told apart by their
+    order, so definitions sharing their datasets and label should be kept in
+    the same order between builds.
+    """
+    names: list[str] = []
+    occurrences: Counter[str] = Counter()
+    for definition in definitions:
+        datasets = "-".join(sorted(dataset.id for dataset in definition.get_required_datasets()))
+        label = getattr(definition, "label", None)
+        name = re.sub(r"[^0-9A-Za-z_.-]+", "_", f"{datasets}-{label if isinstance(label, str) else 'items'}")
+        occurrences[name] += 1
+        names.append(name if occurrences[name] == 1 else f"{name}-{occurrences[name]}")
+    return names
+
+
+def _build_delta_queries(
+    rows_path: Path | None,
+    manifest_path: Path | None,
+    attribute_columns: tuple[str, ...],
+) -> tuple[str | None, str | None, str | None]:
+    """Build the queries of the added, removed and changed rows."""
+    if rows_path is None:
+        removed = None if manifest_path is None else _build_rows_query(manifest_path, attribute_columns)
+        return None, removed, None
+    if manifest_path is None:
+        return _build_rows_query(rows_path, None), None, None
+    rows = f"read_parquet({_quote_sql(str(rows_path))})"
+    manifest = f"read_parquet({_quote_sql(str(manifest_path))})"
+    # The rows sharing an id are compared as a whole by the hash of the list
+    # of their hashes. Ids are matched as not distinct so that rows without
+    # an id are compared as any other id rather than never matching.
+    id_hashes = "SELECT id, hash(list({0} ORDER BY {0})) AS {0} FROM {1} GROUP BY id"
+    changed_ids = (
+        f"SELECT new.id FROM ({id_hashes.format(HASH_COLUMN_NAME, rows)}) AS new "  # noqa: S608
+        f"JOIN ({id_hashes.format(HASH_COLUMN_NAME, manifest)}) AS old "
+        f"ON new.id IS NOT DISTINCT FROM old.id WHERE new.{HASH_COLUMN_NAME} != old.{HASH_COLUMN_NAME}"
+    )
+    has_id = "EXISTS (SELECT 1 FROM {0} AS other WHERE other.id IS NOT DISTINCT FROM item.id)"
+    columns = f"* EXCLUDE ({HASH_COLUMN_NAME})"
+    attributes = ", ".join(_quote_identifier(column) for column in attribute_columns)
+    return (
+        f"SELECT {columns} FROM {rows} AS item WHERE NOT {has_id.format(manifest)}",  # noqa: S608
+        f"SELECT {attributes} FROM {manifest} AS item WHERE NOT {has_id.format(rows)}",  # noqa: S608
+        f"SELECT {columns} FROM {rows} AS item WHERE {has_id.format(f'({changed_ids})')}",  # noqa: S608
+    )
+
+
+def _build_rows_query(path: Path, attribute_columns: tuple[str, ...] | None) -> str:
+    columns = (
+        f"* EXCLUDE ({HASH_COLUMN_NAME})"
+        if attribute_columns is None
+        else ", ".join(_quote_identifier(column) for column in attribute_columns)
+    )
+    return f"SELECT {columns} FROM read_parquet({_quote_sql(str(path))})"  # noqa: S608
+
+
+def _quote_identifier(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _quote_sql(string: str) -> str:
+    return "'" + string.replace("'", "''") + "'"
@@ -1,6 +1,8 @@
 """Licence enum and utility functions."""
 
+from collections.abc import Mapping
 from enum import Enum
+from typing import Final
 
 
 class License(str, Enum):
@@ -18,28 +20,33 @@ class License(str, Enum):
     UNKNOWN = "Unknown"
 
 
+DATASOURCE_LICENSES: Final[Mapping[str, License]] = {
+    "progeny": License.APACHE_2_0,
+    "intogen": License.CC0_1_0,
+    "clingen": License.CC0_1_0,
+    "expression_atlas": License.CC_BY_4_0,
+    "orphanet": License.CC_BY_4_0,
+    "reactome": License.CC_BY_4_0,
+    "uniprot_variants": License.CC_BY_4_0,
+    "uniprot_literature": License.CC_BY_4_0,
+    "chembl": License.CC_BY_SA_3_0,
+    "europepmc": License.CC_BY_NC_4_0,
+    "eva": License.EMBL_EBI,
+    "eva_somatic": License.EMBL_EBI,
+    "gene2phenotype": License.EMBL_EBI,
+    "ot_genetics_portal": License.EMBL_EBI,
+    "slapenrich": License.MIT,
+    "cancer_gene_census": License.COMMERCIAL_OT,
+    "genomics_england": License.COMMERCIAL_OT,
+    "cancer_biomarkers": License.NOT_AVAILABLE,
+    "crispr": License.NOT_AVAILABLE,
+    "gene_burden": License.NOT_AVAILABLE,
+    "impc": License.NOT_AVAILABLE,
+    "sysbio": License.NOT_AVAILABLE,
+}
+"""The licenses of the data sources, any other data source is unknown."""
+
+
 def get_datasource_license(dataset_id: str) -> str:
     """Get the license for a given dataset ID."""
-    licence = None
-    match dataset_id:
-        case "progeny":
-            licence = License.APACHE_2_0
-        case "intogen" | "clingen":
-            licence = License.CC0_1_0
-        case "expression_atlas" | "orphanet" | "reactome" | "uniprot_variants" | "uniprot_literature":
-            licence = License.CC_BY_4_0
-        case "chembl":
-            licence = License.CC_BY_SA_3_0
-        case "europepmc":
-            licence = License.CC_BY_NC_4_0
-        case "eva" | "eva_somatic" | "gene2phenotype" | "ot_genetics_portal":
-            licence = License.EMBL_EBI
-        case "slapenrich":
-            licence = License.MIT
-        case "cancer_gene_census" | "genomics_england":
-            licence = License.COMMERCIAL_OT
-        case "cancer_biomarkers" | "crispr" | "gene_burden" | "impc" | "sysbio":
-            licence = License.NOT_AVAILABLE
-        case _:
-            licence = License.UNKNOWN
-    return str(licence)
+    return str(DATASOURCE_LICENSES.get(dataset_id, License.UNKNOWN))
@@ -0,0 +1,265 @@
+"""Metrics of the acquisition of definitions.
+
+An `AcquisitionMetrics` registry given to an acquisition context records, for
+each definition acquired, the rows scanned, the items emitted, the failures and
+where the time goes: fetching rows from duckdb, building the data views over
+them, evaluating the expressions into items and the consumer of the items. The
+registry passes the metrics to its reporters as they are updated, e.g. to
+`ConsoleMetricsReporter` or `JsonMetricsReporter`.
+
+Without a registry the context does not time anything, so that metrics cost
+nothing when they are disabled.
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from os import PathLike
+from pathlib import Path
+from typing import Any, Final, Protocol, TextIO, TypeVar
+
+DEFAULT_REPORT_INTERVAL = 10.0
+
+T = TypeVar("T")
+
+
+@dataclass
+class DefinitionMetrics:
+    """Metrics of the acquisition of a definition.
+
+    Times are in seconds. The evaluation time is the time spent producing the
+    items other than fetching rows and building data views, i.e. mostly the
+    evaluation of expressions, and the consumer time is the time spent by the
+    consumer between items.
+
+    Attributes:
+        definition: The definition acquired.
+        name: The ids of the datasets of the definition and its label.
+        rows_scanned: The number of rows fetched from the query engine.
+        items_emitted: The number of nodes or edges emitted.
+        failures: The number of rows which could not be converted into items,
+            of failed fetches and of acquisitions which raised.
+        fetch_time: The time spent fetching rows from the query engine.
+        data_view_time: The time spent building the data views of the rows.
+        evaluation_time: The time spent evaluating the expressions.
+        consumer_time: The time spent by the consumer of the items.
+        elapsed_time: The time since the acquisition started.
+        finished: Whether the acquisition finished, successfully or not.
+    """
+
+    definition: object = field(repr=False, compare=False)
+    name: str
+    rows_scanned: int = 0
+    items_emitted: int = 0
+    failures: int = 0
+    fetch_time: float = 0.0
+    data_view_time: float = 0.0
+    evaluation_time: float = 0.0
+    consumer_time: float = 0.0
+    elapsed_time: float = 0.0
+    finished: bool = False
+
+    @property
+    def rows_per_second(self) -> float:
+        """The number of rows scanned per second since the start."""
+        return self.rows_scanned / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the metrics as a dictionary of plain values."""
+        return {
+            "name": self.name,
+            "rows_scanned": self.rows_scanned,
+            "items_emitted": self.items_emitted,
+            "failures": self.failures,
+            "rows_per_second": self.rows_per_second,
+            "fetch_time": self.fetch_time,
+            "data_view_time": self.data_view_time,
+            "evaluation_time": self.evaluation_time,
+            "consumer_time": self.consumer_time,
+            "elapsed_time": self.elapsed_time,
+            "finished": self.finished,
+        }
+
+
+class MetricsReporter(Protocol):
+    """Receiver of the metrics of the definitions as they are updated."""
+
+    def report(self, metrics: Sequence[DefinitionMetrics]) -> None:
+        """Report the metrics of the definitions updated since the last one."""
+        ...
+
+
+class AcquisitionMetrics:
+    """Registry of the metrics of the definitions acquired by contexts.
+
+    Metrics are reported every `report_interval` seconds for the definitions
+    being acquired, and once more when their acquisition finishes. Reports
+    are made between items, so an interval is only as precise as the time
+    taken by an item. The registry could be shared by contexts of the same
+    process.
+    """
+
+    def __init__(
+        self,
+        reporters: Sequence[MetricsReporter] = (),
+        report_interval: float = DEFAULT_REPORT_INTERVAL,
+    ) -> None:
+        """Initialize the registry.
+
+        Args:
+            reporters (Sequence[MetricsReporter]): The reporters the metrics
+                are passed to.
+            report_interval (float): The minimum number of seconds between two
+                reports of the definitions being acquired.
+        """
+        if report_interval <= 0:
+            msg = f"Report interval must be positive, got {report_interval}."
+            raise ValueError(msg)
+        self.reporters: Final[Sequence[MetricsReporter]] = reporters
+        self.report_interval: Final[float] = report_interval
+        # The metrics of the definition whose next item is being produced, so
+        # that contexts could record the rows they fetch to it.
+        self.active: DefinitionMetrics | None = None
+        # Definitions are not hashable, hence keyed by identity.
+        self._metrics: dict[int, DefinitionMetrics] = {}
+        self._running: dict[int, DefinitionMetrics] = {}
+        self._last_report_time = 0.0
+
+    def get_metrics(self, definition: object) -> DefinitionMetrics:
+        """Get the metrics of a definition, empty if it was not acquired."""
+        metrics = self._metrics.get(id(definition))
+        if metrics is None:
+            metrics = DefinitionMetrics(definition, _get_definition_name(definition))
+            self._metrics[id(definition)] = metrics
+        return metrics
+
+    def get_all_metrics(self) -> list[DefinitionMetrics]:
+        """Get the metrics of all the definitions, in order of acquisition."""
+        return list(self._metrics.values())
+
+    def instrument(
+        self,
+        definition: object,
+        stream: Iterable[T],
+        count: Callable[[T], int] | None = None,
+    ) -> Iterator[T]:
+        """Record the production and the consumption of the items of a stream.
+
+        Args:
+            definition (object): The definition producing the stream.
+            stream (Iterable[T]): The stream of items or batches of items.
+            count (Callable[[T], int] | None): The function giving the number
+                of items of each element of the stream, e.g. `len` for batches.
+                If None, each element is an item.
+        """
+        metrics = self.get_metrics(definition)
+        clock = time.perf_counter
+        iterator = iter(stream)
+        start_time = clock()
+        if not self._running:
+            self._last_report_time = start_time
+        self._running[id(definition)] = metrics
+        try:
+            while True:
+                previous_active = self.active
+                self.active = metrics
+                production_start_time = clock()
+                scan_time = metrics.fetch_time + metrics.data_view_time
+                try:
+                    element = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.active = previous_active
+                    production_end_time = clock()
+                    metrics.evaluation_time += (
+                        production_end_time
+                        - production_start_time
+                        - (metrics.fetch_time + metrics.data_view_time - scan_time)
+                    )
+                    metrics.elapsed_time = production_end_time - start_time
+                metrics.items_emitted += 1 if count is None else count(element)
+                if production_end_time - self._last_report_time >= self.report_interval:
+                    self._report(list(self._running.values()))
+                yield element
+                metrics.consumer_time += clock() - production_end_time
+        except Exception:
+            metrics.failures += 1
+            raise
+        finally:
+            metrics.elapsed_time = clock() - start_time
+            metrics.finished = True
+            self._running.pop(id(definition), None)
+            self._report([metrics])
+
+    def _report(self, metrics: Sequence[DefinitionMetrics]) -> None:
+        self._last_report_time = time.perf_counter()
+        for reporter in self.reporters:
+            reporter.report(metrics)
+
+
+class ConsoleMetricsReporter:
+    """Reporter writing a line of metrics per definition to a text stream."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        """Initialize the reporter.
+
+        Args:
+            stream (TextIO | None): The stream to write to. If None, the
+                standard error is used.
+        """
+        self.stream: Final[TextIO] = stream or sys.stderr
+
+    def report(self, metrics: Sequence[DefinitionMetrics]) -> None:
+        """Write the metrics of each definition on a line."""
+        for definition_metrics in metrics:
+            self.stream.write(format_metrics(definition_metrics) + "\n")
+        self.stream.flush()
+
+
+class JsonMetricsReporter:
+    """Reporter appending the metrics of each definition as a JSON line."""
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        """Initialize the reporter.
+
+        Args:
+            path (str | PathLike[str]): The file the lines are appended to.
+        """
+        self.path: Final[Path] = Path(path)
+
+    def report(self, metrics: Sequence[DefinitionMetrics]) -> None:
+        """Append a JSON object per definition, with the time of the report."""
+        timestamp = time.time()
+        with self.path.open("a", encoding="utf-8") as file:
+            for definition_metrics in metrics:
+                file.write(json.dumps({"timestamp": timestamp, **definition_metrics.to_dict()}) + "\n")
+
+
+def format_metrics(metrics: DefinitionMetrics) -> str:
+    """Format the metrics of a definition on a single line."""
+    times = {
+        "fetch": metrics.fetch_time,
+        "data views": metrics.data_view_time,
+        "evaluation": metrics.evaluation_time,
+        "consumer": metrics.consumer_time,
+    }
+    total_time = sum(times.values())
+    shares = ", ".join(
+        f"{name} {value / total_time:.0%}" if total_time > 0 else f"{name} 0%" for name, value in times.items()
+    )
+    status = "done" if metrics.finished else "running"
+    return (
+        f"{metrics.name} [{status}]: {metrics.rows_scanned:,} rows scanned, {metrics.items_emitted:,} items, "
+        f"{metrics.failures:,} failures, {metrics.rows_per_second:,.0f} rows/s in {metrics.elapsed_time:.1f}s "
+        f"({shares})"
+    )
+
+
+def _get_definition_name(definition: object) -> str:
+    get_required_datasets = getattr(definition, "get_required_datasets", None)
+    datasets = "-".join(sorted(dataset.id for dataset in get_required_datasets())) if get_required_datasets else ""
+    label = getattr(definition, "label", None)
+    return f"{datasets}/{label if isinstance(label, str) else type(definition).__name__}"
@@ -0,0 +1,470 @@
+"""Writer of neo4j-admin import files.
+
+Each definition is written as a header file and data files of at most a given
+size. Definitions whose items could be computed by duckdb are written by a
+`COPY` of their query, without materialising rows in Python. The others are
+written from their batches by a buffered CSV writer. An import call script
+running `neo4j-admin` over all the files written is produced in the same
+fashion as `BioCypher.write_import_call`.
+"""
+
+import csv
+import logging
+import re
+import shutil
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+from typing import Any, Final, Literal, TextIO, cast
+
+import pyarrow as pa
+from duckdb import ColumnExpression, ConstantExpression, Expression, FunctionExpression
+from duckdb.sqltypes import DuckDBPyType
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition
+from open_targets.adapter.arrow_output import get_property_types
+from open_targets.adapter.context import AcquisitionContext, AcquisitionQuery
+from open_targets.adapter.output import EdgeBatch, EdgeInfo, NodeBatch, NodeInfo
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CALL_FILE_NAME = "neo4j-admin-import-call.sh"
+DATA_FILE_PREFIX = "part"
+DEFAULT_MAX_FILE_SIZE = 1 << 30
+WRITE_BUFFER_SIZE = 1 << 20
+
+_INTEGER_TYPES: Final = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER"}
+_FLOAT_TYPES: Final = {"FLOAT", "DOUBLE"}
+
+
+@dataclass(frozen=True, kw_only=True)
+class Neo4jImportSettings:
+    """Settings of the files written for neo4j-admin import.
+
+    Attributes:
+        database_name: The name of the database to import into.
+        delimiter: The delimiter of the fields.
+        array_delimiter: The delimiter of the elements of arrays.
+        quote_character: The character quoting fields.
+        max_file_size: The size in bytes above which data files are split. If
+            None, each definition is written to a single data file.
+        import_call_bin_prefix: The prefix of `neo4j-admin` in the import call,
+            e.g. the directory of the binary.
+        import_call_file_prefix: The prefix of the paths of the files in the
+            import call. If None, the output directory is used.
+        wipe: Whether the import overwrites the existing database.
+        skip_bad_relationships: Whether relationships whose nodes are missing
+            are skipped by the import.
+        skip_duplicate_nodes: Whether nodes with the same id are skipped by the
+            import.
+    """
+
+    database_name: str = "neo4j"
+    delimiter: str = "\t"
+    array_delimiter: str = "|"
+    quote_character: str = '"'
+    max_file_size: int | None = DEFAULT_MAX_FILE_SIZE
+    import_call_bin_prefix: str = ""
+    import_call_file_prefix: str | None = None
+    wipe: bool = True
+    skip_bad_relationships: bool = False
+    skip_duplicate_nodes: bool = False
+
+
+@dataclass(frozen=True)
+class Neo4jImportFiles:
+    """The files written for a definition.
+
+    Attributes:
+        kind: Whether the files hold nodes or relationships.
+        header: The name of the header file.
+        parts: The name of the directory of the data files.
+        computed_by_duckdb: Whether the files were written by duckdb rather
+            than from items converted in Python.
+    """
+
+    kind: Literal["nodes", "relationships"]
+    header: str
+    parts: str
+    computed_by_duckdb: bool
+
+
+class Neo4jImportWriter:
+    """Writer of the definitions of a context as neo4j-admin import files.
+
+    Nodes are written with an `id:ID` column, their properties and a `:LABEL`
+    column. Relationships are written with `:START_ID`, `id`, their properties,
+    `:END_ID` and `:TYPE` columns. The types of the property columns are taken
+    from the types of the columns of the query, or when written from Python,
+    from the schema if known in advance, see `get_property_types`, and
+    otherwise from the first value of the first batch which is not null.
+    """
+
+    def __init__(
+        self,
+        context: AcquisitionContext,
+        output_directory: str | PathLike[str],
+        settings: Neo4jImportSettings | None = None,
+        *,
+        use_duckdb: bool = True,
+    ) -> None:
+        """Initialize the writer.
+
+        Args:
+            context (AcquisitionContext): The context acquiring the
+                definitions.
+            output_directory (str | PathLike[str]): The directory the files are
+                written to.
+            settings (Neo4jImportSettings | None): The settings of the files.
+                If None, the defaults are used.
+            use_duckdb (bool): Whether definitions whose items could be
+                computed by duckdb are written by duckdb.
+        """
+        self.context: Final[AcquisitionContext] = context
+        self.output_directory: Final[Path] = Path(output_directory)
+        self.settings: Final[Neo4jImportSettings] = settings or Neo4jImportSettings()
+        self.use_duckdb: Final[bool] = use_duckdb
+        self._files: list[Neo4jImportFiles] = []
+
+    def write(self) -> list[Neo4jImportFiles]:
+        """Write all the definitions of the context, nodes first."""
+        return [
+            self.write_definition(definition)
+            for definition in [*self.context.node_definitions, *self.context.edge_definitions]
+        ]
+
+    def write_definition(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+    ) -> Neo4jImportFiles:
+        """Write the header and data files of a registered definition."""
+        kind: Literal["nodes", "relationships"] = (
+            "nodes" if definition in self.context.node_definitions else "relationships"
+        )
+        name = f"{len(self._files):03d}-{_get_file_label(definition)}"
+        header_path = self.output_directory / f"{name}-header.csv"
+        parts_directory = self.output_directory / name
+        if parts_directory.exists():
+            shutil.rmtree(parts_directory)
+        parts_directory.mkdir(parents=True)
+
+        query = self.context.build_acquisition_query(definition) if self.use_duckdb else None
+        if query is not None:
+            header = self._copy_query(query, kind, parts_directory)
+        else:
+            header = self._write_batches(
+                self.context.get_acquisition_batch_generator(definition),
+                kind,
+                parts_directory,
+                get_property_types(definition),
+            )
+        header_path.write_text(self.settings.delimiter.join(header), encoding="utf-8")
+        files = Neo4jImportFiles(kind, header_path.name, parts_directory.name, query is not None)
+        self._files.append(files)
+        return files
+
+    def write_import_call(self) -> Path:
+        """Write the script importing all the files written so far.
+
+        Like the script of BioCypher, it calls the interface of neo4j-admin
+        matching the version installed.
+        """
+        path = self.output_directory / IMPORT_CALL_FILE_NAME
+        bin_prefix = self.settings.import_call_bin_prefix
+        path.write_text(
+            "#!/bin/bash\n"
+            f"version=$({bin_prefix}neo4j-admin --version | cut -d '.' -f 1)\n"
+            'echo "Neo4j detected version: $version" >&2\n'
+            "if [[ $version -lt 5 ]] ; then\n"
+            f"    {self._get_import_call('import', '--database=', '--force=')}\n"
+            "else\n"
+            f"    {self._get_import_call('database import full', '', '--overwrite-destination=')}\n"
+            "fi\n",
+            encoding="utf-8",
+        )
+        path.chmod(0o755)
+        return path
+
+    def _get_import_call(self, import_command: str, database_option: str, wipe_option: str) -> str:
+        settings = self.settings
+        file_prefix = settings.import_call_file_prefix
+        if file_prefix is None:
+            file_prefix = str(self.output_directory)
+        options = [
+            f"{database_option}{settings.database_name}",
+            f'--delimiter="{_escape(settings.delimiter)}"',
+            f'--array-delimiter="{_escape(settings.array_delimiter)}"',
+            f'--quote="{settings.quote_character}"'
+            if settings.quote_character == "'"
+            else f"--quote='{settings.quote_character}'",
+        ]
+        if settings.wipe:
+            options.append(f"{wipe_option}true")
+        if settings.skip_bad_relationships:
+            options.append("--skip-bad-relationships=true")
+        if settings.skip_duplicate_nodes:
+            options.append("--skip-duplicate-nodes=true")
+        options.extend(
+            f'--{files.kind}="{Path(file_prefix, files.header)},{Path(file_prefix, files.parts, DATA_FILE_PREFIX)}.*"'
+            for files in sorted(self._files, key=lambda files: files.kind != "nodes")
+        )
+        return " ".join([f"{settings.import_call_bin_prefix}neo4j-admin {import_command}", *options])
+
+    def _copy_query(
+        self,
+        query: AcquisitionQuery,
+        kind: Literal["nodes", "relationships"],
+        parts_directory: Path,
+    ) -> list[str]:
+        """Write the data files of a query with duckdb and return the header."""
+        relation = query.relation
+        types = dict(zip(relation.columns, relation.types, strict=True))
+        header_columns = _get_header_columns(kind, query.attribute_columns, query.property_columns)
+        header: list[str] = []
+        selection: list[Expression] = []
+        for name, column in header_columns:
+            suffix = _get_duckdb_type_suffix(types[column]) if name in query.property_columns else ""
+            header.append(f"{name}{suffix}")
+            selection.append(self._build_duckdb_csv_expression(ColumnExpression(column), types[column]))
+        settings = self.settings
+        options = [
+            "FORMAT csv",
+            "HEADER false",
+            f"DELIMITER {_quote_sql(settings.delimiter)}",
+            f"QUOTE {_quote_sql(settings.quote_character)}",
+            f"ESCAPE {_quote_sql(settings.quote_character)}",
+        ]
+        if settings.max_file_size is None:
+            target = parts_directory / f"{DATA_FILE_PREFIX}0.csv"
+        else:
+            target = parts_directory
+            options.extend(
+                [f"FILE_SIZE_BYTES {settings.max_file_size}", f"FILENAME_PATTERN '{DATA_FILE_PREFIX}{{i}}'"],
+            )
+        self.context.connection.execute(
+            f"COPY ({relation.select(*selection).sql_query()}) TO {_quote_sql(str(target))} ({', '.join(options)})",
+        )
+        return header
+
+    def _build_duckdb_csv_expression(self, column: Expression, column_type: DuckDBPyType) -> Expression:
+        """Build the expression formatting a column as neo4j-admin expects."""
+        if str(column_type).endswith("[]"):
+            return FunctionExpression(
+                "array_to_string",
+                column,
+                ConstantExpression(self.settings.array_delimiter),
+            )
+        return column
+
+    def _write_batches(
+        self,
+        batches: Iterable[NodeBatch] | Iterable[EdgeBatch],
+        kind: Literal["nodes", "relationships"],
+        parts_directory: Path,
+        property_types: Mapping[str, pa.DataType],
+    ) -> list[str]:
+        """Write the data files of batches in Python and return the header.
+
+        The columns of the properties are the keys of the properties of the
+        first batch, a key given more than once taking its last value as in
+        the properties of the items. Properties missing from later batches are
+        left empty and properties not in the first batch are dropped.
+        """
+        file: TextIO | None = None
+        header: list[str] = []
+        keys: tuple[str, ...] = ()
+        num_files = 0
+        try:
+            for batch in batches:
+                if file is None:
+                    keys = tuple(dict.fromkeys(batch.property_keys))
+                    header = self._get_python_header(kind, batch, property_types)
+                if batch.property_keys != keys and set(batch.property_keys) - set(keys):
+                    logger.warning(
+                        "Properties %s are dropped as they are not in the header.",
+                        sorted(set(batch.property_keys) - set(keys)),
+                    )
+                if file is None or (
+                    self.settings.max_file_size is not None and file.tell() >= self.settings.max_file_size
+                ):
+                    if file is not None:
+                        file.close()
+                    file = (parts_directory / f"{DATA_FILE_PREFIX}{num_files}.csv").open(
+                        "w",
+                        encoding="utf-8",
+                        newline="",
+                        buffering=WRITE_BUFFER_SIZE,
+                    )
+                    num_files += 1
+                csv.writer(
+                    file,
+                    delimiter=self.settings.delimiter,
+                    quotechar=self.settings.quote_character,
+                    lineterminator="\n",
+                ).writerows(self._get_python_rows(batch, keys))
+        finally:
+            if file is not None:
+                file.close()
+        if not header:
+            header = [name for name, _ in _get_header_columns(kind, [], {})]
+        return header
+
+    def _get_python_header(
+        self,
+        kind: Literal["nodes", "relationships"],
+        batch: NodeBatch | EdgeBatch,
+        property_types: Mapping[str, pa.DataType],
+    ) -> list[str]:
+        columns = dict(zip(batch.property_keys, zip(*batch.property_values, strict=True), strict=True))
+        suffixes = {
+            key: _get_arrow_type_suffix(property_types[key])
+            if key in property_types
+            else _get_python_type_suffix(columns[key])
+            for key in batch.property_keys
+        }
+        return [
+            f"{name}{suffixes[name]}" if name in suffixes else name
+            for name, _ in _get_header_columns(kind, [], {key: key for key in batch.property_keys})
+        ]
+
+    def _get_python_rows(
+        self,
+        batch: NodeBatch | EdgeBatch,
+        keys: Sequence[str],
+    ) -> Iterable[list[Any]]:
+        if batch.property_keys == tuple(keys):
+            indices: list[int | None] = list(range(len(keys)))
+        else:
+            positions = {key: index for index, key in enumerate(batch.property_keys)}
+            indices = [positions.get(key) for key in keys]
+        format_value = self._format_python_value
+        if isinstance(batch, NodeBatch):
+            for id, label, values in zip(batch.ids, batch.labels, batch.property_values, strict=True):  # noqa: A001
+                yield [
+                    id,
+                    *[None if index is None else format_value(values[index]) for index in indices],
+                    label,
+                ]
+            return
+        for id, source_id, target_id, label, values in zip(  # noqa: A001
+            batch.ids,
+            batch.source_ids,
+            batch.target_ids,
+            batch.labels,
+            batch.property_values,
+            strict=True,
+        ):
+            yield [
+                source_id,
+                id,
+                *[None if index is None else format_value(values[index]) for index in indices],
+                target_id,
+                label,
+            ]
+
+    def _format_python_value(self, value: object) -> object:
+        """Format a value as duckdb formats the column of the value.
+
+        Like `array_to_string`, the null elements of sequences are left out.
+        """
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, Sequence) and not isinstance(value, str):
+            return self.settings.array_delimiter.join(
+                str(self._format_python_value(element)) for element in value if element is not None
+            )
+        return value
+
+
+def _get_header_columns(
+    kind: Literal["nodes", "relationships"],
+    attribute_columns: Sequence[str],
+    property_columns: Mapping[str, str],
+) -> list[tuple[str, str]]:
+    """Get the names of the header and the matching columns of the query.
+
+    Attribute columns are in the order of the fields of `NodeInfo` or
+    `EdgeInfo`, they are left empty when writing from Python.
+    """
+    attributes = list(attribute_columns) or [""] * (2 if kind == "nodes" else 4)
+    properties = list(property_columns.items())
+    if kind == "nodes":
+        return [("id:ID", attributes[0]), *properties, (":LABEL", attributes[1])]
+    return [
+        (":START_ID", attributes[1]),
+        ("id", attributes[0]),
+        *properties,
+        (":END_ID", attributes[2]),
+        (":TYPE", attributes[3]),
+    ]
+
+
+def _get_duckdb_type_suffix(column_type: DuckDBPyType) -> str:
+    name = str(column_type)
+    array = ""
+    if name.endswith("[]"):
+        name = name.removesuffix("[]")
+        array = "[]"
+    if name in _INTEGER_TYPES:
+        return f":long{array}"
+    if name in _FLOAT_TYPES or name.startswith("DECIMAL"):
+        return f":double{array}"
+    if name == "BOOLEAN":
+        return f":boolean{array}"
+    return f":string{array}" if array else ""
+
+
+def _get_arrow_type_suffix(value_type: pa.DataType) -> str:
+    array = ""
+    if pa.types.is_list(value_type) or pa.types.is_large_list(value_type):
+        value_type = value_type.value_type
+        array = "[]"
+    if pa.types.is_integer(value_type):
+        return f":long{array}"
+    if pa.types.is_floating(value_type) or pa.types.is_decimal(value_type):
+        return f":double{array}"
+    if pa.types.is_boolean(value_type):
+        return f":boolean{array}"
+    return f":string{array}" if array else ""
+
+
+def _get_python_type_suffix(values: Sequence[object]) -> str:
+    """Get the type suffix of a column from its first value not null."""
+    value = next((value for value in values if value is not None), None)
+    array = ""
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        value = next(
+            (
+                element
+                for sequence in values
+                if sequence is not None
+                for element in cast("Sequence[object]", sequence)
+                if element is not None
+            ),
+            None,
+        )
+        array = "[]"
+    if isinstance(value, bool):
+        return f":boolean{array}"
+    if isinstance(value, int):
+        return f":long{array}"
+    if isinstance(value, float):
+        return f":double{array}"
+    return f":string{array}" if array else ""
+
+
+def _get_file_label(definition: AcquisitionDefinition[Any]) -> str:
+    """Get the label of a definition usable in file names."""
+    label = getattr(definition, "label", None)
+    if not isinstance(label, str):
+        return "items"
+    return re.sub(r"[^0-9A-Za-z_]+", "_", label) or "items"
+
+
+def _escape(string: str) -> str:
+    return string.encode("unicode_escape").decode("ascii")
+
+
+def _quote_sql(string: str) -> str:
+    return "'" + string.replace("'", "''") + "'"
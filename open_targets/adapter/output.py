@@ -1,11 +1,13 @@
 """Intermediate node and edge types compatible with BioCypher."""
 
-from collections.abc import Iterator, Mapping
-from dataclasses import dataclass
-from typing import Any
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
 
+DEFAULT_BATCH_SIZE = 10000
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class NodeInfo:
     """A type safe intermediate node compatible with BioCypher."""
 
@@ -22,7 +24,7 @@ class NodeInfo:
         return 3
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EdgeInfo:
     """A type safe intermediate edge compatible with BioCypher."""
 
@@ -39,3 +41,153 @@ class EdgeInfo:
     def __len__(self) -> int:
         """Implement the tuple protocol for BioCypher."""
         return 5
+
+
+@dataclass(slots=True)
+class NodeBatch:
+    """A batch of nodes stored as parallel columns.
+
+    The nodes of a batch share the keys of their properties, which are stored
+    once for the batch instead of in a dictionary per node. Iterating over a
+    batch yields its nodes, so it could be given to BioCypher as is.
+
+    Attributes:
+        property_keys: The keys of the properties of all the nodes.
+        ids: The ids of the nodes.
+        labels: The labels of the nodes.
+        property_values: The values of the properties of each node, in the
+            order of the keys.
+    """
+
+    property_keys: tuple[str, ...]
+    ids: list[str] = field(default_factory=list[str])
+    labels: list[str] = field(default_factory=list[str])
+    property_values: list[tuple[Any, ...]] = field(default_factory=list[tuple[Any, ...]])
+
+    def append(self, id: str, label: str, property_values: tuple[Any, ...]) -> None:  # noqa: A002
+        """Add a node to the batch."""
+        self.ids.append(id)
+        self.labels.append(label)
+        self.property_values.append(property_values)
+
+    def __iter__(self) -> Iterator[NodeInfo]:
+        """Iterate over the nodes of the batch."""
+        keys = self.property_keys
+        for id, label, values in zip(self.ids, self.labels, self.property_values, strict=True):  # noqa: A001
+            yield NodeInfo(id, label, dict(zip(keys, values, strict=True)))
+
+    def __len__(self) -> int:
+        """Get the number of nodes of the batch."""
+        return len(self.ids)
+
+
+@dataclass(slots=True)
+class EdgeBatch:
+    """A batch of edges stored as parallel columns.
+
+    See `NodeBatch`.
+
+    Attributes:
+        property_keys: The keys of the properties of all the edges.
+        ids: The ids of the edges.
+        source_ids: The ids of the sources of the edges.
+        target_ids: The ids of the targets of the edges.
+        labels: The labels of the edges.
+        property_values: The values of the properties of each edge, in the
+            order of the keys.
+    """
+
+    property_keys: tuple[str, ...]
+    ids: list[str] = field(default_factory=list[str])
+    source_ids: list[str] = field(default_factory=list[str])
+    target_ids: list[str] = field(default_factory=list[str])
+    labels: list[str] = field(default_factory=list[str])
+    property_values: list[tuple[Any, ...]] = field(default_factory=list[tuple[Any, ...]])
+
+    def append(
+        self,
+        id: str,  # noqa: A002
+        source_id: str,
+        target_id: str,
+        label: str,
+        property_values: tuple[Any, ...],
+    ) -> None:
+        """Add an edge to the batch."""
+        self.ids.append(id)
+        self.source_ids.append(source_id)
+        self.target_ids.append(target_id)
+        self.labels.append(label)
+        self.property_values.append(property_values)
+
+    def __iter__(self) -> Iterator[EdgeInfo]:
+        """Iterate over the edges of the batch."""
+        keys = self.property_keys
+        for id, source_id, target_id, label, values in zip(  # noqa: A001
+            self.ids,
+            self.source_ids,
+            self.target_ids,
+            self.labels,
+            self.property_values,
+            strict=True,
+        ):
+            yield EdgeInfo(id, source_id, target_id, label, dict(zip(keys, values, strict=True)))
+
+    def __len__(self) -> int:
+        """Get the number of edges of the batch."""
+        return len(self.ids)
+
+
+TBatch = TypeVar("TBatch", NodeBatch, EdgeBatch)
+
+
+def batch_nodes(nodes: Iterable[NodeInfo], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[NodeBatch]:
+    """Group nodes into batches of at most a given size.
+
+    A new batch is started whenever the keys of the properties change.
+    """
+    return _batch(
+        nodes,
+        batch_size,
+        NodeBatch,
+        lambda batch, node: batch.append(node.id, node.label, tuple(node.properties.values())),
+    )
+
+
+def batch_edges(edges: Iterable[EdgeInfo], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[EdgeBatch]:
+    """Group edges into batches of at most a given size.
+
+    A new batch is started whenever the keys of the properties change.
+    """
+    return _batch(
+        edges,
+        batch_size,
+        EdgeBatch,
+        lambda batch, edge: batch.append(
+            edge.id,
+            edge.source_id,
+            edge.target_id,
+            edge.label,
+            tuple(edge.properties.values()),
+        ),
+    )
+
+
+def _batch(
+    items: Iterable[NodeInfo] | Iterable[EdgeInfo],
+    batch_size: int,
+    create_batch: Callable[[tuple[str, ...]], TBatch],
+    append: Callable[[TBatch, Any], None],
+) -> Iterator[TBatch]:
+    if batch_size < 1:
+        msg = f"Batch size must be positive, got {batch_size}."
+        raise ValueError(msg)
+    batch: TBatch | None = None
+    for item in items:
+        keys = tuple(item.properties)
+        if batch is None or len(batch) >= batch_size or keys != batch.property_keys:
+            if batch:
+                yield batch
+            batch = create_batch(keys)
+        append(batch, item)
+    if batch:
+        yield batch
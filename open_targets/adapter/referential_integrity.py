@@ -0,0 +1,329 @@
+"""Streaming check of the endpoints of edges against the nodes emitted."""
+
+import logging
+import math
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from itertools import islice
+from os import PathLike
+from types import TracebackType
+from typing import Final
+
+import numpy as np
+import numpy.typing as npt
+from typing_extensions import Self
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition
+from open_targets.adapter.deduplication import DEFAULT_MEMORY_BUDGET, Digests, DigestSet, hash_keys
+from open_targets.adapter.output import DEFAULT_BATCH_SIZE, EdgeBatch, EdgeInfo, NodeBatch, NodeInfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPECTED_NODE_COUNT = 10_000_000
+DEFAULT_NUM_SAMPLES = 10
+
+
+class BloomFilter:
+    """A Bloom filter of 64-bit digests.
+
+    The filter never misses a digest added but mistakes digests not added for
+    added ones at the error rate it is sized for, as long as no more digests
+    than its capacity are added. The bit positions of a digest are derived from
+    its two 32-bit halves by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        """Initialize the filter.
+
+        Args:
+            capacity (int): The number of digests expected to be added.
+            error_rate (float): The rate of false positives at capacity.
+        """
+        if capacity < 1:
+            msg = f"Capacity must be positive, got {capacity}."
+            raise ValueError(msg)
+        if not 0 < error_rate < 1:
+            msg = f"Error rate must be between 0 and 1 exclusive, got {error_rate}."
+            raise ValueError(msg)
+        self.capacity: Final[int] = capacity
+        self.error_rate: Final[float] = error_rate
+        self.num_bits: Final[int] = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes: Final[int] = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+    def add(self, digests: Digests) -> None:
+        """Add digests to the filter."""
+        positions = self._get_positions(digests).ravel()
+        np.bitwise_or.at(self._bits, positions >> 3, np.left_shift(1, positions & 7).astype(np.uint8))
+
+    def contains(self, digests: Digests) -> npt.NDArray[np.bool_]:
+        """Tell which digests are possibly in the filter."""
+        positions = self._get_positions(digests)
+        return ((self._bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).all(axis=1)
+
+    def _get_positions(self, digests: Digests) -> npt.NDArray[np.uint64]:
+        first_hashes = digests & np.uint64(0xFFFFFFFF)
+        second_hashes = (digests >> np.uint64(32)) | np.uint64(1)
+        multipliers = np.arange(self.num_hashes, dtype=np.uint64)
+        return (first_hashes[:, None] + multipliers[None, :] * second_hashes[:, None]) % np.uint64(self.num_bits)
+
+
+@dataclass(frozen=True)
+class DanglingEdgeReport:
+    """The edges of a definition with an endpoint missing from the nodes.
+
+    Attributes:
+        definition: The definition of the edges.
+        num_edges: The number of edges checked.
+        num_dangling_edges: The number of edges with a source or a target
+            missing.
+        num_dangling_sources: The number of edges with a source missing.
+        num_dangling_targets: The number of edges with a target missing.
+        samples: The first dangling edges.
+    """
+
+    definition: AcquisitionDefinition[EdgeInfo]
+    num_edges: int
+    num_dangling_edges: int
+    num_dangling_sources: int
+    num_dangling_targets: int
+    samples: tuple[EdgeInfo, ...]
+
+
+@dataclass
+class _DefinitionState:
+    definition: AcquisitionDefinition[EdgeInfo]
+    num_edges: int = 0
+    num_dangling_edges: int = 0
+    num_dangling_sources: int = 0
+    num_dangling_targets: int = 0
+    samples: list[EdgeInfo] = field(default_factory=list[EdgeInfo])
+
+
+class ReferentialIntegrityChecker:
+    """Checker of the endpoints of edges against the nodes emitted.
+
+    The ids of the nodes recorded are held either exactly as 64-bit xxh3
+    digests in a `DigestSet`, or in a `BloomFilter` if an error rate is given,
+    which takes about 10 bits per node for a 1% error rate. Edges are checked
+    against the nodes recorded before them, so nodes should be recorded first.
+    As edges do not carry the labels of their endpoints, an endpoint is found
+    if a node of any label has its id.
+
+    Dangling edges, i.e. with a source or a target not found, are counted and
+    sampled per definition, and dropped if requested. With a Bloom filter, some
+    dangling edges go unnoticed at the error rate, but no edge is wrongly
+    reported.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        drop_dangling_edges: bool = False,
+        error_rate: float | None = None,
+        expected_node_count: int = DEFAULT_EXPECTED_NODE_COUNT,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        spill_directory: str | PathLike[str] | None = None,
+        num_samples: int = DEFAULT_NUM_SAMPLES,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Initialize the checker.
+
+        Args:
+            drop_dangling_edges (bool): Whether dangling edges are dropped
+                instead of only reported.
+            error_rate (float | None): The rate at which ids not recorded are
+                mistaken for recorded ones by the Bloom filter holding them. If
+                None, ids are held exactly.
+            expected_node_count (int): The number of nodes the Bloom filter is
+                sized for. Unused if ids are held exactly.
+            memory_budget (int): See `DigestSet`. Unused with a Bloom filter.
+            spill_directory (str | PathLike[str] | None): See `DigestSet`.
+                Unused with a Bloom filter.
+            num_samples (int): The maximum number of dangling edges kept as
+                samples per definition.
+            batch_size (int): The number of items looked up at a time when
+                checking streams of items.
+        """
+        if num_samples < 0:
+            msg = f"Number of samples must not be negative, got {num_samples}."
+            raise ValueError(msg)
+        if batch_size < 1:
+            msg = f"Batch size must be positive, got {batch_size}."
+            raise ValueError(msg)
+        self.drop_dangling_edges: Final[bool] = drop_dangling_edges
+        self.num_samples: Final[int] = num_samples
+        self.batch_size: Final[int] = batch_size
+        self._node_ids: Final[DigestSet | BloomFilter] = (
+            DigestSet(memory_budget, spill_directory)
+            if error_rate is None
+            else BloomFilter(expected_node_count, error_rate)
+        )
+        # Definitions are not hashable, so their states are keyed by identity.
+        self._states: dict[int, _DefinitionState] = {}
+
+    def __enter__(self) -> Self:
+        """Enter the runtime context of the checker."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the checker when leaving the runtime context."""
+        self.close()
+
+    def close(self) -> None:
+        """Release the ids recorded, removing any of them spilled to disk."""
+        if isinstance(self._node_ids, DigestSet):
+            self._node_ids.close()
+
+    def record_node_ids(self, ids: Sequence[str | None]) -> None:
+        """Record the ids of nodes emitted, skipping the missing ones."""
+        recorded_ids = [node_id for node_id in ids if node_id is not None]
+        if recorded_ids:
+            self._node_ids.add(hash_keys(recorded_ids))
+
+    def record(self, nodes: Iterable[NodeInfo]) -> Iterator[NodeInfo]:
+        """Record the ids of a stream of nodes as they are passed through."""
+        iterator = iter(nodes)
+        while batch := list(islice(iterator, self.batch_size)):
+            self.record_node_ids([node.id for node in batch])
+            yield from batch
+
+    def record_batches(self, batches: Iterable[NodeBatch]) -> Iterator[NodeBatch]:
+        """Record the ids of a stream of batches as they are passed through."""
+        for batch in batches:
+            self.record_node_ids(batch.ids)
+            yield batch
+
+    def filter(self, definition: AcquisitionDefinition[EdgeInfo], edges: Sequence[EdgeInfo]) -> list[bool]:
+        """Check the edges of a definition.
+
+        Returns:
+            list[bool]: Whether each edge is kept, i.e. it is not dangling or
+                dangling edges are not dropped.
+        """
+        return self._filter(
+            definition,
+            [edge.source_id for edge in edges],
+            [edge.target_id for edge in edges],
+            edges.__getitem__,
+        )
+
+    def check(self, definition: AcquisitionDefinition[EdgeInfo], edges: Iterable[EdgeInfo]) -> Iterator[EdgeInfo]:
+        """Check a stream of edges, dropping the dangling ones if requested."""
+        iterator = iter(edges)
+        while batch := list(islice(iterator, self.batch_size)):
+            keep = self.filter(definition, batch)
+            yield from (edge for edge, keep_edge in zip(batch, keep, strict=True) if keep_edge)
+        self._log_report(definition)
+
+    def check_batches(
+        self,
+        definition: AcquisitionDefinition[EdgeInfo],
+        batches: Iterable[EdgeBatch],
+    ) -> Iterator[EdgeBatch]:
+        """Check a stream of batches of edges, see `check`.
+
+        Batches left empty are not yielded.
+        """
+        for batch in batches:
+            keep = self._filter(
+                definition,
+                batch.source_ids,
+                batch.target_ids,
+                lambda index, batch=batch: _get_batch_edge(batch, index),
+            )
+            if all(keep):
+                yield batch
+                continue
+            checked_batch = EdgeBatch(batch.property_keys)
+            for index in (index for index, keep_edge in enumerate(keep) if keep_edge):
+                checked_batch.append(
+                    batch.ids[index],
+                    batch.source_ids[index],
+                    batch.target_ids[index],
+                    batch.labels[index],
+                    batch.property_values[index],
+                )
+            if checked_batch:
+                yield checked_batch
+        self._log_report(definition)
+
+    def get_report(self, definition: AcquisitionDefinition[EdgeInfo]) -> DanglingEdgeReport:
+        """Get the report of the edges of a definition checked so far."""
+        return _create_report(self._states.get(id(definition), _DefinitionState(definition)))
+
+    def get_reports(self) -> list[DanglingEdgeReport]:
+        """Get the reports of the definitions checked so far, in order."""
+        return [_create_report(state) for state in self._states.values()]
+
+    def _filter(
+        self,
+        definition: AcquisitionDefinition[EdgeInfo],
+        source_ids: Sequence[str | None],
+        target_ids: Sequence[str | None],
+        get_edge: Callable[[int], EdgeInfo],
+    ) -> list[bool]:
+        state = self._states.setdefault(id(definition), _DefinitionState(definition))
+        state.num_edges += len(source_ids)
+        if not source_ids:
+            return []
+        found = self._contains([*source_ids, *target_ids])
+        dangling_sources = ~found[: len(source_ids)]
+        dangling_targets = ~found[len(source_ids) :]
+        dangling = dangling_sources | dangling_targets
+        dangling_indices = np.flatnonzero(dangling)
+        state.num_dangling_edges += len(dangling_indices)
+        state.num_dangling_sources += int(dangling_sources.sum())
+        state.num_dangling_targets += int(dangling_targets.sum())
+        for index in dangling_indices[: self.num_samples - len(state.samples)]:
+            state.samples.append(get_edge(int(index)))
+        if not self.drop_dangling_edges:
+            return [True] * len(source_ids)
+        return (~dangling).tolist()
+
+    def _contains(self, ids: Sequence[str | None]) -> npt.NDArray[np.bool_]:
+        """Tell which ids were recorded, missing ids being dangling."""
+        is_present = np.fromiter((node_id is not None for node_id in ids), dtype=np.bool_, count=len(ids))
+        found = np.zeros(len(ids), dtype=np.bool_)
+        if is_present.any():
+            found[is_present] = self._node_ids.contains(hash_keys([node_id for node_id in ids if node_id is not None]))
+        return found
+
+    def _log_report(self, definition: AcquisitionDefinition[EdgeInfo]) -> None:
+        report = self.get_report(definition)
+        if report.num_dangling_edges:
+            logger.warning(
+                "%d of %d edges of %s are dangling so far (%d sources, %d targets missing), e.g. %s.",
+                report.num_dangling_edges,
+                report.num_edges,
+                definition,
+                report.num_dangling_sources,
+                report.num_dangling_targets,
+                [(edge.source_id, edge.target_id) for edge in report.samples],
+            )
+
+
+def _get_batch_edge(batch: EdgeBatch, index: int) -> EdgeInfo:
+    return EdgeInfo(
+        batch.ids[index],
+        batch.source_ids[index],
+        batch.target_ids[index],
+        batch.labels[index],
+        dict(zip(batch.property_keys, batch.property_values[index], strict=True)),
+    )
+
+
+def _create_report(state: _DefinitionState) -> DanglingEdgeReport:
+    return DanglingEdgeReport(
+        state.definition,
+        state.num_edges,
+        state.num_dangling_edges,
+        state.num_dangling_sources,
+        state.num_dangling_targets,
+        tuple(state.samples),
+    )
@@ -0,0 +1,335 @@
+"""Cache of the results of definitions across runs.
+
+The batches acquired for a definition are stored under a key derived from the
+structure of the definition, the data version, the source of the adapter, the
+content of the parquet files it scans and the options of the context, so that
+they are replayed instead of acquired again as long as none of these change.
+"""
+
+import logging
+import os
+import pickle
+import tempfile
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, fields, is_dataclass
+from enum import Enum
+from functools import cache, partial
+from importlib.metadata import version
+from os import PathLike
+from pathlib import Path
+from types import BuiltinFunctionType, CodeType, FunctionType, MethodDescriptorType, ModuleType
+from typing import Final
+
+import pyarrow as pa
+import xxhash
+
+from open_targets.adapter.output import EdgeBatch, NodeBatch
+from open_targets.config import DATA_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 8 << 30
+COMPRESSION = "zstd"
+ENTRY_SUFFIX = ".pickle.zst"
+TEMPORARY_ENTRY_SUFFIX = ".tmp"
+RESULT_CACHE_FORMAT_VERSION: Final = 1
+PARQUET_MAGIC = b"PAR1"
+PARQUET_TAIL_SIZE = 8
+
+
+@dataclass
+class ResultCacheStats:
+    """Statistics of a result cache.
+
+    Attributes:
+        hits: The number of definitions replayed from the cache.
+        misses: The number of definitions not found in the cache.
+        evictions: The number of entries removed to stay within the size.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ResultCache:
+    """Cache of the batches acquired for definitions, stored on disk.
+
+    Each entry holds the pickled batches of a definition in a zstd compressed
+    file, written while the batches are consumed and only added once they are
+    all consumed. Entries are evicted in least recently used order when the
+    cache exceeds its maximum size, and entries larger than the whole cache are
+    not stored. The cache could be shared by processes, entries being moved
+    into place atomically.
+
+    Only dataclass definitions, such as expression definitions, whose fields
+    are fingerprintable are cached, see `get_definition_fingerprint`.
+    """
+
+    def __init__(self, directory: str | PathLike[str], max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """Initialize the cache, creating its directory if needed.
+
+        Args:
+            directory (str | PathLike[str]): The directory of the entries.
+            max_size (int): The maximum total size in bytes of the entries.
+        """
+        if max_size < 1:
+            msg = f"Maximum size must be positive, got {max_size}."
+            raise ValueError(msg)
+        self.directory: Final[Path] = Path(directory)
+        self.max_size: Final[int] = max_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stats = ResultCacheStats()
+
+    def get_key(
+        self,
+        definition: object,
+        files: Iterable[str | PathLike[str]],
+        **options: object,
+    ) -> str | None:
+        """Get the key of the result of a definition.
+
+        Args:
+            definition (object): The definition.
+            files (Iterable[str | PathLike[str]]): The files scanned by the
+                definition, in the order they are scanned. They are identified
+                by their content rather than their path.
+            **options (object): Any other values the result depends on, e.g.
+                the limit of the context.
+
+        Returns:
+            str | None: The key, or None if the definition could not be
+                fingerprinted and should not be cached.
+        """
+        definition_fingerprint = get_definition_fingerprint(definition)
+        if definition_fingerprint is None:
+            return None
+        hasher = xxhash.xxh3_128()
+        hasher.update(f"{RESULT_CACHE_FORMAT_VERSION};{DATA_VERSION};{version('bioregistry')};".encode())
+        hasher.update(f"{get_adapter_fingerprint()};".encode())
+        hasher.update(definition_fingerprint.encode())
+        for file in files:
+            hasher.update(get_file_fingerprint(file).encode())
+        _update_fingerprint(hasher, dict(options))
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Iterator[NodeBatch | EdgeBatch] | None:
+        """Get the batches of an entry, marking it as recently used.
+
+        Returns:
+            Iterator[NodeBatch | EdgeBatch] | None: The batches, or None if
+                there is no entry for the key.
+        """
+        path = self._get_entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._stats.misses += 1
+            return None
+        self._stats.hits += 1
+        return _read_entry(path)
+
+    def put(self, key: str, batches: Iterable[NodeBatch | EdgeBatch]) -> Iterator[NodeBatch | EdgeBatch]:
+        """Store batches as they are passed through.
+
+        The entry is added once all the batches are consumed. It is discarded
+        if they are not, or if it grows larger than the cache.
+        """
+        descriptor, temporary_path = tempfile.mkstemp(suffix=TEMPORARY_ENTRY_SUFFIX, dir=self.directory)
+        os.close(descriptor)
+        file: pa.CompressedOutputStream | None = pa.CompressedOutputStream(temporary_path, COMPRESSION)
+        try:
+            for batch in batches:
+                if file is not None:
+                    pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+                    # The size on disk lags behind as the stream is buffered.
+                    if self._exceeds_max_size(key, temporary_path):
+                        file.close()
+                        file = None
+                yield batch
+            if file is not None:
+                file.close()
+                file = None
+                if not self._exceeds_max_size(key, temporary_path):
+                    path = self._get_entry_path(key)
+                    Path(temporary_path).replace(path)
+                    self._evict(path)
+        finally:
+            if file is not None:
+                file.close()
+            Path(temporary_path).unlink(missing_ok=True)
+
+    def get_size(self) -> int:
+        """Get the total size in bytes of the entries."""
+        return sum(path.stat().st_size for path in self._get_entry_paths())
+
+    def get_stats(self) -> ResultCacheStats:
+        """Get the statistics of the cache in this process."""
+        return ResultCacheStats(self._stats.hits, self._stats.misses, self._stats.evictions)
+
+    def clear(self) -> None:
+        """Remove all the entries, including those left partially written."""
+        for path in [*self._get_entry_paths(), *self.directory.glob(f"*{TEMPORARY_ENTRY_SUFFIX}")]:
+            path.unlink(missing_ok=True)
+
+    def _exceeds_max_size(self, key: str, path: str) -> bool:
+        if Path(path).stat().st_size <= self.max_size:
+            return False
+        logger.warning("Result of key %s is not cached as it exceeds the cache size.", key)
+        return True
+
+    def _get_entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}{ENTRY_SUFFIX}"
+
+    def _get_entry_paths(self) -> list[Path]:
+        return list(self.directory.glob(f"*{ENTRY_SUFFIX}"))
+
+    def _evict(self, added_path: Path) -> None:
+        """Remove the least recently used entries until the cache fits."""
+        entries: list[tuple[int, int, Path]] = []
+        for path in self._get_entry_paths():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Removed by another process.
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            if path == added_path:
+                continue
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            self._stats.evictions += 1
+
+
+def get_definition_fingerprint(definition: object) -> str | None:
+    """Get a fingerprint of the structure of a definition.
+
+    The fingerprint is the same across processes for definitions built the same
+    way. Dataclasses are fingerprinted by their type and fields, types by their
+    qualified names, and functions by their qualified names, bytecode,
+    constants, defaults and closures. Module globals used by functions are not
+    taken into account.
+
+    Returns:
+        str | None: The fingerprint, or None if the definition holds values
+            that could not be fingerprinted.
+    """
+    hasher = xxhash.xxh3_128()
+    try:
+        _update_fingerprint(hasher, definition)
+    except _UnfingerprintableError as e:
+        logger.debug("Definition %s could not be fingerprinted: %s", definition, e)
+        return None
+    return hasher.hexdigest()
+
+
+@cache
+def get_adapter_fingerprint() -> str:
+    """Get a fingerprint of the source of the modules of the adapter.
+
+    Results converted by another version of the adapter, installed or edited in
+    place, are then not replayed.
+    """
+    directory = Path(__file__).parent
+    hasher = xxhash.xxh3_128()
+    for path in sorted(directory.rglob("*.py")):
+        hasher.update(f"{path.relative_to(directory).as_posix()};".encode())
+        hasher.update(path.read_bytes())
+    return hasher.hexdigest()
+
+
+def get_file_fingerprint(path: str | PathLike[str]) -> str:
+    """Get a fingerprint of the content of a file.
+
+    Parquet files are fingerprinted by their size and footer, which holds the
+    sizes and statistics of their row groups, sparing a read of their content.
+    Other files are fingerprinted by their size and modification time.
+    """
+    stat = Path(path).stat()
+    with Path(path).open("rb") as file:
+        if stat.st_size >= 2 * PARQUET_TAIL_SIZE:
+            file.seek(-PARQUET_TAIL_SIZE, os.SEEK_END)
+            tail = file.read(PARQUET_TAIL_SIZE)
+            footer_size = int.from_bytes(tail[:4], "little")
+            if tail[4:] == PARQUET_MAGIC and footer_size + PARQUET_TAIL_SIZE <= stat.st_size:
+                file.seek(-PARQUET_TAIL_SIZE - footer_size, os.SEEK_END)
+                return f"{stat.st_size}:{xxhash.xxh3_128_hexdigest(file.read(footer_size))}"
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class _UnfingerprintableError(Exception):
+    pass
+
+
+def _update_fingerprint(hasher: xxhash.xxh3_128, value: object) -> None:  # noqa: C901, PLR0912
+    match value:
+        # Enumerations are matched first as they could also be strings.
+        case Enum():
+            hasher.update(f"enum:{_get_qualified_name(type(value))}.{value.name};".encode())
+        case None | bool() | int() | float() | str() | bytes():
+            hasher.update(f"{type(value).__name__}:{value!r};".encode())
+        case type():
+            hasher.update(f"type:{_get_qualified_name(value)};".encode())
+        case _ if is_dataclass(value):
+            hasher.update(f"dataclass:{_get_qualified_name(type(value))}(".encode())
+            for field in fields(value):
+                hasher.update(f"{field.name}=".encode())
+                _update_fingerprint(hasher, getattr(value, field.name))
+            hasher.update(b")")
+        case list() | tuple():
+            hasher.update(b"[")
+            for item in value:
+                _update_fingerprint(hasher, item)
+            hasher.update(b"]")
+        case Mapping() | set() | frozenset():
+            # Items are fingerprinted on their own and sorted so that the order
+            # of insertion does not matter.
+            items = value.items() if isinstance(value, Mapping) else value
+            hasher.update(b"{")
+            for item_fingerprint in sorted(_get_fingerprint(item) for item in items):
+                hasher.update(item_fingerprint.encode())
+            hasher.update(b"}")
+        case FunctionType():
+            hasher.update(f"function:{_get_qualified_name(value)}".encode())
+            _update_fingerprint(hasher, value.__code__)
+            _update_fingerprint(hasher, value.__defaults__)
+            _update_fingerprint(hasher, [cell.cell_contents for cell in value.__closure__ or ()])
+        case CodeType():
+            hasher.update(value.co_code)
+            _update_fingerprint(hasher, value.co_names)
+            _update_fingerprint(hasher, value.co_consts)
+        case BuiltinFunctionType() | MethodDescriptorType():
+            hasher.update(f"builtin:{_get_qualified_name(value)};".encode())
+            owner = getattr(value, "__self__", None)
+            if owner is not None and not isinstance(owner, ModuleType):
+                _update_fingerprint(hasher, owner)
+        case partial():
+            hasher.update(b"partial:")
+            _update_fingerprint(hasher, [value.func, value.args, value.keywords])
+        case _:
+            msg = f"Values of type {type(value)} could not be fingerprinted."
+            raise _UnfingerprintableError(msg)
+
+
+def _get_fingerprint(value: object) -> str:
+    hasher = xxhash.xxh3_128()
+    _update_fingerprint(hasher, value)
+    return hasher.hexdigest()
+
+
+def _get_qualified_name(value: object) -> str:
+    return f"{getattr(value, '__module__', None)}.{getattr(value, '__qualname__', None)}"
+
+
+def _read_entry(path: Path) -> Iterator[NodeBatch | EdgeBatch]:
+    with pa.CompressedInputStream(pa.OSFile(str(path)), COMPRESSION) as file:
+        while True:
+            try:
+                batch: NodeBatch | EdgeBatch = pickle.load(file)  # noqa: S301
+            except EOFError:
+                break
+            yield batch
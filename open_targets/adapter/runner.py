@@ -0,0 +1,342 @@
+"""Parallel acquisition of definitions in worker processes."""
+
+import os
+import pickle
+import shutil
+import tempfile
+import traceback
+import weakref
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from itertools import chain
+from multiprocessing import get_context
+from os import PathLike
+from pathlib import Path
+from typing import Any, Final, Generic, TypeVar, cast
+
+from open_targets.adapter.acquisition_definition import AcquisitionDefinition
+from open_targets.adapter.context import DEFAULT_FETCH_BATCH_SIZE, AcquisitionContext, DatasetShard, DuckDBSettings
+from open_targets.adapter.deduplication import NodeDeduplicator
+from open_targets.adapter.expression_cache import DEFAULT_EXPRESSION_CACHE_SIZE
+from open_targets.adapter.output import EdgeBatch, EdgeInfo, NodeBatch, NodeInfo
+from open_targets.adapter.referential_integrity import ReferentialIntegrityChecker
+from open_targets.adapter.result_cache import ResultCache
+from open_targets.data.schema_base import Dataset
+
+DEFAULT_CHUNK_SIZE = 10000
+
+TAcquisitionOutput = TypeVar("TAcquisitionOutput", NodeInfo, EdgeInfo)
+
+_worker_context_options: Mapping[str, Any] = {}
+_worker_context: AcquisitionContext | None = None
+
+
+@dataclass(frozen=True)
+class AcquisitionOutcome(Generic[TAcquisitionOutput]):
+    """The outcome of acquiring a definition in a worker process.
+
+    Attributes:
+        definition: The acquired definition.
+        items: The acquired nodes or edges, read back lazily from the spill
+            file written by the worker. They could be iterated once, also after
+            the run producing them finishes. Spill files are removed as they
+            are read, or once the outcome is no longer referenced. Empty if
+            the acquisition failed.
+        error: The formatted traceback if the acquisition failed.
+    """
+
+    definition: AcquisitionDefinition[TAcquisitionOutput]
+    items: Iterable[TAcquisitionOutput]
+    error: str | None = None
+
+
+class ParallelAcquisitionRunner:
+    """Runner acquiring definitions in parallel in a pool of worker processes.
+
+    Each worker owns an acquisition context over all the definitions and
+    acquires one definition at a time. Acquired items are spilled to disk in
+    chunks by the worker and read back by the consumer, so that the memory
+    used does not depend on the number of definitions completed ahead of the
+    consumer.
+
+    Definitions scanning a single dataset could also be split into shards of
+    the dataset, each acquired by a worker on its own. The items of a sharded
+    definition are read back shard by shard, in the order of the dataset.
+    Definitions are not sharded when a limit is set so that the limit still
+    applies to whole datasets.
+
+    Definitions are sent to the workers by pickling, hence functions used by
+    expressions must be defined at module level. Workers are spawned rather
+    than forked, so the script starting a run must be guarded by
+    `if __name__ == "__main__":`.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        node_definitions: list[AcquisitionDefinition[NodeInfo]],
+        edge_definitions: list[AcquisitionDefinition[EdgeInfo]],
+        datasets_location: str | PathLike[str],
+        limit: int | None = None,
+        fetch_batch_size: int | None = DEFAULT_FETCH_BATCH_SIZE,
+        duckdb_settings: DuckDBSettings | None = None,
+        max_workers: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        spill_directory: str | PathLike[str] | None = None,
+        num_shards: int = 1,
+        expression_cache_size: int | None = DEFAULT_EXPRESSION_CACHE_SIZE,
+        deterministic_ids: bool = False,
+        node_deduplicator: NodeDeduplicator | None = None,
+        referential_integrity_checker: ReferentialIntegrityChecker | None = None,
+        result_cache: ResultCache | None = None,
+    ) -> None:
+        """Initialize the runner.
+
+        Args:
+            node_definitions (list[AcquisitionDefinition[NodeInfo]]): The
+                definitions of the nodes to acquire.
+            edge_definitions (list[AcquisitionDefinition[EdgeInfo]]): The
+                definitions of the edges to acquire.
+            datasets_location (str | PathLike[str]): The location of the
+                directory containing the datasets.
+            limit (int | None): The maximum number of rows to retrieve from each
+                dataset. If None, all rows are retrieved.
+            fetch_batch_size (int | None): The number of rows fetched from the
+                query engine at a time. If None, rows are fetched one by one.
+            duckdb_settings (DuckDBSettings | None): The settings of the duckdb
+                connection of each worker. If the number of threads is not set,
+                the CPUs are split evenly between the workers.
+            max_workers (int | None): The number of worker processes. If None,
+                one worker per CPU is used.
+            chunk_size (int): The number of items spilled to disk at a time.
+            spill_directory (str | PathLike[str] | None): The directory under
+                which acquired items are spilled. If None, the default temporary
+                directory is used.
+            num_shards (int): The number of shards definitions scanning a
+                single dataset are split into. See
+                `AcquisitionContext.get_dataset_shards`.
+            expression_cache_size (int | None): The maximum number of values
+                cached per pure expression of each definition by each worker.
+                If None, values are not cached.
+            deterministic_ids (bool): Whether generated ids are deterministic
+                instead of random. See `AcquisitionContext`.
+            node_deduplicator (NodeDeduplicator | None): The deduplicator
+                dropping the nodes with a label and an id already seen. Nodes
+                are deduplicated by the consumer as they are read back, so
+                that nodes acquired by different workers are compared. If None,
+                nodes are not deduplicated.
+            referential_integrity_checker (ReferentialIntegrityChecker | None):
+                The checker of the endpoints of the edges, run by the consumer
+                as well. See `AcquisitionContext`. Outcomes should be run in
+                order so that nodes are recorded before edges are checked. If
+                None, edges are not checked.
+            result_cache (ResultCache | None): The cache the workers replay the
+                batches of definitions, or of their shards, from. See
+                `AcquisitionContext`. If None, definitions are always acquired.
+        """
+        cpu_count = os.cpu_count() or 1
+        if max_workers is not None and max_workers < 1:
+            msg = f"Number of workers must be positive, got {max_workers}."
+            raise ValueError(msg)
+        if chunk_size < 1:
+            msg = f"Chunk size must be positive, got {chunk_size}."
+            raise ValueError(msg)
+        if num_shards < 1:
+            msg = f"Number of shards must be positive, got {num_shards}."
+            raise ValueError(msg)
+        self.node_definitions: Final[list[AcquisitionDefinition[NodeInfo]]] = node_definitions
+        self.edge_definitions: Final[list[AcquisitionDefinition[EdgeInfo]]] = edge_definitions
+        self.datasets_location: Final[str | PathLike[str]] = datasets_location
+        self.limit: Final[int | None] = limit
+        self.fetch_batch_size: Final[int | None] = fetch_batch_size
+        self.max_workers: Final[int] = max_workers or cpu_count
+        duckdb_settings = duckdb_settings or DuckDBSettings()
+        if duckdb_settings.threads is None:
+            duckdb_settings = replace(duckdb_settings, threads=max(1, cpu_count // self.max_workers))
+        self.duckdb_settings: Final[DuckDBSettings] = duckdb_settings
+        self.chunk_size: Final[int] = chunk_size
+        self.spill_directory: Final[str | PathLike[str] | None] = spill_directory
+        self.num_shards: Final[int] = num_shards
+        self.expression_cache_size: Final[int | None] = expression_cache_size
+        self.deterministic_ids: Final[bool] = deterministic_ids
+        self.node_deduplicator: Final[NodeDeduplicator | None] = node_deduplicator
+        self.referential_integrity_checker: Final[ReferentialIntegrityChecker | None] = referential_integrity_checker
+        self.result_cache: Final[ResultCache | None] = result_cache
+
+    def run(
+        self,
+        *,
+        ordered: bool = True,
+    ) -> Iterator[AcquisitionOutcome[NodeInfo] | AcquisitionOutcome[EdgeInfo]]:
+        """Acquire all definitions and yield the outcome of each of them.
+
+        A definition failing does not affect the others, its outcome carries
+        the error instead.
+
+        Args:
+            ordered (bool): Whether outcomes are yielded in the order of the
+                definitions, node definitions first. Otherwise, outcomes are
+                yielded as soon as their definitions are acquired.
+        """
+        definitions = self.node_definitions + self.edge_definitions
+        # The spill directory is kept for as long as the outcomes reading from
+        # it, so that outcomes could be consumed after the run finishes.
+        spill_directory = _SpillDirectory(self.spill_directory)
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=get_context("spawn"),
+            initializer=_initialise_worker,
+            initargs=(self._get_context_options(),),
+        )
+        try:
+            tasks = self._submit_tasks(executor, definitions, spill_directory.path)
+            if ordered:
+                for index, definition in enumerate(definitions):
+                    yield self._create_outcome(definition, tasks[index], spill_directory)
+            else:
+                remaining_tasks = [len(definition_tasks) for definition_tasks in tasks]
+                task_indices = {
+                    future: index for index, definition_tasks in enumerate(tasks) for future, _ in definition_tasks
+                }
+                for future in as_completed(task_indices):
+                    index = task_indices[future]
+                    remaining_tasks[index] -= 1
+                    if remaining_tasks[index] == 0:
+                        yield self._create_outcome(definitions[index], tasks[index], spill_directory)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _create_outcome(
+        self,
+        definition: AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo],
+        tasks: Sequence[tuple["Future[None]", Path]],
+        spill_directory: "_SpillDirectory",
+    ) -> AcquisitionOutcome[NodeInfo] | AcquisitionOutcome[EdgeInfo]:
+        for future, _ in tasks:
+            error = future.exception()
+            if error is not None:
+                return AcquisitionOutcome(definition, [], "".join(traceback.format_exception(error)))
+        batches = chain.from_iterable(_read_spill_file(spill_directory, spill_path.name) for _, spill_path in tasks)
+        if definition in self.node_definitions:
+            node_definition = cast("AcquisitionDefinition[NodeInfo]", definition)
+            node_batches = cast("Iterator[NodeBatch]", batches)
+            if self.node_deduplicator is not None:
+                node_batches = self.node_deduplicator.deduplicate_batches(node_definition, node_batches)
+            if self.referential_integrity_checker is not None:
+                node_batches = self.referential_integrity_checker.record_batches(node_batches)
+            return AcquisitionOutcome(node_definition, chain.from_iterable(node_batches))
+        edge_definition = cast("AcquisitionDefinition[EdgeInfo]", definition)
+        edge_batches = cast("Iterator[EdgeBatch]", batches)
+        if self.referential_integrity_checker is not None:
+            edge_batches = self.referential_integrity_checker.check_batches(edge_definition, edge_batches)
+        return AcquisitionOutcome(edge_definition, chain.from_iterable(edge_batches))
+
+    def _get_context_options(self) -> dict[str, Any]:
+        return {
+            "node_definitions": self.node_definitions,
+            "edge_definitions": self.edge_definitions,
+            "datasets_location": self.datasets_location,
+            "limit": self.limit,
+            "fetch_batch_size": self.fetch_batch_size,
+            "duckdb_settings": self.duckdb_settings,
+            "expression_cache_size": self.expression_cache_size,
+            "deterministic_ids": self.deterministic_ids,
+            "result_cache": self.result_cache,
+        }
+
+    def _submit_tasks(
+        self,
+        executor: ProcessPoolExecutor,
+        definitions: Sequence[AcquisitionDefinition[NodeInfo] | AcquisitionDefinition[EdgeInfo]],
+        spill_directory: Path,
+    ) -> list[list[tuple["Future[None]", Path]]]:
+        """Submit the tasks acquiring each definition, one per shard."""
+        shards_by_dataset: dict[type[Dataset], list[DatasetShard]] = {}
+        tasks: list[list[tuple[Future[None], Path]]] = []
+        with AcquisitionContext(
+            node_definitions=[],
+            edge_definitions=[],
+            datasets_location=self.datasets_location,
+            duckdb_settings=self.duckdb_settings,
+        ) as context:
+            for index, definition in enumerate(definitions):
+                datasets = list(definition.get_required_datasets())
+                shards: list[DatasetShard | None] = [None]
+                if self.num_shards > 1 and self.limit is None and len(datasets) == 1:
+                    dataset = datasets[0]
+                    if dataset not in shards_by_dataset:
+                        shards_by_dataset[dataset] = context.get_dataset_shards(dataset, self.num_shards)
+                    if len(shards_by_dataset[dataset]) > 1:
+                        shards = list(shards_by_dataset[dataset])
+                definition_tasks: list[tuple[Future[None], Path]] = []
+                for shard_index, shard in enumerate(shards):
+                    spill_path = spill_directory / f"{index}-{shard_index}.pickle"
+                    future = executor.submit(
+                        _acquire_in_worker,
+                        index,
+                        spill_path,
+                        self.chunk_size,
+                        None if shard is None else {datasets[0]: shard},
+                    )
+                    definition_tasks.append((future, spill_path))
+                tasks.append(definition_tasks)
+        return tasks
+
+
+class _SpillDirectory:
+    """Temporary directory of spill files, removed once no longer referenced.
+
+    The run and the readers of the spill files each hold a reference to the
+    directory, so that it outlives the run while outcomes are not consumed,
+    and is removed along with unread spill files once they are dropped.
+    """
+
+    def __init__(self, parent: str | PathLike[str] | None) -> None:
+        self.path: Final[Path] = Path(tempfile.mkdtemp(prefix="open-targets-", dir=parent))
+        weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+
+
+def _initialise_worker(context_options: Mapping[str, Any]) -> None:
+    global _worker_context_options, _worker_context  # noqa: PLW0603
+    _worker_context_options = context_options
+    _worker_context = AcquisitionContext(**context_options)
+
+
+def _acquire_in_worker(
+    index: int,
+    spill_path: Path,
+    chunk_size: int,
+    dataset_shards: Mapping[type[Dataset], DatasetShard] | None,
+) -> None:
+    if _worker_context is None:
+        msg = "Worker is not initialised."
+        raise RuntimeError(msg)
+    if dataset_shards is None:
+        _spill_acquisition(_worker_context, index, spill_path, chunk_size)
+        return
+    # The context of a shard is short lived as the shard is scanned once.
+    with AcquisitionContext(**_worker_context_options, dataset_shards=dataset_shards) as context:
+        _spill_acquisition(context, index, spill_path, chunk_size)
+
+
+def _spill_acquisition(context: AcquisitionContext, index: int, spill_path: Path, chunk_size: int) -> None:
+    definition = (context.node_definitions + context.edge_definitions)[index]
+    with spill_path.open("wb") as file:
+        # Batches are spilled rather than items as they share the keys of
+        # the properties of their items.
+        for batch in context.get_acquisition_batch_generator(definition, chunk_size):
+            pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_spill_file(spill_directory: _SpillDirectory, file_name: str) -> Iterator[NodeBatch | EdgeBatch]:
+    # The spill directory is referenced until the file is read.
+    path = spill_directory.path / file_name
+    with path.open("rb") as file:
+        while True:
+            try:
+                batch: NodeBatch | EdgeBatch = pickle.load(file)  # noqa: S301
+            except EOFError:
+                break
+            yield batch
+    path.unlink()
@@ -47,7 +47,26 @@ class ExplodingScanOperation(ScanOperation):
     | f         | g                | [i, j]          |
     | f         | h                | [i, j]          |
 
-    Nested exploding is NOT yet supported.
+    The targeted field could be nested under the element of another sequence
+    type field, in which case every enclosing sequence is exploded as well.
+    Given a table below and the targeted field is colBElementD:
+
+    | colA: str | colB: list[{colC: str, colD: list[str]}]        |
+    |-----------|-------------------------------------------------|
+    | a         | [{colC: b, colD: [c, d]}, {colC: e, colD: [f]}] |
+
+    The output will be:
+    | colA: str | colBElementC: str | colBElementDElement: str |
+    |-----------|-------------------|--------------------------|
+    | a         | b                 | c                        |
+    | a         | b                 | d                        |
+    | a         | e                 | f                        |
+
+    The element predicate filters the exploded elements, after the row
+    predicate. It applies to the fields of the element of the targeted field,
+    for example, filtering out null elements with
+    `IsNotNullExpression(colBElement)`.
     """
 
     exploded_field: type[SequenceField]
+    element_predicate: ScanOperationPredicateExpression | None = None
@@ -1,5 +1,6 @@
-from collections.abc import Iterable
+from collections.abc import Collection, Iterable
 from dataclasses import dataclass
+from enum import Enum
 
 from open_targets.adapter.data_view import DataViewPrimitiveValue
 from open_targets.data.schema_base import Field
@@ -17,13 +18,80 @@ class ScanOperationPredicateExpression:
 class EqualityExpression(ScanOperationPredicateExpression):
     """Expression that filters the dataset based on equality.
 
-    The comparand field must be a primitive type and not nested.
+    The comparand field must be a primitive type. It could be nested in structs
+    but not in sequences.
     """
 
     field: type[Field]
     value: DataViewPrimitiveValue | None
 
 
+@dataclass(frozen=True)
+class IsNotNullExpression(ScanOperationPredicateExpression):
+    """Expression that filters out the rows where the field is null."""
+
+    field: type[Field]
+
+
+class ComparisonOperator(str, Enum):
+    """Operators of comparison expressions."""
+
+    LESS_THAN = "<"
+    LESS_THAN_OR_EQUAL = "<="
+    GREATER_THAN = ">"
+    GREATER_THAN_OR_EQUAL = ">="
+
+
+@dataclass(frozen=True)
+class ComparisonExpression(ScanOperationPredicateExpression):
+    """Expression that filters the dataset by comparing a field to a value.
+
+    Rows where the field is null never match. The same constraints as for
+    equality apply to the field.
+    """
+
+    field: type[Field]
+    operator: ComparisonOperator
+    value: DataViewPrimitiveValue
+
+
+@dataclass(frozen=True)
+class InExpression(ScanOperationPredicateExpression):
+    """Expression that filters the dataset by membership of a set of values.
+
+    Large sets are registered as tables in the query engine and matched by a
+    join rather than compared value by value. A null is never a member, hence
+    the negation of this expression matches nulls. The same constraints as for
+    equality apply to the field.
+    """
+
+    field: type[Field]
+    values: Collection[DataViewPrimitiveValue]
+
+
+@dataclass(frozen=True)
+class LikeExpression(ScanOperationPredicateExpression):
+    """Expression that filters the dataset by matching a SQL LIKE pattern.
+
+    `%` matches any sequence of characters and `_` matches any character. The
+    same constraints as for equality apply to the field.
+    """
+
+    field: type[Field]
+    pattern: str
+
+
+@dataclass(frozen=True)
+class PrefixExpression(ScanOperationPredicateExpression):
+    """Expression that filters the dataset by the prefix of a string field.
+
+    The same constraints as for equality apply to the field.
+    """
+
+    field: type[Field]
+    prefix: str
+
+
 @dataclass(frozen=True)
 class NotExpression(ScanOperationPredicateExpression):
     """Logical NOT of a predicate expression."""
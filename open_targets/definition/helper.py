@@ -77,7 +77,15 @@ def get_namespaced_hash_expression(
 
 
 def get_null_to_dummy_string_expression(value_expression: Expression[Any] | type[Field]) -> TransformExpression[Any]:
-    """A hack for missing predicate in exploding scan operation."""
+    """Get an expression that replaces null with `*`.
+
+    Prefer filtering out null elements of exploding scans with the element
+    predicate of `ExplodingScanOperation` instead.
+    """
     if isinstance(value_expression, type):
         value_expression = FieldExpression(value_expression)
-    return TransformExpression(value_expression, lambda v: "*" if v is None else v)
+    return TransformExpression(value_expression, _null_to_dummy_string)
+
+
+def _null_to_dummy_string(value: object) -> object:
+    return "*" if value is None else value
@@ -11,23 +11,24 @@ from open_targets.adapter.acquisition_definition import AcquisitionDefinition, E
 from open_targets.adapter.expression import NewUuidExpression
 from open_targets.adapter.output import EdgeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.adapter.scan_operation_predicate import IsNotNullExpression
 from open_targets.data.schema import (
     DatasetBiosample,
     FieldBiosampleBiosampleId,
     FieldBiosampleParents,
     FieldBiosampleParentsElement,
 )
-from open_targets.definition.helper import get_null_to_dummy_string_expression
 from open_targets.definition.reference_kg.constant import EdgeLabel
 
 edge_biosample_is_a_biosample: Final[AcquisitionDefinition[EdgeInfo]] = ExpressionEdgeAcquisitionDefinition(
     scan_operation=ExplodingScanOperation(
         dataset=DatasetBiosample,
         exploded_field=FieldBiosampleParents,
+        element_predicate=IsNotNullExpression(FieldBiosampleParentsElement),
     ),
     primary_id=NewUuidExpression(),
     source=FieldBiosampleBiosampleId,
-    target=get_null_to_dummy_string_expression(FieldBiosampleParentsElement),
+    target=FieldBiosampleParentsElement,
     label=EdgeLabel.IS_A,
     properties=[],
 )
@@ -11,23 +11,24 @@ from open_targets.adapter.acquisition_definition import AcquisitionDefinition, E
 from open_targets.adapter.expression import NewUuidExpression
 from open_targets.adapter.output import EdgeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.adapter.scan_operation_predicate import IsNotNullExpression
 from open_targets.data.schema import (
     DatasetDisease,
     FieldDiseaseId,
     FieldDiseaseParents,
     FieldDiseaseParentsElement,
 )
-from open_targets.definition.helper import get_null_to_dummy_string_expression
 from open_targets.definition.reference_kg.constant import EdgeLabel
 
 edge_disease_is_a_disease: Final[AcquisitionDefinition[EdgeInfo]] = ExpressionEdgeAcquisitionDefinition(
     scan_operation=ExplodingScanOperation(
         dataset=DatasetDisease,
         exploded_field=FieldDiseaseParents,
+        element_predicate=IsNotNullExpression(FieldDiseaseParentsElement),
     ),
     primary_id=NewUuidExpression(),
     source=FieldDiseaseId,
-    target=get_null_to_dummy_string_expression(FieldDiseaseParentsElement),
+    target=FieldDiseaseParentsElement,
     label=EdgeLabel.IS_A,
     properties=[],
 )
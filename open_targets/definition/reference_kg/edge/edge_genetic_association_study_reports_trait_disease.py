@@ -13,13 +13,13 @@ from open_targets.adapter.acquisition_definition import (
 from open_targets.adapter.expression import NewUuidExpression
 from open_targets.adapter.output import EdgeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.adapter.scan_operation_predicate import IsNotNullExpression
 from open_targets.data.schema import (
     DatasetStudy,
     FieldStudyDiseaseIds,
     FieldStudyDiseaseIdsElement,
     FieldStudyStudyId,
 )
-from open_targets.definition.helper import get_null_to_dummy_string_expression
 from open_targets.definition.reference_kg.constant import EdgeLabel
 
 edge_genetic_association_study_reports_trait_disease: Final[AcquisitionDefinition[EdgeInfo]] = (
@@ -27,10 +27,11 @@ edge_genetic_association_study_reports_trait_disease: Final[AcquisitionDefinitio
         scan_operation=ExplodingScanOperation(
             dataset=DatasetStudy,
             exploded_field=FieldStudyDiseaseIds,
+            element_predicate=IsNotNullExpression(FieldStudyDiseaseIdsElement),
         ),
         primary_id=NewUuidExpression(),
         source=FieldStudyStudyId,
-        target=get_null_to_dummy_string_expression(FieldStudyDiseaseIdsElement),
+        target=FieldStudyDiseaseIdsElement,
         label=EdgeLabel.REPORTS_TRAIT,
         properties=[],
     )
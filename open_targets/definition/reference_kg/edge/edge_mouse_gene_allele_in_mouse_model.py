@@ -11,23 +11,24 @@ from open_targets.adapter.acquisition_definition import AcquisitionDefinition, E
 from open_targets.adapter.expression import NewUuidExpression
 from open_targets.adapter.output import EdgeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.adapter.scan_operation_predicate import IsNotNullExpression
 from open_targets.data.schema import (
     DatasetMousePhenotype,
     FieldMousePhenotypeBiologicalModels,
     FieldMousePhenotypeBiologicalModelsElementId,
     FieldMousePhenotypeTargetInModelEnsemblId,
 )
-from open_targets.definition.helper import get_null_to_dummy_string_expression
 from open_targets.definition.reference_kg.constant import EdgeLabel
 
 edge_mouse_gene_allele_in_mouse_model: Final[AcquisitionDefinition[EdgeInfo]] = ExpressionEdgeAcquisitionDefinition(
     scan_operation=ExplodingScanOperation(
         dataset=DatasetMousePhenotype,
         exploded_field=FieldMousePhenotypeBiologicalModels,
+        element_predicate=IsNotNullExpression(FieldMousePhenotypeBiologicalModelsElementId),
     ),
     primary_id=NewUuidExpression(),
     source=FieldMousePhenotypeTargetInModelEnsemblId,
-    target=get_null_to_dummy_string_expression(FieldMousePhenotypeBiologicalModelsElementId),
+    target=FieldMousePhenotypeBiologicalModelsElementId,
     label=EdgeLabel.ALLELE_IN,
     properties=[],
 )
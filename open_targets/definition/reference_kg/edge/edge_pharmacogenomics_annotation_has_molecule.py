@@ -16,12 +16,12 @@ from open_targets.adapter.acquisition_definition import (
 from open_targets.adapter.expression import NewUuidExpression
 from open_targets.adapter.output import EdgeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.adapter.scan_operation_predicate import IsNotNullExpression
 from open_targets.data.schema import (
     DatasetPharmacogenomics,
     FieldPharmacogenomicsDrugs,
     FieldPharmacogenomicsDrugsElementDrugId,
 )
-from open_targets.definition.helper import get_null_to_dummy_string_expression
 from open_targets.definition.reference_kg.constant import EdgeLabel
 from open_targets.definition.reference_kg.expression import (
     pharmacogenomics_annotation_primary_id_expression,
@@ -32,10 +32,11 @@ edge_pharmacogenomics_annotation_has_molecule: Final[AcquisitionDefinition[EdgeI
         scan_operation=ExplodingScanOperation(
             dataset=DatasetPharmacogenomics,
             exploded_field=FieldPharmacogenomicsDrugs,
+            element_predicate=IsNotNullExpression(FieldPharmacogenomicsDrugsElementDrugId),
         ),
         primary_id=NewUuidExpression(),
         source=pharmacogenomics_annotation_primary_id_expression,
-        target=get_null_to_dummy_string_expression(FieldPharmacogenomicsDrugsElementDrugId),
+        target=FieldPharmacogenomicsDrugsElementDrugId,
         label=EdgeLabel.HAS_MOLECULE,
         properties=[],
     )
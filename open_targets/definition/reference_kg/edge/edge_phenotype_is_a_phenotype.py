@@ -10,23 +10,24 @@ from open_targets.adapter.acquisition_definition import AcquisitionDefinition, E
 from open_targets.adapter.expression import NewUuidExpression
 from open_targets.adapter.output import EdgeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation
+from open_targets.adapter.scan_operation_predicate import IsNotNullExpression
 from open_targets.data.schema import (
     DatasetDiseaseHpo,
     FieldDiseaseHpoId,
     FieldDiseaseHpoParents,
     FieldDiseaseHpoParentsElement,
 )
-from open_targets.definition.helper import get_null_to_dummy_string_expression
 from open_targets.definition.reference_kg.constant import EdgeLabel
 
 edge_phenotype_is_a_phenotype: Final[AcquisitionDefinition[EdgeInfo]] = ExpressionEdgeAcquisitionDefinition(
     scan_operation=ExplodingScanOperation(
         dataset=DatasetDiseaseHpo,
         exploded_field=FieldDiseaseHpoParents,
+        element_predicate=IsNotNullExpression(FieldDiseaseHpoParentsElement),
     ),
     primary_id=NewUuidExpression(),
     source=FieldDiseaseHpoId,
-    target=get_null_to_dummy_string_expression(FieldDiseaseHpoParentsElement),
+    target=FieldDiseaseHpoParentsElement,
     label=EdgeLabel.IS_A,
     properties=[],
 )
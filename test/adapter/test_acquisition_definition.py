@@ -5,6 +5,12 @@ from unittest.mock import MagicMock
 import pytest
 import xxhash
 
+from open_targets.adapter._helper._acquisition_definition import (
+    build_expressions_function,
+    fold_constants,
+    get_shared_subexpressions,
+    recursive_build_expression_function,
+)
 from open_targets.adapter.acquisition_definition import (
     ExpressionEdgeAcquisitionDefinition,
     ExpressionNodeAcquisitionDefinition,
@@ -13,6 +19,7 @@ from open_targets.adapter.data_view import DataView
 from open_targets.adapter.expression import (
     BuildCurieExpression,
     DataSourceToLicenceExpression,
+    DeterministicIdExpression,
     Expression,
     ExtractCuriePrefixExpression,
     ExtractSubstringExpression,
@@ -26,6 +33,7 @@ from open_targets.adapter.expression import (
     ToStringExpression,
     TransformExpression,
 )
+from open_targets.adapter.expression_cache import ExpressionCache
 from open_targets.adapter.licence import License
 from open_targets.adapter.output import EdgeInfo, NodeInfo
 from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation, ScanOperation
@@ -104,6 +112,18 @@ class TestExpressionAcquisitionDefinition:
     ) -> None:
         self.perform_test(field_map, expression, expected)
 
+    @pytest.mark.parametrize(("pure", "expected_call_count"), [(True, 2), (False, 3)])
+    def test_transform_expression_cache(self, *, pure: bool, expected_call_count: int) -> None:
+        function = MagicMock(side_effect=str.upper)
+        cache = ExpressionCache()
+        func = recursive_build_expression_function(
+            TransformExpression(FieldExpression(MockField), function, pure=pure),
+            cache,
+        )
+
+        assert [func({MockField: value}) for value in ["a", "b", "a"]] == ["A", "B", "A"]
+        assert function.call_count == expected_call_count
+
     def test_to_string_expression(self) -> None:
         self.perform_test({MockField: 1}, ToStringExpression(FieldExpression(MockField)), "1")
 
@@ -112,6 +132,26 @@ class TestExpressionAcquisitionDefinition:
         monkeypatch.setattr(uuid, "uuid4", lambda: fixed_uuid)
         self.perform_test({}, NewUuidExpression(), str(fixed_uuid))
 
+    def test_deterministic_id_expression(self) -> None:
+        expression = DeterministicIdExpression(
+            namespace="fake",
+            components=[FieldExpression(MockField)],
+            position=FieldExpression(_mock_field_a),
+        )
+        ids = [recursive_build_expression_function(expression) for _ in range(2)]
+        views = [
+            {MockField: value, _mock_field_a: position}
+            for value, position in [("a", "f:0"), ("b", "f:0"), ("a", "f:0"), ("a", "f:1")]
+        ]
+
+        first, second = ([func(view) for view in views] for func in ids)
+
+        assert first == second
+        assert len(set(first)) == len(views)
+        assert first[0] == xxhash.xxh3_128_hexdigest(b"fake\x1fa\x1ff:0\x1f0")
+        assert first[2] == xxhash.xxh3_128_hexdigest(b"fake\x1fa\x1ff:0\x1f2")
+        assert first[3] == xxhash.xxh3_128_hexdigest(b"fake\x1fa\x1ff:1\x1f0")
+
     def test_string_hash_expression(self) -> None:
         self.perform_test(
             {MockField: "test"},
@@ -306,6 +346,26 @@ class TestExpressionNodeAcquisitionDefinition:
                     },
                 ),
             ),
+            (
+                {
+                    _mock_field_a: "Id",
+                    _mock_field_b: "key",
+                },
+                StringLowerExpression(FieldExpression(_mock_field_a)),
+                StringLowerExpression(LiteralExpression("LABEL")),
+                [
+                    (FieldExpression(_mock_field_b), StringLowerExpression(FieldExpression(_mock_field_a))),
+                    (LiteralExpression("property_a"), FieldExpression(_mock_field_b)),
+                ],
+                NodeInfo(
+                    id="id",
+                    label="label",
+                    properties={
+                        "key": "id",
+                        "property_a": "key",
+                    },
+                ),
+            ),
         ],
     )
     def test_node_acquisition_definition(
@@ -413,3 +473,66 @@ class TestExpressionEdgeAcquisitionDefinition:
         context.get_scan_result_stream = MagicMock(return_value=[field_map])
         result = next(iter(definition.acquire(context)))
         assert result == expected
+
+
+class TestExpressionOptimisation:
+    @pytest.mark.parametrize(
+        ("expression", "expected"),
+        [
+            (
+                StringConcatenationExpression([LiteralExpression("a"), ToStringExpression(LiteralExpression(1))]),
+                LiteralExpression("a1"),
+            ),
+            (
+                StringConcatenationExpression(
+                    [StringLowerExpression(LiteralExpression("A")), FieldExpression(MockField)],
+                ),
+                StringConcatenationExpression([LiteralExpression("a"), FieldExpression(MockField)]),
+            ),
+            (ToStringExpression(NewUuidExpression()), ToStringExpression(NewUuidExpression())),
+            (
+                ExtractSubstringExpression(LiteralExpression("a"), LiteralExpression("_"), 1),
+                ExtractSubstringExpression(LiteralExpression("a"), LiteralExpression("_"), 1),
+            ),
+        ],
+    )
+    def test_fold_constants(self, expression: Expression[Any], expected: Expression[Any]) -> None:
+        assert fold_constants(expression) == expected
+
+    def test_get_shared_subexpressions(self) -> None:
+        upper = TransformExpression(FieldExpression(MockField), str.upper)
+        concatenation = StringConcatenationExpression([upper, LiteralExpression("-"), upper])
+        expressions: list[Expression[Any]] = [
+            StringHashExpression(concatenation),
+            concatenation,
+            LiteralExpression("-"),
+            StringLowerExpression(FieldExpression(MockField)),
+            StringLowerExpression(FieldExpression(MockField)),
+            TransformExpression(FieldExpression(MockField), str.upper, pure=False),
+            TransformExpression(FieldExpression(MockField), str.upper, pure=False),
+        ]
+
+        assert list(get_shared_subexpressions(expressions).values()) == [upper, concatenation]
+
+    def test_build_expressions_function(self) -> None:
+        function = MagicMock(side_effect=str.upper)
+        transform = TransformExpression(FieldExpression(MockField), function)
+        evaluate = build_expressions_function(
+            [
+                transform,
+                StringConcatenationExpression([transform, LiteralExpression("-"), transform]),
+                ToStringExpression(LiteralExpression(1)),
+            ],
+        )
+
+        values = ["a", "b"]
+
+        for value in values:
+            assert evaluate({MockField: value}) == [value.upper(), f"{value.upper()}-{value.upper()}", "1"]
+        assert function.call_count == len(values)
+
+    def test_build_expressions_function_impure(self) -> None:
+        evaluate = build_expressions_function([NewUuidExpression(), NewUuidExpression()])
+
+        first, second = evaluate({})
+        assert first != second
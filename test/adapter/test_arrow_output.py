@@ -0,0 +1,149 @@
+import io
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pytest
+
+from open_targets.adapter.acquisition_definition import (
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.arrow_output import (
+    KIND_METADATA_KEY,
+    ArrowOutputWriter,
+    get_field_arrow_type,
+    get_property_types,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.expression import (
+    FieldExpression,
+    LiteralExpression,
+    StringConcatenationExpression,
+    TransformExpression,
+)
+from open_targets.adapter.scan_operation import RowScanOperation
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import DatasetFake, FieldFakeScalar, FieldFakeStruct, FieldFakeStructSequence
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="Fake Node",
+    properties=[
+        FieldFakeStruct,
+        (LiteralExpression("count"), LiteralExpression(1)),
+        (LiteralExpression("flag"), LiteralExpression(value=True)),
+        (LiteralExpression("length"), TransformExpression(FieldExpression(FieldFakeScalar), len)),
+        (LiteralExpression("missing"), LiteralExpression(None)),
+    ],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=StringConcatenationExpression([FieldExpression(FieldFakeScalar), LiteralExpression("-edge")]),
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label=StringConcatenationExpression([LiteralExpression("fake/"), FieldExpression(FieldFakeScalar)]),
+    properties=[],
+)
+
+
+def test_get_field_arrow_type() -> None:
+    element_type = pa.struct([("scalar", pa.string())])
+    assert get_field_arrow_type(FieldFakeScalar) == pa.string()
+    assert get_field_arrow_type(FieldFakeStructSequence) == pa.list_(element_type)
+    assert get_field_arrow_type(FieldFakeStruct) == pa.struct(
+        [("struct", element_type), ("sequence", pa.list_(element_type))],
+    )
+
+
+def test_get_property_types() -> None:
+    assert get_property_types(_node_definition) == {
+        "struct": get_field_arrow_type(FieldFakeStruct),
+        "count": pa.int64(),
+        "flag": pa.bool_(),
+    }
+
+
+@pytest.mark.parametrize("batch_size", [1, 10])
+def test_write_parquet(tmp_path: Path, batch_size: int) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(3))
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        paths = ArrowOutputWriter(context, batch_size).write_parquet(tmp_path / "output")
+        nodes = list(context.get_acquisition_generator(_node_definition))
+        edges = list(context.get_acquisition_generator(_edge_definition))
+
+    assert [path.relative_to(tmp_path / "output").as_posix() for path in paths] == [
+        "nodes/label=Fake%20Node/000.parquet",
+        "edges/label=fake%2F0/001.parquet",
+        "edges/label=fake%2F1/001.parquet",
+        "edges/label=fake%2F2/001.parquet",
+    ]
+    node_table = ds.dataset(tmp_path / "output" / "nodes", partitioning="hive").to_table()
+    assert node_table.schema.field("properties").type.field("count").type == pa.int64()
+    assert node_table.schema.field("properties").type.field("length").type == pa.int64()
+    assert node_table.schema.field("properties").type.field("missing").type == pa.string()
+    assert _to_items(node_table.to_pylist()) == [(node.id, node.label, _to_plain(node.properties)) for node in nodes]
+    edge_table = ds.dataset(tmp_path / "output" / "edges", partitioning="hive").to_table()
+    assert "properties" not in edge_table.column_names
+    assert sorted(edge_table.to_pylist(), key=lambda row: row["id"]) == [
+        {"id": edge.id, "source_id": edge.source_id, "target_id": edge.target_id, "label": edge.label} for edge in edges
+    ]
+
+
+def test_write_ipc_stream(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(3))
+    sink = io.BytesIO()
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        ArrowOutputWriter(context, batch_size=2).write_ipc_stream(sink)
+
+    sink.seek(0)
+    tables: list[pa.Table] = []
+    while sink.tell() < len(sink.getvalue()):
+        tables.append(pa.ipc.open_stream(sink).read_all())
+    assert [table.schema.metadata[KIND_METADATA_KEY] for table in tables] == [b"nodes", b"edges"]
+    assert [table.num_rows for table in tables] == [3, 3]
+    assert tables[1].column("label").to_pylist() == ["fake/0", "fake/1", "fake/2"]
+
+
+def test_write_parquet_duplicate_property_key(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(2))
+    node_definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=FieldFakeScalar,
+        label="fake",
+        properties=[
+            (LiteralExpression("evidence"), LiteralExpression(1)),
+            (LiteralExpression("count"), LiteralExpression(1)),
+            (LiteralExpression("evidence"), FieldExpression(FieldFakeScalar)),
+        ],
+    )
+    with AcquisitionContext(
+        node_definitions=[node_definition],
+        edge_definitions=[],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        ArrowOutputWriter(context).write_parquet(tmp_path / "output")
+        nodes = list(context.get_acquisition_generator(node_definition))
+
+    node_table = ds.dataset(tmp_path / "output" / "nodes", partitioning="hive").to_table()
+    assert node_table.schema.field("properties").type == pa.struct([("evidence", pa.string()), ("count", pa.int64())])
+    assert _to_items(node_table.to_pylist()) == [(node.id, node.label, dict(node.properties)) for node in nodes]
+
+
+def _to_items(rows: list[dict[str, Any]]) -> list[tuple[str, str, dict[str, Any]]]:
+    return sorted((row["id"], row["label"], row["properties"]) for row in rows)
+
+
+def _to_plain(properties: Mapping[str, Any]) -> dict[str, Any]:
+    return {**properties, "struct": properties["struct"].raw_data}
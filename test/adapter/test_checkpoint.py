@@ -0,0 +1,163 @@
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from open_targets.adapter import checkpoint as checkpoint_module
+from open_targets.adapter.acquisition_definition import (
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.arrow_output import write_label_partitions
+from open_targets.adapter.checkpoint import CheckpointedBuildRunner, DefinitionCheckpoint
+from open_targets.adapter.expression import LiteralExpression, NewUuidExpression
+from open_targets.adapter.scan_operation import RowScanOperation
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import DatasetFake, FieldFakeScalar
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="fake",
+    properties=[],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label="fake_edge",
+    properties=[],
+)
+
+
+_random_id_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=NewUuidExpression(),
+    source=FieldFakeScalar,
+    target=LiteralExpression("fake"),
+    label="fake_edge",
+    properties=[],
+)
+
+
+def _fail_on_last_edge_shard(
+    record_batches: Iterable[pa.RecordBatch],
+    output_directory: Path,
+    file_name: str,
+    compression: str,
+) -> dict[Path, int]:
+    if file_name == "fake_dataset-fake_edge-00001.parquet":
+        msg = "Out of memory."
+        raise MemoryError(msg)
+    return write_label_partitions(record_batches, output_directory, file_name, compression)
+
+
+def _write_dataset(location: Path, num_rows: int) -> None:
+    rows = get_fake_rows(num_rows)
+    write_fake_dataset(location, rows[: num_rows // 2], "part-0")
+    write_fake_dataset(location, rows[num_rows // 2 :], "part-1")
+
+
+def _create_runner(tmp_path: Path) -> CheckpointedBuildRunner:
+    return CheckpointedBuildRunner(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=tmp_path / "data",
+        output_directory=tmp_path / "output",
+        num_shards=2,
+    )
+
+
+def test_run(tmp_path: Path) -> None:
+    _write_dataset(tmp_path / "data", 4)
+
+    checkpoints = list(_create_runner(tmp_path).run())
+
+    assert [(checkpoint.name, checkpoint.completed, checkpoint.num_rows) for checkpoint in checkpoints] == [
+        ("fake_dataset-fake", True, 4),
+        ("fake_dataset-fake_edge", True, 4),
+    ]
+    assert checkpoints[0].paths == [
+        "nodes/label=fake/fake_dataset-fake-00000.parquet",
+        "nodes/label=fake/fake_dataset-fake-00001.parquet",
+    ]
+    assert [
+        row["id"] for path in checkpoints[1].paths for row in pq.read_table(tmp_path / "output" / path).to_pylist()
+    ] == ["0", "1", "2", "3"]
+    assert _create_runner(tmp_path).get_checkpoints() == {checkpoint.name: checkpoint for checkpoint in checkpoints}
+
+
+def test_run_resume(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    _write_dataset(tmp_path / "data", 4)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(checkpoint_module, "write_label_partitions", _fail_on_last_edge_shard)
+        with pytest.raises(MemoryError):
+            list(_create_runner(tmp_path).run())
+    interrupted_checkpoints = _create_runner(tmp_path).get_checkpoints()
+
+    with caplog.at_level(logging.INFO):
+        checkpoints = list(_create_runner(tmp_path).run())
+
+    assert [_get_progress(checkpoint) for checkpoint in interrupted_checkpoints.values()] == [(2, 4), (1, 2)]
+    assert [_get_progress(checkpoint) for checkpoint in checkpoints] == [(2, 4), (2, 4)]
+    assert "Definition fake_dataset-fake is already built, skipping it." in caplog.messages
+    assert "Resuming definition fake_dataset-fake_edge from shard 1." in caplog.messages
+    assert sorted(path.name for path in (tmp_path / "output" / "edges" / "label=fake_edge").iterdir()) == [
+        "fake_dataset-fake_edge-00000.parquet",
+        "fake_dataset-fake_edge-00001.parquet",
+    ]
+
+
+def test_run_resume_deterministic_ids(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    rows = get_fake_rows(2)
+    write_fake_dataset(tmp_path / "data", rows, "part-0")
+    write_fake_dataset(tmp_path / "data", rows, "part-1")
+
+    def create_runner(output_directory: Path, num_shards: int) -> CheckpointedBuildRunner:
+        return CheckpointedBuildRunner(
+            node_definitions=[],
+            edge_definitions=[_random_id_edge_definition],
+            datasets_location=tmp_path / "data",
+            output_directory=output_directory,
+            num_shards=num_shards,
+            deterministic_ids=True,
+        )
+
+    def get_ids(output_directory: Path, checkpoint: DefinitionCheckpoint) -> list[str]:
+        return [row["id"] for path in checkpoint.paths for row in pq.read_table(output_directory / path).to_pylist()]
+
+    num_shards = 2
+    with monkeypatch.context() as patch:
+        patch.setattr(checkpoint_module, "write_label_partitions", _fail_on_last_edge_shard)
+        with pytest.raises(MemoryError):
+            list(create_runner(tmp_path / "sharded", num_shards).run())
+    (checkpoint,) = create_runner(tmp_path / "sharded", num_shards).run()
+    (whole_checkpoint,) = create_runner(tmp_path / "whole", 1).run()
+
+    ids = get_ids(tmp_path / "sharded", checkpoint)
+    assert len(checkpoint.shards) == num_shards
+    assert len(set(ids)) == checkpoint.num_rows == num_shards * len(rows)
+    assert ids == get_ids(tmp_path / "whole", whole_checkpoint)
+
+
+def test_run_changed_dataset(tmp_path: Path) -> None:
+    _write_dataset(tmp_path / "data", 4)
+    list(_create_runner(tmp_path).run())
+    (tmp_path / "data" / DatasetFake.id / "part-1.parquet").unlink()
+    write_fake_dataset(tmp_path / "data", get_fake_rows(3))
+
+    checkpoints = list(_create_runner(tmp_path).run())
+
+    assert [_get_progress(checkpoint) for checkpoint in checkpoints] == [(1, 3), (1, 3)]
+    assert sorted(path.name for path in (tmp_path / "output" / "nodes" / "label=fake").iterdir()) == [
+        "fake_dataset-fake-00000.parquet",
+    ]
+
+
+def _get_progress(checkpoint: DefinitionCheckpoint) -> tuple[int, int]:
+    return len(checkpoint.shards), checkpoint.num_rows
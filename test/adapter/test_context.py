@@ -1,13 +1,61 @@
 from collections.abc import Iterable, Mapping, Sequence
-from typing import Any
+from pathlib import Path
+from typing import Any, cast
+from unittest.mock import MagicMock
 
+import duckdb
 import pytest
 
-from open_targets.adapter.context import AcquisitionContext
-from open_targets.adapter.data_view import ArrayDataView, MappingBackedDataView, SequenceBackedDataView
+from open_targets.adapter._helper._acquisition_definition import recursive_build_expression_function
+from open_targets.adapter._helper._expression import recursive_get_dependent_fields
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext, DatasetShard, DuckDBSettings
+from open_targets.adapter.data_view import ArrayDataView, DataView, MappingBackedDataView, SequenceBackedDataView
+from open_targets.adapter.expression import (
+    BuildCurieExpression,
+    DataSourceToLicenceExpression,
+    Expression,
+    ExtractCuriePrefixExpression,
+    ExtractSubstringExpression,
+    FieldExpression,
+    LiteralExpression,
+    NewUuidExpression,
+    NormaliseCurieExpression,
+    StringConcatenationExpression,
+    StringHashExpression,
+    StringLowerExpression,
+    ToStringExpression,
+    TransformExpression,
+)
+from open_targets.adapter.expression_cache import ExpressionCacheStats
 from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation
-from open_targets.adapter.scan_operation_predicate import ScanOperationPredicateExpression
-from open_targets.data.schema_base import Dataset, Field
+from open_targets.adapter.scan_operation_predicate import (
+    ComparisonExpression,
+    ComparisonOperator,
+    EqualityExpression,
+    InExpression,
+    IsNotNullExpression,
+    LikeExpression,
+    NotExpression,
+    OrExpression,
+    PrefixExpression,
+    ScanOperationPredicateExpression,
+)
+from open_targets.data.schema import (
+    DatasetDisease,
+    DatasetVariant,
+    FieldVariantTranscriptConsequencesElementTargetId,
+    FieldVariantTranscriptConsequencesElementUniprotAccessions,
+    FieldVariantTranscriptConsequencesElementUniprotAccessionsElement,
+    FieldVariantVariantId,
+)
+from open_targets.data.schema_base import Field
+from open_targets.definition.reference_kg.edge.edge_disease_is_a_disease import edge_disease_is_a_disease
+from test.fixture.fake.parquet import get_fake_rows, write_dataset, write_fake_dataset
 from test.fixture.fake.schema import (
     DatasetFake,
     FieldFakeScalar,
@@ -20,32 +68,14 @@ from test.fixture.fake.schema import (
 )
 
 
-def mock_get_query_result_field_value(field: type[Field]) -> Any:
-    if field is FieldFakeScalar or field is FieldFakeStruct:
-        return field.get_value(row_id=0)
-    if field is FieldFakeStructSequence:
-        return field.get_value(row_id=0, num_elements=2)
-    msg = f"Field {field} is not a top field"
-    raise ValueError(msg)
-
-
-def mock_get_query_result(
-    dataset: type[Dataset],
-    predicate: ScanOperationPredicateExpression | None,
-    fields: Iterable[type[Field]],
-) -> Iterable[tuple[Any]]:
-    return [tuple(mock_get_query_result_field_value(field) for field in fields)]
-
-
 @pytest.fixture
-def context(requested_fields: Sequence[type[Field]]) -> AcquisitionContext:
-    context = AcquisitionContext(
+def parquet_context(tmp_path: Path) -> AcquisitionContext:
+    write_fake_dataset(tmp_path, get_fake_rows(1))
+    return AcquisitionContext(
         node_definitions=[],
         edge_definitions=[],
-        datasets_location="",
+        datasets_location=tmp_path,
     )
-    context._get_query_result = mock_get_query_result
-    return context
 
 
 @pytest.mark.parametrize(
@@ -83,11 +113,11 @@ def context(requested_fields: Sequence[type[Field]]) -> AcquisitionContext:
     ],
 )
 def test_get_scan_result_stream_row_scan_operation(
-    context: AcquisitionContext,
+    parquet_context: AcquisitionContext,
     requested_fields: Sequence[type[Field]],
     expected_result: Sequence[Any],
 ) -> None:
-    stream = context.get_scan_result_stream(
+    stream = parquet_context.get_scan_result_stream(
         RowScanOperation(dataset=DatasetFake),
         requested_fields,
     )
@@ -96,6 +126,48 @@ def test_get_scan_result_stream_row_scan_operation(
     assert result == expected_result
 
 
+@pytest.mark.parametrize(
+    ("requested_fields", "expected_projected_fields"),
+    [
+        ((FieldFakeStructStructScalar,), [FieldFakeStructStructScalar]),
+        ((FieldFakeStructStructScalar, FieldFakeStructStruct), [FieldFakeStructStruct]),
+        (
+            (FieldFakeStructStructScalar, FieldFakeStructSequence),
+            [FieldFakeStructStructScalar, FieldFakeStructSequence],
+        ),
+        (
+            (FieldFakeStructSequenceElementScalar, FieldFakeStruct),
+            [FieldFakeStructSequenceElementScalar, FieldFakeStruct],
+        ),
+        ((FieldFakeStructSequenceElement,), [FieldFakeStructSequence]),
+    ],
+)
+def test_get_scan_result_stream_row_scan_operation_projection(
+    parquet_context: AcquisitionContext,
+    requested_fields: Sequence[type[Field]],
+    expected_projected_fields: Sequence[type[Field]],
+) -> None:
+    parquet_context._build_query = MagicMock(wraps=parquet_context._build_query)
+    list(parquet_context.get_scan_result_stream(RowScanOperation(dataset=DatasetFake), requested_fields))
+    projected_fields = parquet_context._build_query.call_args.args[2]
+    assert list(projected_fields) == expected_projected_fields
+
+
+def test_get_scan_result_stream_row_scan_operation_through_sequence(tmp_path: Path) -> None:
+    rows = get_fake_rows(2)
+    rows[1] = {**rows[1], FieldFakeStruct.name: {**rows[1][FieldFakeStruct.name], FieldFakeStructSequence.name: None}}
+    write_fake_dataset(tmp_path, rows)
+    context = AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path)
+    stream = context.get_scan_result_stream(
+        RowScanOperation(dataset=DatasetFake),
+        [FieldFakeStructSequenceElementScalar],
+    )
+    assert [view[FieldFakeStructSequenceElementScalar] for view in stream] == [
+        [FieldFakeStructSequenceElementScalar.get_value(row_id=0, element_id=i) for i in range(2)],
+        None,
+    ]
+
+
 @pytest.mark.parametrize(
     ("requested_fields", "expected_result"),
     [
@@ -174,11 +246,11 @@ def test_get_scan_result_stream_row_scan_operation(
     ],
 )
 def test_get_scan_result_stream_exploding_scan_operation(
-    context: AcquisitionContext,
+    parquet_context: AcquisitionContext,
     requested_fields: Sequence[type[Field]],
     expected_result: Sequence[Any],
 ) -> None:
-    stream = context.get_scan_result_stream(
+    stream = parquet_context.get_scan_result_stream(
         ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
         requested_fields,
     )
@@ -187,6 +259,782 @@ def test_get_scan_result_stream_exploding_scan_operation(
     assert result == expected_result
 
 
+@pytest.mark.parametrize("fetch_batch_size", [None, 1, 3, 100])
+def test_get_scan_result_stream_fetch_batch_size(tmp_path: Path, fetch_batch_size: int | None) -> None:
+    rows = get_fake_rows(10)
+    write_fake_dataset(tmp_path, rows)
+    context = AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[],
+        datasets_location=tmp_path,
+        fetch_batch_size=fetch_batch_size,
+    )
+    stream = context.get_scan_result_stream(RowScanOperation(dataset=DatasetFake), [FieldFakeScalar])
+    assert [view[FieldFakeScalar] for view in stream] == [row[FieldFakeScalar.name] for row in rows]
+
+
+def test_get_query_result_stream_batch_retry() -> None:
+    context = AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[],
+        datasets_location="",
+        fetch_batch_size=2,
+    )
+    query = MagicMock()
+    query.fetchmany.side_effect = [[(1,), (2,)], RuntimeError("transient"), [(3,)], []]
+    assert list(context._get_query_result_stream(query)) == [(1,), (2,), (3,)]
+    query.fetchmany.assert_called_with(2)
+
+
+def test_get_query_result_stream_batch_retry_exhausted() -> None:
+    context = AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[],
+        datasets_location="",
+        fetch_batch_size=2,
+    )
+    query = MagicMock()
+    query.fetchmany.side_effect = [[(1,)], *[RuntimeError("persistent")] * 10]
+    assert list(context._get_query_result_stream(query)) == [(1,)]
+
+
+def test_invalid_fetch_batch_size() -> None:
+    with pytest.raises(ValueError, match="batch size"):
+        AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location="", fetch_batch_size=0)
+
+
+@pytest.mark.parametrize(
+    ("predicate", "expected_result"),
+    [
+        (EqualityExpression(FieldFakeStructStructScalar, "struct_struct_scalar_3"), ["3"]),
+        (IsNotNullExpression(FieldFakeScalar), [str(i) for i in range(10)]),
+        (ComparisonExpression(FieldFakeScalar, ComparisonOperator.LESS_THAN, "2"), ["0", "1"]),
+        (ComparisonExpression(FieldFakeScalar, ComparisonOperator.LESS_THAN_OR_EQUAL, "2"), ["0", "1", "2"]),
+        (ComparisonExpression(FieldFakeScalar, ComparisonOperator.GREATER_THAN, "7"), ["8", "9"]),
+        (ComparisonExpression(FieldFakeScalar, ComparisonOperator.GREATER_THAN_OR_EQUAL, "7"), ["7", "8", "9"]),
+        (
+            ComparisonExpression(
+                FieldFakeStructStructScalar,
+                ComparisonOperator.GREATER_THAN,
+                "struct_struct_scalar_8",
+            ),
+            ["9"],
+        ),
+        (InExpression(FieldFakeScalar, ["1", "5", "42"]), ["1", "5"]),
+        (InExpression(FieldFakeScalar, [str(i) for i in range(1, 1000, 2)]), ["1", "3", "5", "7", "9"]),
+        (
+            InExpression(FieldFakeStructStructScalar, [f"struct_struct_scalar_{i}" for i in range(4, 500)]),
+            [
+                "4",
+                "5",
+                "6",
+                "7",
+                "8",
+                "9",
+            ],
+        ),
+        (InExpression(FieldFakeScalar, []), []),
+        (NotExpression(InExpression(FieldFakeScalar, ["0", "1"])), [str(i) for i in range(2, 10)]),
+        (NotExpression(InExpression(FieldFakeScalar, [str(i) for i in range(2, 100)])), ["0", "1"]),
+        (LikeExpression(FieldFakeStructStructScalar, "%scalar_1"), ["1"]),
+        (LikeExpression(FieldFakeScalar, "_"), [str(i) for i in range(10)]),
+        (PrefixExpression(FieldFakeStructStructScalar, "struct_struct_scalar_9"), ["9"]),
+        (
+            OrExpression(
+                [
+                    InExpression(FieldFakeScalar, [str(i) for i in range(100)]),
+                    EqualityExpression(FieldFakeScalar, None),
+                ],
+            ),
+            [str(i) for i in range(10)],
+        ),
+    ],
+)
+def test_get_scan_result_stream_predicate(
+    tmp_path: Path,
+    predicate: ScanOperationPredicateExpression,
+    expected_result: list[str],
+) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(10))
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        stream = context.get_scan_result_stream(
+            RowScanOperation(dataset=DatasetFake, predicate=predicate),
+            [FieldFakeScalar],
+        )
+        assert [view[FieldFakeScalar] for view in stream] == expected_result
+
+
+@pytest.mark.parametrize("num_values", [1, 100])
+def test_get_scan_result_stream_not_in_predicate_with_null(tmp_path: Path, num_values: int) -> None:
+    rows = get_fake_rows(3)
+    rows[0] = {**rows[0], FieldFakeScalar.name: None}
+    write_fake_dataset(tmp_path, rows)
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        stream = context.get_scan_result_stream(
+            RowScanOperation(
+                dataset=DatasetFake,
+                predicate=NotExpression(InExpression(FieldFakeScalar, ["1", *[f"x{i}" for i in range(num_values)]])),
+            ),
+            [FieldFakeScalar],
+        )
+        assert [view[FieldFakeScalar] for view in stream] == [None, "2"]
+
+
+def test_get_scan_result_stream_in_predicate_tables(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    predicates = [InExpression(FieldFakeScalar, [str(i) for i in range(offset, 100)]) for offset in [1, 1, 2]]
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        for predicate in [*predicates, *predicates]:
+            list(context.get_scan_result_stream(RowScanOperation(dataset=DatasetFake, predicate=predicate), []))
+        tables = context.connection.execute("SELECT table_name FROM duckdb_tables() WHERE temporary").fetchall()
+
+    assert sorted(tables) == [("__in_set_0",), ("__in_set_1",)]
+
+
+def test_get_scan_result_stream_predicate_under_sequence(parquet_context: AcquisitionContext) -> None:
+    with pytest.raises(ValueError, match="nested in sequences"):
+        list(
+            parquet_context.get_scan_result_stream(
+                RowScanOperation(
+                    dataset=DatasetFake,
+                    predicate=EqualityExpression(FieldFakeStructSequenceElementScalar, "x"),
+                ),
+                [FieldFakeScalar],
+            ),
+        )
+
+
+def test_duckdb_settings(tmp_path: Path) -> None:
+    settings = DuckDBSettings(
+        threads=2,
+        memory_limit="1GB",
+        temp_directory=tmp_path / "spill",
+        preserve_insertion_order=False,
+        parquet_metadata_cache=False,
+        config={"enable_object_cache": True},
+    )
+    with AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[],
+        datasets_location=tmp_path,
+        duckdb_settings=settings,
+    ) as context:
+        assert context.connection.sql(
+            "SELECT current_setting('threads'), current_setting('temp_directory'), "
+            "current_setting('preserve_insertion_order'), current_setting('parquet_metadata_cache'), "
+            "current_setting('enable_object_cache')",
+        ).fetchall() == [(2, str(tmp_path / "spill"), False, False, True)]
+
+
+def test_connection_per_context(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    with (
+        AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context_a,
+        AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context_b,
+    ):
+        assert context_a.connection is not context_b.connection
+        stream_a = iter(context_a.get_scan_result_stream(RowScanOperation(dataset=DatasetFake), [FieldFakeScalar]))
+        stream_b = iter(context_b.get_scan_result_stream(RowScanOperation(dataset=DatasetFake), [FieldFakeScalar]))
+        assert [next(stream_a)[FieldFakeScalar], next(stream_b)[FieldFakeScalar]] == ["0", "0"]
+        assert [view[FieldFakeScalar] for view in stream_a] == ["1", "2"]
+
+
+def test_close(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(1))
+    context = AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path)
+    context.close()
+    with pytest.raises(duckdb.ConnectionException):
+        list(context.get_scan_result_stream(RowScanOperation(dataset=DatasetFake), [FieldFakeScalar]))
+
+
+def test_get_dataset_shards_by_files(tmp_path: Path) -> None:
+    num_shards = 2
+    for index in range(5):
+        write_fake_dataset(tmp_path, get_fake_rows(index + 1), file_name=f"part-{index}")
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        shards = context.get_dataset_shards(DatasetFake, num_shards)
+        expected = [view[FieldFakeScalar] for view in _scan_fake_scalars(context)]
+    assert len(shards) == num_shards
+    assert all(shard.row_range is None for shard in shards)
+    assert sorted(file for shard in shards for file in shard.files) == sorted(
+        str(path) for path in (tmp_path / DatasetFake.id).glob("*.parquet")
+    )
+    assert _scan_shards(tmp_path, shards) == expected
+
+
+def test_get_dataset_shards_by_row_groups(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(5000), row_group_size=2048)
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        shards = context.get_dataset_shards(DatasetFake, _NUM_SHARDS)
+        expected = [view[FieldFakeScalar] for view in _scan_fake_scalars(context)]
+    assert [shard.row_range for shard in shards] == [(0, 2048), (2048, 4096), (4096, 5000)]
+    assert _scan_shards(tmp_path, shards) == expected
+
+
+def test_dataset_shards_with_limit() -> None:
+    with pytest.raises(ValueError, match="limit"):
+        AcquisitionContext(
+            node_definitions=[],
+            edge_definitions=[],
+            datasets_location="",
+            limit=1,
+            dataset_shards={DatasetFake: DatasetShard(files=("part-0.parquet",))},
+        )
+
+
+def _scan_fake_scalars(context: AcquisitionContext) -> Iterable[DataView]:
+    return context.get_scan_result_stream(RowScanOperation(dataset=DatasetFake), [FieldFakeScalar])
+
+
+def _scan_shards(location: Path, shards: Sequence[DatasetShard]) -> list[Any]:
+    result: list[Any] = []
+    for shard in shards:
+        with AcquisitionContext(
+            node_definitions=[],
+            edge_definitions=[],
+            datasets_location=location,
+            dataset_shards={DatasetFake: shard},
+        ) as context:
+            result.extend(view[FieldFakeScalar] for view in _scan_fake_scalars(context))
+    return result
+
+
+_fused_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="fake",
+    properties=[FieldFakeStructStructScalar],
+)
+_fused_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake, predicate=EqualityExpression(FieldFakeScalar, "1")),
+    primary_id=StringConcatenationExpression([FieldExpression(FieldFakeScalar), LiteralExpression("-edge")]),
+    source=FieldFakeScalar,
+    target=FieldFakeStructStructScalar,
+    label="fake_edge",
+    properties=[],
+)
+_fused_negated_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(
+        dataset=DatasetFake,
+        predicate=NotExpression(EqualityExpression(FieldFakeScalar, "1")),
+    ),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label="fake_negated_edge",
+    properties=[],
+)
+_fused_exploded_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+    primary_id=FieldFakeStructSequenceElementScalar,
+    label="fake_element",
+    properties=[FieldFakeScalar],
+)
+
+
+@pytest.mark.parametrize("limit", [None, 2])
+def test_get_fused_acquisition_generators(tmp_path: Path, limit: int | None) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(4))
+    definitions: list[AcquisitionDefinition[Any]] = [
+        _fused_node_definition,
+        _fused_edge_definition,
+        _fused_negated_edge_definition,
+        _fused_exploded_node_definition,
+    ]
+    context = AcquisitionContext(
+        node_definitions=[_fused_node_definition, _fused_exploded_node_definition],
+        edge_definitions=[_fused_edge_definition, _fused_negated_edge_definition],
+        datasets_location=tmp_path,
+        limit=limit,
+    )
+    expected = [list(context.get_acquisition_generator(definition)) for definition in definitions]
+
+    context._build_base_query = MagicMock(wraps=context._build_base_query)
+    result: list[list[Any]] = [[] for _ in definitions]
+    for stream in context.get_fused_acquisition_generators():
+        for definition, item in stream:
+            result[definitions.index(definition)].append(item)
+
+    assert result == expected
+    # One query for the row scans and one for the exploding scan, unless the
+    # limit requires the predicates to be scanned separately.
+    assert context._build_base_query.call_count == (2 if limit is None else 4)
+
+
+def test_get_fused_acquisition_generators_routes_predicates(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    context = AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[_fused_edge_definition, _fused_negated_edge_definition],
+        datasets_location=tmp_path,
+    )
+    (stream,) = context.get_fused_acquisition_generators()
+    assert [(definition.label, item.id) for definition, item in stream] == [
+        ("fake_negated_edge", "0"),
+        ("fake_edge", "1-edge"),
+        ("fake_negated_edge", "2"),
+    ]
+
+
+@pytest.mark.parametrize("expression_cache_size", [None, 16])
+def test_get_expression_cache_stats(tmp_path: Path, expression_cache_size: int | None) -> None:
+    file_names = ["part-0", "part-1"]
+    rows = get_fake_rows(3)
+    for file_name in file_names:
+        write_fake_dataset(tmp_path, rows, file_name=file_name)
+    definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=TransformExpression(FieldExpression(FieldFakeScalar), str.upper),
+        label="fake",
+        properties=[],
+    )
+    with AcquisitionContext(
+        node_definitions=[definition],
+        edge_definitions=[],
+        datasets_location=tmp_path,
+        expression_cache_size=expression_cache_size,
+    ) as context:
+        for _ in range(2):
+            assert len(list(context.get_acquisition_generator(definition))) == len(file_names) * len(rows)
+        stats = context.get_expression_cache_stats(definition)
+        num_caches = len(context._expression_caches)
+
+    if expression_cache_size is None:
+        assert stats == ExpressionCacheStats()
+    else:
+        # Only the cache of the last acquisition is held.
+        assert stats == ExpressionCacheStats(hits=6, misses=6, size=3)
+        assert num_caches == 1
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 10])
+def test_get_acquisition_batch_generator(tmp_path: Path, batch_size: int) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(4))
+    definitions: list[AcquisitionDefinition[Any]] = [
+        _fused_node_definition,
+        _fused_edge_definition,
+        _fused_exploded_node_definition,
+    ]
+    with AcquisitionContext(
+        node_definitions=[_fused_node_definition, _fused_exploded_node_definition],
+        edge_definitions=[_fused_edge_definition],
+        datasets_location=tmp_path,
+    ) as context:
+        for definition in definitions:
+            batches = list(context.get_acquisition_batch_generator(definition, batch_size))
+            assert all(0 < len(batch) <= batch_size for batch in batches)
+            assert [item for batch in batches for item in batch] == list(context.get_acquisition_generator(definition))
+
+
+def test_get_acquisition_batch_generator_invalid(tmp_path: Path) -> None:
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        with pytest.raises(ValueError, match="Batch size"):
+            context.get_acquisition_batch_generator(_fused_node_definition, 0)
+        with pytest.raises(ValueError, match="not registered"):
+            context.get_acquisition_batch_generator(_fused_node_definition)
+
+
+@pytest.mark.parametrize("deterministic_ids", [False, True])
+def test_deterministic_ids(tmp_path: Path, *, deterministic_ids: bool) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    definition = ExpressionEdgeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=NewUuidExpression(),
+        source=FieldFakeScalar,
+        target=LiteralExpression("fake"),
+        label="fake_edge",
+        properties=[],
+    )
+    ids: list[list[str]] = []
+    for _ in range(2):
+        with AcquisitionContext(
+            node_definitions=[],
+            edge_definitions=[definition],
+            datasets_location=tmp_path,
+            deterministic_ids=deterministic_ids,
+        ) as context:
+            ids.append([edge.id for edge in context.get_acquisition_generator(definition)])
+
+    assert len(set(ids[0] + ids[1])) == (3 if deterministic_ids else 6)
+    assert (ids[0] == ids[1]) == deterministic_ids
+
+
+_NUM_SHARDS = 3
+
+
+# Either whole files or row groups of a single file make the shards.
+@pytest.mark.parametrize(("num_files", "num_repeats"), [(1, 3 * 1024), (3, 1)])
+def test_deterministic_ids_shards(tmp_path: Path, num_files: int, num_repeats: int) -> None:
+    for index in range(num_files):
+        write_fake_dataset(tmp_path, get_fake_rows(2) * num_repeats, f"part-{index}", row_group_size=2048)
+    definition = ExpressionEdgeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=NewUuidExpression(),
+        source=FieldFakeScalar,
+        target=LiteralExpression("fake"),
+        label="fake_edge",
+        properties=[],
+    )
+
+    def get_ids(shard: DatasetShard | None) -> list[str]:
+        with AcquisitionContext(
+            node_definitions=[],
+            edge_definitions=[definition],
+            datasets_location=tmp_path,
+            dataset_shards={DatasetFake: shard} if shard else None,
+            deterministic_ids=True,
+        ) as context:
+            return [edge.id for edge in context.get_acquisition_generator(definition)]
+
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        shards = context.get_dataset_shards(DatasetFake, _NUM_SHARDS)
+    whole_ids = get_ids(None)
+    sharded_ids = [item_id for shard in shards for item_id in get_ids(shard)]
+
+    assert len(shards) == _NUM_SHARDS
+    assert len(set(whole_ids)) == len(whole_ids)
+    assert sharded_ids == whole_ids
+
+
+def test_deterministic_ids_location(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(2))
+    definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=NewUuidExpression(),
+        label="fake",
+        properties=[],
+    )
+    monkeypatch.chdir(tmp_path)
+    ids: list[list[str]] = []
+    for datasets_location in [tmp_path, Path()]:
+        with AcquisitionContext(
+            node_definitions=[definition],
+            edge_definitions=[],
+            datasets_location=datasets_location,
+            deterministic_ids=True,
+        ) as context:
+            ids.append([node.id for node in context.get_acquisition_generator(definition)])
+
+    assert ids[0] == ids[1]
+
+
+def test_get_scan_result_stream_exploding_scan_operation_null_and_empty(tmp_path: Path) -> None:
+    rows = get_fake_rows(3)
+    rows[0] = {**rows[0], FieldFakeStruct.name: {**rows[0][FieldFakeStruct.name], FieldFakeStructSequence.name: None}}
+    rows[1] = {**rows[1], FieldFakeStruct.name: {**rows[1][FieldFakeStruct.name], FieldFakeStructSequence.name: []}}
+    write_fake_dataset(tmp_path, rows)
+    context = AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path)
+    stream = context.get_scan_result_stream(
+        ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+        [FieldFakeScalar, FieldFakeStructSequenceElementScalar],
+    )
+    assert [(view[FieldFakeScalar], view[FieldFakeStructSequenceElementScalar]) for view in stream] == [
+        ("2", FieldFakeStructSequenceElementScalar.get_value(row_id=2, element_id=0)),
+        ("2", FieldFakeStructSequenceElementScalar.get_value(row_id=2, element_id=1)),
+    ]
+
+
+def test_get_scan_result_stream_nested_exploding_scan_operation(tmp_path: Path) -> None:
+    write_dataset(
+        tmp_path,
+        DatasetVariant,
+        [
+            {
+                "variantId": "v1",
+                "transcriptConsequences": [
+                    {"targetId": "t1", "uniprotAccessions": ["p1", "p2"]},
+                    {"targetId": "t2", "uniprotAccessions": None},
+                    {"targetId": "t3", "uniprotAccessions": []},
+                    {"targetId": "t4", "uniprotAccessions": ["p3"]},
+                ],
+            },
+            {"variantId": "v2", "transcriptConsequences": None},
+            {"variantId": "v3", "transcriptConsequences": [{"targetId": "t5", "uniprotAccessions": ["p4"]}]},
+        ],
+    )
+    context = AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path)
+    stream = context.get_scan_result_stream(
+        ExplodingScanOperation(
+            dataset=DatasetVariant,
+            exploded_field=FieldVariantTranscriptConsequencesElementUniprotAccessions,
+        ),
+        [
+            FieldVariantVariantId,
+            FieldVariantTranscriptConsequencesElementTargetId,
+            FieldVariantTranscriptConsequencesElementUniprotAccessionsElement,
+        ],
+    )
+    assert [
+        (
+            view[FieldVariantVariantId],
+            view[FieldVariantTranscriptConsequencesElementTargetId],
+            view[FieldVariantTranscriptConsequencesElementUniprotAccessionsElement],
+        )
+        for view in stream
+    ] == [
+        ("v1", "t1", "p1"),
+        ("v1", "t1", "p2"),
+        ("v1", "t2", None),
+        ("v1", "t4", "p3"),
+        ("v3", "t5", "p4"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("element_predicate", "expected_result"),
+    [
+        (None, [(row_id, element_id) for row_id in range(3) for element_id in range(2)]),
+        (
+            InExpression(
+                FieldFakeStructSequenceElementScalar,
+                [FieldFakeStructSequenceElementScalar.get_value(row_id=2, element_id=1)],
+            ),
+            [(2, 1)],
+        ),
+        (
+            NotExpression(
+                PrefixExpression(FieldFakeStructSequenceElementScalar, "struct_sequence_element_struct_scalar_2"),
+            ),
+            [(row_id, element_id) for row_id in range(2) for element_id in range(2)],
+        ),
+    ],
+)
+def test_get_scan_result_stream_exploding_scan_operation_element_predicate(
+    tmp_path: Path,
+    element_predicate: ScanOperationPredicateExpression | None,
+    expected_result: list[tuple[int, int]],
+) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        stream = context.get_scan_result_stream(
+            ExplodingScanOperation(
+                dataset=DatasetFake,
+                exploded_field=FieldFakeStructSequence,
+                element_predicate=element_predicate,
+            ),
+            [FieldFakeScalar, FieldFakeStructSequenceElementScalar],
+        )
+        assert [(view[FieldFakeScalar], view[FieldFakeStructSequenceElementScalar]) for view in stream] == [
+            (str(row_id), FieldFakeStructSequenceElementScalar.get_value(row_id=row_id, element_id=element_id))
+            for row_id, element_id in expected_result
+        ]
+
+
+def test_get_scan_result_stream_nested_exploding_scan_operation_element_predicate(tmp_path: Path) -> None:
+    write_dataset(
+        tmp_path,
+        DatasetVariant,
+        [
+            {
+                "variantId": "v1",
+                "transcriptConsequences": [
+                    {"targetId": "t1", "uniprotAccessions": ["p1", None]},
+                    {"targetId": "t2", "uniprotAccessions": None},
+                ],
+            },
+        ],
+    )
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        stream = context.get_scan_result_stream(
+            ExplodingScanOperation(
+                dataset=DatasetVariant,
+                exploded_field=FieldVariantTranscriptConsequencesElementUniprotAccessions,
+                element_predicate=IsNotNullExpression(
+                    FieldVariantTranscriptConsequencesElementUniprotAccessionsElement,
+                ),
+            ),
+            [
+                FieldVariantTranscriptConsequencesElementTargetId,
+                FieldVariantTranscriptConsequencesElementUniprotAccessionsElement,
+            ],
+        )
+        assert [
+            (
+                view[FieldVariantTranscriptConsequencesElementTargetId],
+                view[FieldVariantTranscriptConsequencesElementUniprotAccessionsElement],
+            )
+            for view in stream
+        ] == [("t1", "p1")]
+
+
+def test_get_scan_result_stream_element_predicate_outside_element(parquet_context: AcquisitionContext) -> None:
+    with pytest.raises(ValueError, match="exploded element"):
+        list(
+            parquet_context.get_scan_result_stream(
+                ExplodingScanOperation(
+                    dataset=DatasetFake,
+                    exploded_field=FieldFakeStructSequence,
+                    element_predicate=IsNotNullExpression(FieldFakeScalar),
+                ),
+                [FieldFakeScalar],
+            ),
+        )
+
+
+def test_reference_definition_skips_null_elements(tmp_path: Path) -> None:
+    write_dataset(
+        tmp_path,
+        DatasetDisease,
+        [
+            {"id": "d1", "parents": ["d2", None]},
+            {"id": "d2", "parents": None},
+            {"id": "d3", "parents": []},
+        ],
+    )
+    with AcquisitionContext(
+        node_definitions=[],
+        edge_definitions=[edge_disease_is_a_disease],
+        datasets_location=tmp_path,
+    ) as context:
+        edges = list(context.get_acquisition_generator(edge_disease_is_a_disease))
+    assert [(edge.source_id, edge.target_id) for edge in edges] == [("d1", "d2")]
+
+
+_FAILURE = object()
+_compiled_expression_cases = [
+    (
+        RowScanOperation(dataset=DatasetFake),
+        StringConcatenationExpression(
+            [FieldExpression(FieldFakeScalar), LiteralExpression("-"), FieldExpression(FieldFakeStructStructScalar)],
+        ),
+        True,
+    ),
+    (RowScanOperation(dataset=DatasetFake), ToStringExpression(FieldExpression(FieldFakeScalar)), True),
+    (RowScanOperation(dataset=DatasetFake), ToStringExpression(LiteralExpression(1.5)), False),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        StringLowerExpression(
+            ExtractSubstringExpression(FieldExpression(FieldFakeStructStructScalar), LiteralExpression("_"), -1),
+        ),
+        True,
+    ),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        ExtractSubstringExpression(FieldExpression(FieldFakeStructStructScalar), LiteralExpression("_"), 5),
+        True,
+    ),
+    (RowScanOperation(dataset=DatasetFake), DataSourceToLicenceExpression(FieldExpression(FieldFakeScalar)), True),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        StringHashExpression(StringConcatenationExpression([FieldExpression(FieldFakeScalar), LiteralExpression("!")])),
+        True,
+    ),
+    (RowScanOperation(dataset=DatasetFake), StringHashExpression(FieldExpression(FieldFakeScalar)), True),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        NormaliseCurieExpression(
+            StringConcatenationExpression([LiteralExpression("GO_"), FieldExpression(FieldFakeScalar)]),
+        ),
+        True,
+    ),
+    (RowScanOperation(dataset=DatasetFake), NormaliseCurieExpression(FieldExpression(FieldFakeScalar)), True),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        BuildCurieExpression(LiteralExpression("GO"), FieldExpression(FieldFakeScalar)),
+        True,
+    ),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        BuildCurieExpression(
+            LiteralExpression("GO"),
+            StringLowerExpression(FieldExpression(FieldFakeScalar)),
+            normalise=False,
+        ),
+        True,
+    ),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        BuildCurieExpression(
+            FieldExpression(FieldFakeStructStructScalar),
+            FieldExpression(FieldFakeScalar),
+            normalise=False,
+        ),
+        True,
+    ),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        ExtractCuriePrefixExpression(FieldExpression(FieldFakeStructStructScalar), normalise=False),
+        True,
+    ),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        ExtractCuriePrefixExpression(FieldExpression(FieldFakeStructStructScalar)),
+        False,
+    ),
+    (RowScanOperation(dataset=DatasetFake), TransformExpression(FieldExpression(FieldFakeScalar), str.upper), False),
+    (
+        RowScanOperation(dataset=DatasetFake),
+        ToStringExpression(FieldExpression(FieldFakeStructSequenceElementScalar)),
+        False,
+    ),
+    (
+        ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+        StringConcatenationExpression(
+            [
+                FieldExpression(FieldFakeScalar),
+                LiteralExpression("->"),
+                FieldExpression(FieldFakeStructSequenceElementScalar),
+            ],
+        ),
+        True,
+    ),
+]
+
+
+@pytest.mark.parametrize(("scan_operation", "expression", "compiled"), _compiled_expression_cases)
+def test_compile_expression(
+    tmp_path: Path,
+    scan_operation: RowScanOperation | ExplodingScanOperation,
+    expression: Expression[Any],
+    *,
+    compiled: bool,
+) -> None:
+    rows = get_fake_rows(3)
+    rows[1] = {**rows[1], FieldFakeScalar.name: None}
+    write_fake_dataset(tmp_path, rows)
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        compiled_expression = context.compile_expression(scan_operation, expression)
+
+        assert (compiled_expression != expression) == compiled
+        assert _evaluate(context, scan_operation, compiled_expression) == _evaluate(
+            context,
+            scan_operation,
+            expression,
+        )
+
+
+def test_compile_expression_computed_columns(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(2))
+    scan_operation = RowScanOperation(dataset=DatasetFake)
+    expression = StringConcatenationExpression([FieldExpression(FieldFakeScalar), LiteralExpression("!")])
+    with AcquisitionContext(node_definitions=[], edge_definitions=[], datasets_location=tmp_path) as context:
+        compiled_expression = context.compile_expression(scan_operation, expression)
+        (computed_field,) = recursive_get_dependent_fields(compiled_expression)
+
+        assert context.compile_expression(scan_operation, expression) == compiled_expression
+        stream = context.get_scan_result_stream(scan_operation, [FieldFakeStructStructScalar, computed_field])
+        # Fields only computed from are not fetched.
+        assert [view.raw_data for view in cast("Iterable[SequenceBackedDataView]", stream)] == [
+            ("struct_struct_scalar_0", "0!"),
+            ("struct_struct_scalar_1", "1!"),
+        ]
+
+
+def _evaluate(
+    context: AcquisitionContext,
+    scan_operation: RowScanOperation | ExplodingScanOperation,
+    expression: Expression[Any],
+) -> list[Any]:
+    function = recursive_build_expression_function(expression)
+    values: list[Any] = []
+    for data in context.get_scan_result_stream(scan_operation, list(recursive_get_dependent_fields(expression))):
+        try:
+            values.append(function(data))
+        except (AttributeError, IndexError, TypeError, ValueError):  # noqa: PERF203
+            values.append(_FAILURE)
+    return values
+
+
 def _serialise(
     value: Any,
 ) -> Sequence[Any] | Mapping[type[Field], Any]:
@@ -0,0 +1,67 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from bioregistry.constants import BIOREGISTRY_PATH
+from bioregistry.resource_manager import Manager
+from bioregistry.schema import Resource
+from bioregistry.schema_utils import _registry_from_path
+
+from open_targets.adapter._helper import _curie
+from open_targets.adapter._helper._curie import (
+    CurieLookup,
+    _get_curie_lookup_file_name,
+    build_curie_lookup,
+    load_curie_lookup,
+)
+
+
+@pytest.fixture(scope="module")
+def lookup() -> CurieLookup:
+    return build_curie_lookup()
+
+
+@pytest.fixture(scope="module")
+def manager() -> Manager:
+    registry = dict(_registry_from_path(BIOREGISTRY_PATH))
+    registry["otar"] = Resource(prefix="otar", synonyms=["OTAR"], preferred_prefix="otar")
+    return Manager(registry=registry)
+
+
+def _get_curies(manager: Manager) -> list[tuple[str, str]]:
+    curies = [("OTAR:0001", ":"), ("unknown:1", ":"), ("GO", ":"), ("", ":"), ("go:", ":")]
+    for prefix, resource in manager.registry.items():
+        banana = resource.get_banana() or prefix
+        for synonym in [prefix, prefix.upper(), *(resource.synonyms or [])]:
+            for separator in [":", "_", "/"]:
+                curies.append((f"{synonym}{separator}{banana}{resource.get_banana_peel()}0001", separator))
+                curies.append((f"{synonym}{separator}{banana.upper()}_0001", separator))
+                curies.append((f"{synonym}{separator}0001", separator))
+    return curies
+
+
+def test_lookup_normalises_as_bioregistry(lookup: CurieLookup, manager: Manager) -> None:
+    for curie, separator in _get_curies(manager):
+        assert lookup.normalise_curie(curie, separator) == manager.normalize_curie(curie, sep=separator), curie
+        prefix = curie.partition(separator)[0]
+        assert lookup.normalise_prefix(prefix) == manager.normalize_prefix(prefix), prefix
+
+
+def test_load_curie_lookup_caches_lookup(tmp_path: Path, lookup: CurieLookup) -> None:
+    with patch.object(_curie, "build_curie_lookup", return_value=lookup) as build:
+        built = load_curie_lookup(tmp_path)
+        loaded = load_curie_lookup(tmp_path)
+
+    assert build.call_count == 1
+    assert (tmp_path / _get_curie_lookup_file_name()).exists()
+    assert loaded == built == lookup
+
+
+def test_load_curie_lookup_rebuilds_invalid_cache(tmp_path: Path, lookup: CurieLookup) -> None:
+    (tmp_path / _get_curie_lookup_file_name()).write_text('{"format_version": 0}')
+
+    with patch.object(_curie, "build_curie_lookup", return_value=lookup) as build:
+        assert load_curie_lookup(tmp_path) == lookup
+        assert load_curie_lookup(tmp_path) == lookup
+
+    assert build.call_count == 1
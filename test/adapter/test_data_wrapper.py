@@ -67,6 +67,23 @@ def test_sequence_backed_data_view_get_keys(dataset_first_row: Mapping[str, Any]
     assert set(view.keys()) == {FieldFakeScalar, FieldFakeStruct}
 
 
+@pytest.mark.parametrize(
+    ("struct_value", "expected"),
+    [
+        (FieldFakeStruct.get_value(row_id=0), FieldFakeStructStructScalar.get_value(row_id=0)),
+        ({FieldFakeStructStruct.name: None, FieldFakeStructSequence.name: []}, None),
+        (None, None),
+    ],
+)
+def test_sequence_backed_data_view_deep_path(struct_value: Mapping[str, object] | None, expected: str | None) -> None:
+    field_path_map: dict[type[Field], int | Sequence[type[Field]]] = {
+        FieldFakeStruct: 0,
+        FieldFakeStructStructScalar: [FieldFakeStruct, FieldFakeStructStruct, FieldFakeStructStructScalar],
+    }
+    view = SequenceBackedDataView(field_path_map, (struct_value,), [FieldFakeStructStructScalar])
+    assert view[FieldFakeStructStructScalar] == expected
+
+
 @pytest.mark.parametrize(
     ("keys", "expected"),
     [
@@ -0,0 +1,116 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.deduplication import DigestSet, NodeDeduplicator
+from open_targets.adapter.output import NodeBatch, NodeInfo
+from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import (
+    DatasetFake,
+    FieldFakeScalar,
+    FieldFakeStructSequence,
+    FieldFakeStructStructScalar,
+)
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="fake",
+    properties=[],
+)
+_exploded_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+    primary_id=FieldFakeScalar,
+    label="fake",
+    properties=[FieldFakeStructStructScalar],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label="fake_edge",
+    properties=[],
+)
+
+
+@pytest.mark.parametrize("memory_budget", [8, 800, 1 << 20])
+def test_digest_set(tmp_path: Path, memory_budget: int) -> None:
+    generator = np.random.default_rng(0)
+    seen: set[int] = set()
+    with DigestSet(memory_budget, tmp_path) as digests:
+        for _ in range(50):
+            values = generator.integers(1000, size=generator.integers(1, 40)).tolist()
+            added = digests.add(np.array(values, dtype=np.uint64))
+            expected: list[bool] = []
+            for value in values:
+                expected.append(value not in seen)
+                seen.add(value)
+            assert added.tolist() == expected
+        assert len(digests) == len(seen)
+        assert (digests.num_spilled_runs > 0) == (memory_budget < len(seen) * 8)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_digest_set_invalid_memory_budget() -> None:
+    with pytest.raises(ValueError, match="Memory budget"):
+        DigestSet(memory_budget=4)
+
+
+def test_node_deduplicator() -> None:
+    nodes = [
+        NodeInfo(node_id, label, {}) for node_id, label in [("0", "a"), ("1", "a"), ("0", "a"), ("0", "b"), ("1", "a")]
+    ]
+    batch = NodeBatch((), ids=["1", "2", "2"], labels=["a", "a", "a"], property_values=[(), (), ()])
+    with NodeDeduplicator(batch_size=2) as deduplicator:
+        deduplicated_nodes = list(deduplicator.deduplicate(_node_definition, nodes))
+        (deduplicated_batch,) = deduplicator.deduplicate_batches(_exploded_node_definition, [batch])
+        deduplicated_ids = deduplicated_batch.ids
+
+        assert deduplicated_nodes == [nodes[0], nodes[1], nodes[3]]
+        assert deduplicated_ids == ["2"]
+        assert deduplicator.get_duplicate_count(_node_definition) == len(nodes) - len(deduplicated_nodes)
+        assert deduplicator.get_duplicate_count(_exploded_node_definition) == len(batch.ids) - len(deduplicated_ids)
+
+
+@pytest.mark.parametrize("fused", [False, True])
+def test_context_node_deduplicator(tmp_path: Path, *, fused: bool) -> None:
+    rows = get_fake_rows(3)
+    write_fake_dataset(tmp_path, rows)
+    definitions: list[AcquisitionDefinition[Any]] = [_node_definition, _exploded_node_definition, _edge_definition]
+    with (
+        NodeDeduplicator() as deduplicator,
+        AcquisitionContext(
+            node_definitions=[_node_definition, _exploded_node_definition],
+            edge_definitions=[_edge_definition],
+            datasets_location=tmp_path,
+            node_deduplicator=deduplicator,
+        ) as context,
+    ):
+        if fused:
+            items: list[list[Any]] = [[] for _ in definitions]
+            for stream in context.get_fused_acquisition_generators():
+                for definition, item in stream:
+                    items[definitions.index(definition)].append(item)
+        else:
+            items = [list(stream) for stream in context.get_acquisition_generators()]
+
+        assert [[item.id for item in definition_items] for definition_items in items] == [
+            ["0", "1", "2"],
+            [],
+            ["0", "1", "2"],
+        ]
+        assert deduplicator.get_duplicate_count(_node_definition) == 0
+        assert deduplicator.get_duplicate_count(_exploded_node_definition) == sum(
+            len(row["struct"]["sequence"]) for row in rows
+        )
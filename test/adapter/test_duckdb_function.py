@@ -0,0 +1,36 @@
+from unittest.mock import MagicMock
+
+import duckdb
+import pyarrow as pa
+
+from open_targets.adapter._helper._acquisition_definition import hash_xxh3
+from open_targets.adapter._helper._duckdb_function import (
+    XXH3_FUNCTION_NAME,
+    _create_batch_function,
+    register_functions,
+)
+
+
+def test_batch_function_evaluates_distinct_arguments() -> None:
+    function = MagicMock(side_effect=lambda prefix, reference: f"{prefix}:{reference}")
+    prefixes = ["a", "a", "b", "a"]
+    references = ["1", "1", "1", None]
+    evaluate_batch = _create_batch_function(function, 2)
+
+    result = evaluate_batch(pa.chunked_array([prefixes]), pa.chunked_array([references]))
+
+    assert result.to_pylist() == ["a:1", "a:1", "b:1", "a:None"]
+    assert function.call_count == len(set(zip(prefixes, references, strict=True)))
+
+
+def test_batch_function_failure_is_null() -> None:
+    evaluate_batch = _create_batch_function(str.upper, 1)
+
+    assert evaluate_batch(pa.chunked_array([["a", None]])).to_pylist() == ["A", None]
+
+
+def test_register_functions() -> None:
+    connection = duckdb.connect()
+    register_functions(connection)
+
+    assert connection.execute(f"SELECT {XXH3_FUNCTION_NAME}(?)", ["a"]).fetchall() == [(hash_xxh3("a"),)]
@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from open_targets.adapter.expression_cache import ExpressionCache, ExpressionCacheStats
+
+
+def test_wrap_caches_values() -> None:
+    cache = ExpressionCache()
+    function = MagicMock(side_effect=str.upper)
+    cached_function = cache.wrap(function)
+    values = ["a", "b", "a", "a"]
+    num_misses = len(set(values))
+    num_hits = len(values) - num_misses
+
+    assert [cached_function(value) for value in values] == ["A", "B", "A", "A"]
+    assert function.call_count == num_misses
+    assert cache.get_stats() == ExpressionCacheStats(hits=num_hits, misses=num_misses, size=num_misses)
+    assert cache.get_stats().hit_rate == num_hits / len(values)
+
+
+def test_wrap_is_bounded() -> None:
+    cache = ExpressionCache(max_size=2)
+    cached_function = cache.wrap(str.upper)
+
+    for value in ["a", "b", "c", "a"]:
+        cached_function(value)
+
+    assert cache.get_stats() == ExpressionCacheStats(hits=0, misses=4, size=2)
+
+
+def test_wrap_tells_types_apart() -> None:
+    cache = ExpressionCache()
+    cached_function = cache.wrap(repr)
+
+    assert [cached_function(value) for value in [1, True, 1.0]] == ["1", "True", "1.0"]
+
+
+def test_wrap_evaluates_unhashable_arguments() -> None:
+    cache = ExpressionCache()
+    cached_function = cache.wrap(len)
+    value = ["a", "b"]
+
+    assert cached_function(value) == len(value)
+    assert cache.get_stats() == ExpressionCacheStats()
+
+
+def test_wrap_does_not_cache_errors() -> None:
+    cache = ExpressionCache()
+    function = MagicMock(side_effect=ValueError)
+    cached_function = cache.wrap(function)
+    num_calls = 2
+
+    for _ in range(num_calls):
+        with pytest.raises(ValueError):  # noqa: PT011
+            cached_function("a")
+
+    assert function.call_count == num_calls
+
+
+def test_get_stats_combines_functions() -> None:
+    cache = ExpressionCache()
+    upper = cache.wrap(str.upper)
+    lower = cache.wrap(str.lower)
+    upper("a")
+    upper("a")
+    lower("A")
+
+    assert cache.get_stats() == ExpressionCacheStats(hits=1, misses=2, size=2)
+
+
+def test_invalid_max_size() -> None:
+    with pytest.raises(ValueError, match="size"):
+        ExpressionCache(max_size=0)
@@ -0,0 +1,112 @@
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import pyarrow.parquet as pq
+
+from open_targets.adapter.acquisition_definition import (
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.incremental import DefinitionDelta, IncrementalBuilder, get_definition_names
+from open_targets.adapter.scan_operation import RowScanOperation
+from open_targets.adapter.scan_operation_predicate import EqualityExpression
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import DatasetFake, FieldFakeScalar, FieldFakeStruct
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="Fake Node",
+    properties=[FieldFakeStruct],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label="fake_edge",
+    properties=[],
+)
+
+
+def test_get_definition_names() -> None:
+    filtered_node_definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake, predicate=EqualityExpression(FieldFakeScalar, "0")),
+        primary_id=FieldFakeScalar,
+        label="Fake Node",
+        properties=[],
+    )
+
+    assert get_definition_names([_node_definition, _edge_definition, filtered_node_definition]) == [
+        "fake_dataset-Fake_Node",
+        "fake_dataset-fake_edge",
+        "fake_dataset-Fake_Node-2",
+    ]
+
+
+def test_build(tmp_path: Path) -> None:
+    rows = get_fake_rows(4)
+    changed_rows = [
+        *rows[:1],
+        {**rows[1], "struct": {**rows[1]["struct"], "sequence": []}},
+        *rows[2:3],
+        *get_fake_rows(5)[4:],
+    ]
+
+    first_deltas = _build(tmp_path, rows, "first")
+    unchanged_deltas = _build(tmp_path, rows, "unchanged")
+    changed_deltas = _build(tmp_path, changed_rows, "changed")
+
+    assert [_get_counts(delta) for delta in first_deltas] == [(4, 0, 0), (4, 0, 0)]
+    assert [_get_counts(delta) for delta in unchanged_deltas] == [(0, 0, 0), (0, 0, 0)]
+    assert [_get_counts(delta) for delta in changed_deltas] == [(1, 1, 1), (1, 1, 0)]
+    assert [delta.paths for delta in unchanged_deltas] == [(), ()]
+    node_delta = changed_deltas[0]
+    assert [path.relative_to(tmp_path / "changed").as_posix() for path in node_delta.paths] == [
+        "nodes/fake_dataset-Fake_Node/added.parquet",
+        "nodes/fake_dataset-Fake_Node/removed.parquet",
+        "nodes/fake_dataset-Fake_Node/changed.parquet",
+    ]
+    added, removed, changed = (pq.read_table(path).to_pylist() for path in node_delta.paths)
+    assert [row["id"] for row in added] == ["4"]
+    assert removed == [{"id": "3", "label": "Fake Node"}]
+    assert changed == [{"id": "1", "label": "Fake Node", "properties": {"struct": changed_rows[1]["struct"]}}]
+    assert sorted(path.name for path in (tmp_path / "manifest").iterdir()) == [
+        "fake_dataset-Fake_Node.manifest.parquet",
+        "fake_dataset-fake_edge.manifest.parquet",
+    ]
+
+
+def test_build_missing_id(tmp_path: Path) -> None:
+    rows = [*get_fake_rows(2), {**get_fake_rows(3)[2], "scalar": None}]
+    added_rows = [*rows, *get_fake_rows(4)[3:]]
+
+    _build(tmp_path, rows, "first")
+    unchanged_deltas = _build(tmp_path, rows, "unchanged")
+    added_deltas = _build(tmp_path, added_rows, "added")
+    removed_deltas = _build(tmp_path, added_rows[:2], "removed")
+
+    assert [_get_counts(delta) for delta in unchanged_deltas] == [(0, 0, 0), (0, 0, 0)]
+    assert [_get_counts(delta) for delta in added_deltas] == [(1, 0, 0), (1, 0, 0)]
+    assert [_get_counts(delta) for delta in removed_deltas] == [(0, 2, 0), (0, 2, 0)]
+    removed = pq.read_table(removed_deltas[0].paths[0]).to_pylist()
+    assert sorted(removed, key=lambda row: row["id"] or "") == [
+        {"id": None, "label": "Fake Node"},
+        {"id": "3", "label": "Fake Node"},
+    ]
+
+
+def _build(tmp_path: Path, rows: Sequence[Mapping[str, Any]], name: str) -> list[DefinitionDelta]:
+    write_fake_dataset(tmp_path / "data", rows)
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        return IncrementalBuilder(context, tmp_path / "manifest").build(tmp_path / name)
+
+
+def _get_counts(delta: DefinitionDelta) -> tuple[int, int, int]:
+    return delta.num_added, delta.num_removed, delta.num_changed
@@ -0,0 +1,135 @@
+import io
+import json
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from open_targets.adapter.acquisition_definition import ExpressionNodeAcquisitionDefinition
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.expression import FieldExpression, TransformExpression
+from open_targets.adapter.metrics import (
+    AcquisitionMetrics,
+    ConsoleMetricsReporter,
+    DefinitionMetrics,
+    JsonMetricsReporter,
+    format_metrics,
+)
+from open_targets.adapter.scan_operation import RowScanOperation
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import DatasetFake, FieldFakeScalar
+
+
+def _fail_on_one(value: str) -> str:
+    if value == "1":
+        msg = "Failed on 1."
+        raise ValueError(msg)
+    return value
+
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=TransformExpression(FieldExpression(FieldFakeScalar), _fail_on_one),
+    label="fake",
+    properties=[],
+)
+
+
+class _CollectingReporter:
+    def __init__(self) -> None:
+        self.reports: list[list[DefinitionMetrics]] = []
+        self.finished: list[list[bool]] = []
+
+    def report(self, metrics: Sequence[DefinitionMetrics]) -> None:
+        self.reports.append(list(metrics))
+        self.finished.append([definition_metrics.finished for definition_metrics in metrics])
+
+
+@pytest.mark.parametrize("batches", [False, True])
+def test_context_metrics(tmp_path: Path, *, batches: bool) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    consumer_delay = 0.01
+    reporter = _CollectingReporter()
+    metrics = AcquisitionMetrics([reporter])
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[],
+        datasets_location=tmp_path,
+        metrics=metrics,
+    ) as context:
+        stream: Any = (
+            context.get_acquisition_batch_generator(_node_definition)
+            if batches
+            else context.get_acquisition_generator(_node_definition)
+        )
+        for _ in stream:
+            time.sleep(consumer_delay)
+
+    (definition_metrics,) = metrics.get_all_metrics()
+    assert definition_metrics is metrics.get_metrics(_node_definition)
+    assert definition_metrics.name == "fake_dataset/fake"
+    assert (definition_metrics.rows_scanned, definition_metrics.items_emitted, definition_metrics.failures) == (3, 2, 1)
+    assert definition_metrics.finished
+    assert definition_metrics.fetch_time > 0
+    assert definition_metrics.data_view_time > 0
+    assert definition_metrics.evaluation_time > 0
+    assert definition_metrics.consumer_time >= consumer_delay
+    assert definition_metrics.elapsed_time >= definition_metrics.consumer_time
+    assert definition_metrics.rows_per_second > 0
+    assert reporter.reports == [[definition_metrics]]
+
+
+def test_context_metrics_report_interval(tmp_path: Path) -> None:
+    rows = get_fake_rows(3)
+    write_fake_dataset(tmp_path, rows)
+    reporter = _CollectingReporter()
+    metrics = AcquisitionMetrics([reporter], report_interval=0.005)
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[],
+        datasets_location=tmp_path,
+        fetch_batch_size=None,
+        metrics=metrics,
+    ) as context:
+        for _ in context.get_acquisition_generator(_node_definition):
+            time.sleep(0.01)
+
+    # Reported while running after the sleep of the consumer, then when done.
+    assert reporter.finished[-2:] == [[False], [True]]
+    assert metrics.get_metrics(_node_definition).rows_scanned == len(rows)
+
+
+def test_reporters(tmp_path: Path) -> None:
+    metrics = DefinitionMetrics(
+        None,
+        "fake_dataset/fake",
+        rows_scanned=1000,
+        items_emitted=900,
+        failures=2,
+        fetch_time=1.0,
+        data_view_time=0.5,
+        evaluation_time=2.0,
+        consumer_time=0.5,
+        elapsed_time=4.0,
+        finished=True,
+    )
+    stream = io.StringIO()
+    reported_metrics = [metrics, metrics]
+    ConsoleMetricsReporter(stream).report([metrics])
+    JsonMetricsReporter(tmp_path / "metrics.jsonl").report(reported_metrics)
+
+    assert format_metrics(metrics) == (
+        "fake_dataset/fake [done]: 1,000 rows scanned, 900 items, 2 failures, 250 rows/s in 4.0s "
+        "(fetch 25%, data views 12%, evaluation 50%, consumer 12%)"
+    )
+    assert stream.getvalue() == format_metrics(metrics) + "\n"
+    lines = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert len(lines) == len(reported_metrics)
+    assert {key: value for key, value in lines[0].items() if key != "timestamp"} == metrics.to_dict()
+
+
+def test_invalid_report_interval() -> None:
+    with pytest.raises(ValueError, match="Report interval must be positive"):
+        AcquisitionMetrics(report_interval=0)
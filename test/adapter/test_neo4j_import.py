@@ -0,0 +1,238 @@
+import csv
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.expression import (
+    FieldExpression,
+    LiteralExpression,
+    StringConcatenationExpression,
+    StringLowerExpression,
+    TransformExpression,
+)
+from open_targets.adapter.neo4j_import import IMPORT_CALL_FILE_NAME, Neo4jImportSettings, Neo4jImportWriter
+from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import (
+    DatasetFake,
+    FieldFakeScalar,
+    FieldFakeStructSequence,
+    FieldFakeStructSequenceElementScalar,
+    FieldFakeStructStructScalar,
+)
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=StringConcatenationExpression([LiteralExpression("fake:"), FieldExpression(FieldFakeScalar)]),
+    label="Fake Node",
+    properties=[
+        FieldFakeStructStructScalar,
+        (LiteralExpression("count"), LiteralExpression(1)),
+        (LiteralExpression("score"), LiteralExpression(0.5)),
+        (LiteralExpression("flag"), LiteralExpression(value=True)),
+        (LiteralExpression("quoted"), LiteralExpression('a "b"\tc')),
+        (LiteralExpression("missing"), LiteralExpression(None)),
+    ],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+    primary_id=FieldFakeStructSequenceElementScalar,
+    source=StringConcatenationExpression([LiteralExpression("fake:"), FieldExpression(FieldFakeScalar)]),
+    target=StringLowerExpression(FieldExpression(FieldFakeStructSequenceElementScalar)),
+    label="FAKE_EDGE",
+    properties=[],
+)
+
+
+@pytest.mark.parametrize("max_file_size", [None, 1, 1 << 20])
+def test_write_duckdb_and_python_files_match(tmp_path: Path, max_file_size: int | None) -> None:
+    rows = get_fake_rows(3)
+    write_fake_dataset(tmp_path / "data", rows)
+    settings = Neo4jImportSettings(max_file_size=max_file_size)
+    results: list[list[tuple[list[str], list[list[str]]]]] = []
+    for use_duckdb in [True, False]:
+        directory = tmp_path / str(use_duckdb)
+        with AcquisitionContext(
+            node_definitions=[_node_definition],
+            edge_definitions=[_edge_definition],
+            datasets_location=tmp_path / "data",
+        ) as context:
+            files = Neo4jImportWriter(context, directory, settings, use_duckdb=use_duckdb).write()
+        assert [file.computed_by_duckdb for file in files] == [use_duckdb, use_duckdb]
+        assert [file.kind for file in files] == ["nodes", "relationships"]
+        results.append([_read_files(directory, file.header, file.parts) for file in files])
+
+    assert results[0] == results[1]
+    (node_header, node_rows), (edge_header, edge_rows) = results[0]
+    assert node_header == [
+        "id:ID",
+        "scalar",
+        "count:long",
+        "score:double",
+        "flag:boolean",
+        "quoted",
+        "missing",
+        ":LABEL",
+    ]
+    assert node_rows[0] == ["fake:0", "struct_struct_scalar_0", "1", "0.5", "true", 'a "b"\tc', "", "Fake Node"]
+    assert edge_header == [":START_ID", "id", ":END_ID", ":TYPE"]
+    assert len(edge_rows) == sum(len(row["struct"]["sequence"]) for row in rows)
+
+
+def test_write_skips_failed_computed_values(tmp_path: Path) -> None:
+    rows = get_fake_rows(3)
+    rows[1] = {**rows[1], FieldFakeScalar.name: None}
+    write_fake_dataset(tmp_path / "data", rows)
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        assert context.build_acquisition_query(_node_definition) is not None
+        (files,) = Neo4jImportWriter(context, tmp_path).write()
+        expected_ids = [node.id for node in context.get_acquisition_generator(_node_definition)]
+
+    assert (
+        [row[0] for row in _read_files(tmp_path, files.header, files.parts)[1]]
+        == expected_ids
+        == [
+            "fake:0",
+            "fake:2",
+        ]
+    )
+
+
+def test_build_acquisition_query_not_computable(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(1))
+    definitions: list[AcquisitionDefinition[Any]] = [
+        ExpressionNodeAcquisitionDefinition(
+            scan_operation=RowScanOperation(dataset=DatasetFake),
+            primary_id=TransformExpression(FieldExpression(FieldFakeScalar), str.upper),
+            label="fake",
+            properties=[],
+        ),
+        ExpressionNodeAcquisitionDefinition(
+            scan_operation=RowScanOperation(dataset=DatasetFake),
+            primary_id=FieldFakeScalar,
+            label="fake",
+            properties=[(FieldExpression(FieldFakeScalar), LiteralExpression(0))],
+        ),
+    ]
+    with AcquisitionContext(
+        node_definitions=definitions,
+        edge_definitions=[],
+        datasets_location=tmp_path,
+    ) as context:
+        assert [context.build_acquisition_query(definition) for definition in definitions] == [None, None]
+        files = Neo4jImportWriter(context, tmp_path / "output").write()
+
+    assert [file.computed_by_duckdb for file in files] == [False, False]
+
+
+def test_write_python_header_types(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(3))
+    definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=FieldFakeScalar,
+        label="fake",
+        properties=[
+            (LiteralExpression("count"), TransformExpression(FieldExpression(FieldFakeScalar), _to_count)),
+            (LiteralExpression("counts"), TransformExpression(FieldExpression(FieldFakeScalar), _to_counts)),
+        ],
+    )
+    with AcquisitionContext(
+        node_definitions=[definition],
+        edge_definitions=[],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        (files,) = Neo4jImportWriter(context, tmp_path / "output").write()
+
+    assert not files.computed_by_duckdb
+    assert _read_files(tmp_path / "output", files.header, files.parts) == (
+        ["id:ID", "count:long", "counts:long[]", ":LABEL"],
+        [["0", "", "", "fake"], ["1", "1", "1", "fake"], ["2", "2", "2|2", "fake"]],
+    )
+
+
+def test_write_python_duplicate_keys_and_null_elements(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(3))
+    definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=FieldFakeScalar,
+        label="fake",
+        properties=[
+            (LiteralExpression("evidence"), LiteralExpression("first")),
+            (LiteralExpression("elements"), TransformExpression(FieldExpression(FieldFakeScalar), _to_elements)),
+            (LiteralExpression("evidence"), FieldExpression(FieldFakeScalar)),
+        ],
+    )
+    with AcquisitionContext(
+        node_definitions=[definition],
+        edge_definitions=[],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        (files,) = Neo4jImportWriter(context, tmp_path / "output", use_duckdb=False).write()
+
+    assert _read_files(tmp_path / "output", files.header, files.parts) == (
+        ["id:ID", "evidence", "elements:string[]", ":LABEL"],
+        [["0", "0", "", "fake"], ["1", "1", "", "fake"], ["2", "2", "2", "fake"]],
+    )
+
+
+def test_write_import_call(tmp_path: Path) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(1))
+    settings = Neo4jImportSettings(
+        database_name="fake",
+        import_call_bin_prefix="bin/",
+        import_call_file_prefix="/import",
+        skip_bad_relationships=True,
+    )
+    with AcquisitionContext(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=tmp_path / "data",
+    ) as context:
+        writer = Neo4jImportWriter(context, tmp_path, settings)
+        writer.write()
+        path = writer.write_import_call()
+
+    assert path.name == IMPORT_CALL_FILE_NAME
+    script = path.read_text()
+    assert "version=$(bin/neo4j-admin --version | cut -d '.' -f 1)" in script
+    assert (
+        'bin/neo4j-admin database import full fake --delimiter="\\t" --array-delimiter="|" --quote=\'"\' '
+        "--overwrite-destination=true --skip-bad-relationships=true "
+        '--nodes="/import/000-Fake_Node-header.csv,/import/000-Fake_Node/part.*" '
+        '--relationships="/import/001-FAKE_EDGE-header.csv,/import/001-FAKE_EDGE/part.*"\n'
+    ) in script
+    assert "bin/neo4j-admin import --database=fake" in script
+
+
+def _to_count(value: str) -> int | None:
+    return int(value) or None
+
+
+def _to_counts(value: str) -> list[int]:
+    return [int(value)] * int(value)
+
+
+def _to_elements(value: str) -> list[str | None]:
+    return [None, value][: int(value)]
+
+
+def _read_files(directory: Path, header: str, parts: str) -> tuple[list[str], list[list[str]]]:
+    (header_row,) = _read_csv(directory / header)
+    rows = [row for path in sorted((directory / parts).iterdir()) for row in _read_csv(path)]
+    return header_row, sorted(rows)
+
+
+def _read_csv(path: Path) -> list[list[str]]:
+    with path.open(encoding="utf-8", newline="") as file:
+        return list(csv.reader(file, delimiter="\t", quotechar='"'))
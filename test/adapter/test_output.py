@@ -0,0 +1,52 @@
+import pickle
+
+import pytest
+
+from open_targets.adapter.output import EdgeBatch, EdgeInfo, NodeBatch, NodeInfo, batch_edges, batch_nodes
+
+_nodes = [
+    NodeInfo(id="0", label="fake", properties={"a": 0, "b": "0"}),
+    NodeInfo(id="1", label="fake", properties={"a": 1, "b": "1"}),
+    NodeInfo(id="2", label="fake", properties={"a": 2}),
+]
+_edges = [
+    EdgeInfo(id="0", source_id="s0", target_id="t0", label="fake", properties={}),
+    EdgeInfo(id="1", source_id="s1", target_id="t1", label="fake", properties={}),
+]
+
+
+def test_info_tuple_protocol() -> None:
+    assert tuple(_nodes[0]) == ("0", "fake", {"a": 0, "b": "0"})
+    assert tuple(_edges[0]) == ("0", "s0", "t0", "fake", {})
+    assert not hasattr(_nodes[0], "__dict__")
+    assert not hasattr(_edges[0], "__dict__")
+
+
+def test_batch_nodes() -> None:
+    batches = list(batch_nodes(_nodes, batch_size=2))
+
+    assert [batch.property_keys for batch in batches] == [("a", "b"), ("a",)]
+    assert batches[0].property_values == [(0, "0"), (1, "1")]
+    assert [node for batch in batches for node in batch] == _nodes
+
+
+@pytest.mark.parametrize(("batch_size", "expected_sizes"), [(1, [1, 1]), (2, [2]), (3, [2])])
+def test_batch_edges(batch_size: int, expected_sizes: list[int]) -> None:
+    batches = list(batch_edges(_edges, batch_size))
+
+    assert [len(batch) for batch in batches] == expected_sizes
+    assert [edge for batch in batches for edge in batch] == _edges
+
+
+def test_batches_are_picklable() -> None:
+    node_batch = NodeBatch(("a",), ids=["0"], labels=["fake"], property_values=[(0,)])
+    edge_batch = EdgeBatch((), ids=["0"], source_ids=["s0"], target_ids=["t0"], labels=["fake"], property_values=[()])
+
+    assert pickle.loads(pickle.dumps(node_batch)) == node_batch  # noqa: S301
+    assert pickle.loads(pickle.dumps(edge_batch)) == edge_batch  # noqa: S301
+    assert pickle.loads(pickle.dumps(_nodes)) == _nodes  # noqa: S301
+
+
+def test_batch_invalid_size() -> None:
+    with pytest.raises(ValueError, match="Batch size"):
+        list(batch_nodes(_nodes, batch_size=0))
@@ -0,0 +1,163 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.expression import FieldExpression, LiteralExpression, StringConcatenationExpression
+from open_targets.adapter.output import EdgeBatch, EdgeInfo
+from open_targets.adapter.referential_integrity import BloomFilter, DanglingEdgeReport, ReferentialIntegrityChecker
+from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import DatasetFake, FieldFakeScalar, FieldFakeStructSequence, FieldFakeStructStructScalar
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="fake",
+    properties=[],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label="fake_edge",
+    properties=[],
+)
+_dangling_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=StringConcatenationExpression([FieldExpression(FieldFakeScalar), LiteralExpression("-missing")]),
+    label="dangling_edge",
+    properties=[],
+)
+
+
+def test_bloom_filter() -> None:
+    capacity = 10000
+    error_rate = 0.01
+    generator = np.random.default_rng(0)
+    digests = generator.integers(0, 2**63, size=2 * capacity, dtype=np.uint64)
+    bloom_filter = BloomFilter(capacity=capacity, error_rate=error_rate)
+    bloom_filter.add(digests[:capacity])
+
+    assert bloom_filter.contains(digests[:capacity]).all()
+    assert bloom_filter.contains(digests[capacity:]).mean() < 2 * error_rate
+
+
+@pytest.mark.parametrize("error_rate", [None, 0.001])
+@pytest.mark.parametrize("drop_dangling_edges", [False, True])
+def test_checker(error_rate: float | None, *, drop_dangling_edges: bool) -> None:
+    edges = [EdgeInfo(str(index), "a", target_id, "edge", {}) for index, target_id in enumerate(["b", "c", "a", "d"])]
+    batch = EdgeBatch((), ids=["4", "5"], source_ids=["e", "b"], target_ids=["a", "b"], labels=["edge", "edge"])
+    batch.property_values.extend([(), ()])
+    with ReferentialIntegrityChecker(
+        drop_dangling_edges=drop_dangling_edges,
+        error_rate=error_rate,
+        expected_node_count=100,
+        num_samples=2,
+        batch_size=3,
+    ) as checker:
+        checker.record_node_ids(["a", "b"])
+        checked_edges = list(checker.check(_edge_definition, edges))
+        (checked_batch,) = checker.check_batches(_dangling_edge_definition, [batch])
+
+        assert [edge.id for edge in checked_edges] == (["0", "2"] if drop_dangling_edges else ["0", "1", "2", "3"])
+        assert checked_batch.ids == (["5"] if drop_dangling_edges else ["4", "5"])
+        assert checker.get_reports() == [
+            DanglingEdgeReport(_edge_definition, 4, 2, 0, 2, (edges[1], edges[3])),
+            DanglingEdgeReport(_dangling_edge_definition, 2, 1, 1, 0, (EdgeInfo("4", "e", "a", "edge", {}),)),
+        ]
+
+
+@pytest.mark.parametrize("mode", ["items", "batches", "fused"])
+def test_context_referential_integrity_checker(tmp_path: Path, mode: str) -> None:
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    definitions: list[AcquisitionDefinition[Any]] = [_node_definition, _edge_definition, _dangling_edge_definition]
+    with (
+        ReferentialIntegrityChecker(drop_dangling_edges=True) as checker,
+        AcquisitionContext(
+            node_definitions=[_node_definition],
+            edge_definitions=[_edge_definition, _dangling_edge_definition],
+            datasets_location=tmp_path,
+            referential_integrity_checker=checker,
+        ) as context,
+    ):
+        items: list[list[Any]] = [[] for _ in definitions]
+        if mode == "fused":
+            for stream in context.get_fused_acquisition_generators():
+                for definition, item in stream:
+                    items[definitions.index(definition)].append(item)
+        elif mode == "batches":
+            items = [
+                [item for batch in context.get_acquisition_batch_generator(definition) for item in batch]
+                for definition in definitions
+            ]
+        else:
+            items = [list(stream) for stream in context.get_acquisition_generators()]
+
+        assert [len(definition_items) for definition_items in items] == [3, 3, 0]
+        report = checker.get_report(_dangling_edge_definition)
+        assert (report.num_edges, report.num_dangling_edges, report.num_dangling_targets) == (3, 3, 3)
+        assert [edge.target_id for edge in report.samples] == ["0-missing", "1-missing", "2-missing"]
+        assert checker.get_report(_edge_definition).num_dangling_edges == 0
+
+
+def test_context_referential_integrity_checker_fused_order(tmp_path: Path) -> None:
+    rows = get_fake_rows(3)
+    write_fake_dataset(tmp_path, rows)
+    other_node_definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=FieldFakeStructStructScalar,
+        label="other",
+        properties=[],
+    )
+    exploded_node_definition = ExpressionNodeAcquisitionDefinition(
+        scan_operation=ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+        primary_id=FieldFakeScalar,
+        label="exploded",
+        properties=[],
+    )
+    with (
+        ReferentialIntegrityChecker(drop_dangling_edges=True) as checker,
+        AcquisitionContext(
+            node_definitions=[other_node_definition, exploded_node_definition],
+            edge_definitions=[_edge_definition],
+            datasets_location=tmp_path,
+            referential_integrity_checker=checker,
+        ) as context,
+    ):
+        # The edges scan the dataset as the first node definition, but their
+        # endpoints are the nodes of the second one, scanned separately.
+        edges = [
+            item
+            for stream in context.get_fused_acquisition_generators()
+            for definition, item in stream
+            if definition is _edge_definition
+        ]
+
+        assert len(edges) == len(rows)
+        assert checker.get_report(_edge_definition).num_dangling_edges == 0
+
+
+@pytest.mark.parametrize("error_rate", [None, 0.001])
+def test_checker_missing_ids(error_rate: float | None) -> None:
+    edges: list[EdgeInfo] = [
+        EdgeInfo("0", "a", None, "edge", {}),  # type: ignore[arg-type]
+        EdgeInfo("1", None, "a", "edge", {}),  # type: ignore[arg-type]
+        EdgeInfo("2", "a", "a", "edge", {}),
+    ]
+    with ReferentialIntegrityChecker(drop_dangling_edges=True, error_rate=error_rate) as checker:
+        checker.record_node_ids(["a", None])  # type: ignore[list-item]
+
+        assert [edge.id for edge in checker.check(_edge_definition, edges)] == ["2"]
+        report = checker.get_report(_edge_definition)
+        assert (report.num_dangling_edges, report.num_dangling_sources, report.num_dangling_targets) == (2, 1, 1)
@@ -0,0 +1,157 @@
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from open_targets.adapter import result_cache as result_cache_module
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.expression import FieldExpression, LiteralExpression, TransformExpression
+from open_targets.adapter.output import NodeBatch
+from open_targets.adapter.result_cache import (
+    ResultCache,
+    ResultCacheStats,
+    get_definition_fingerprint,
+    get_file_fingerprint,
+)
+from open_targets.adapter.scan_operation import RowScanOperation
+from open_targets.adapter.scan_operation_predicate import EqualityExpression
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import DatasetFake, FieldFakeScalar, FieldFakeStruct
+
+
+def _create_node_definition(
+    label: str = "fake",
+    function: Callable[[str], str] = str.upper,
+    predicate: EqualityExpression | None = None,
+) -> ExpressionNodeAcquisitionDefinition:
+    return ExpressionNodeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake, predicate=predicate),
+        primary_id=FieldFakeScalar,
+        label=label,
+        properties=[
+            FieldFakeStruct,
+            (LiteralExpression("upper"), TransformExpression(FieldExpression(FieldFakeScalar), function)),
+        ],
+    )
+
+
+def _upper(value: str) -> str:
+    return value.upper()
+
+
+def _lower(value: str) -> str:
+    return value.lower()
+
+
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeScalar,
+    label="fake_edge",
+    properties=[],
+)
+
+
+def test_get_definition_fingerprint() -> None:
+    fingerprint = get_definition_fingerprint(_create_node_definition())
+    fingerprints = [
+        fingerprint,
+        get_definition_fingerprint(_create_node_definition(label="other")),
+        get_definition_fingerprint(_create_node_definition(function=str.lower)),
+        get_definition_fingerprint(_create_node_definition(function=_upper)),
+        get_definition_fingerprint(_create_node_definition(function=_lower)),
+        get_definition_fingerprint(_create_node_definition(predicate=EqualityExpression(FieldFakeScalar, "0"))),
+        get_definition_fingerprint(_create_node_definition(predicate=EqualityExpression(FieldFakeScalar, "1"))),
+    ]
+
+    assert fingerprint == get_definition_fingerprint(_create_node_definition())
+    assert len(set(fingerprints)) == len(fingerprints)
+    assert get_definition_fingerprint(_create_node_definition(label=object())) is None  # type: ignore[arg-type]
+
+
+def test_get_file_fingerprint(tmp_path: Path) -> None:
+    path = tmp_path / DatasetFake.id / "part-0.parquet"
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    fingerprint = get_file_fingerprint(path)
+    write_fake_dataset(tmp_path, get_fake_rows(3))
+    same_fingerprint = get_file_fingerprint(path)
+    write_fake_dataset(tmp_path, get_fake_rows(4))
+
+    assert fingerprint == same_fingerprint
+    assert fingerprint != get_file_fingerprint(path)
+
+
+def test_get_key_adapter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = ResultCache(tmp_path)
+    key = cache.get_key(_edge_definition, [])
+    monkeypatch.setattr(result_cache_module, "get_adapter_fingerprint", lambda: "other")
+
+    assert key is not None
+    assert key != cache.get_key(_edge_definition, [])
+
+
+@pytest.mark.parametrize("batches", [False, True])
+def test_context_result_cache(tmp_path: Path, *, batches: bool) -> None:
+    write_fake_dataset(tmp_path / "data", get_fake_rows(3))
+    cache = ResultCache(tmp_path / "cache")
+    definitions: list[AcquisitionDefinition[Any]] = [_create_node_definition(), _edge_definition]
+
+    def acquire() -> list[list[Any]]:
+        with AcquisitionContext(
+            node_definitions=[definitions[0]],
+            edge_definitions=[definitions[1]],
+            datasets_location=tmp_path / "data",
+            result_cache=cache,
+        ) as context:
+            if batches:
+                return [
+                    [item for batch in context.get_acquisition_batch_generator(definition) for item in batch]
+                    for definition in definitions
+                ]
+            return [list(stream) for stream in context.get_acquisition_generators()]
+
+    items = acquire()
+    replayed_items = acquire()
+    write_fake_dataset(tmp_path / "data", get_fake_rows(4))
+    updated_items = acquire()
+    stats = cache.get_stats()
+
+    assert stats == ResultCacheStats(hits=2, misses=4)
+    assert len(list(cache.directory.iterdir())) == stats.misses
+    assert [len(definition_items) for definition_items in updated_items] == [4, 4]
+    for expected, actual in zip(items, replayed_items, strict=True):
+        assert [(item.id, item.label) for item in actual] == [(item.id, item.label) for item in expected]
+        assert [_to_plain(item.properties) for item in actual] == [_to_plain(item.properties) for item in expected]
+
+
+def test_result_cache_put(tmp_path: Path) -> None:
+    max_size = 1536
+    cache = ResultCache(tmp_path, max_size=max_size)
+    generator = np.random.default_rng(0)
+    batch = NodeBatch(("value",), ids=["0"], labels=["fake"], property_values=[(generator.bytes(400),)])
+    large_batch = NodeBatch(("value",), ids=["0"], labels=["fake"], property_values=[(generator.bytes(2048),)])
+
+    assert list(cache.put("a", [batch])) == [batch]
+    assert list(cache.put("b", [batch])) == [batch]
+    assert list(cache.put("c", [batch])) == [batch]
+    assert list(cache.put("large", [large_batch])) == [large_batch]
+    next(iter(cache.put("partial", [batch, batch])))
+
+    assert cache.get("large") is None
+    assert cache.get("partial") is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b.pickle.zst", "c.pickle.zst"]
+    assert cache.get_size() <= max_size
+    assert cache.get_stats().evictions == 1
+    assert list(cache.get("c") or []) == [batch]
+
+
+def _to_plain(properties: Mapping[str, object]) -> dict[str, object]:
+    return {key: getattr(value, "raw_data", value) for key, value in properties.items()}
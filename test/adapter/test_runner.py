@@ -0,0 +1,203 @@
+import pickle
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from open_targets.adapter.acquisition_definition import (
+    AcquisitionDefinition,
+    ExpressionEdgeAcquisitionDefinition,
+    ExpressionNodeAcquisitionDefinition,
+)
+from open_targets.adapter.context import AcquisitionContext
+from open_targets.adapter.deduplication import NodeDeduplicator
+from open_targets.adapter.expression import LiteralExpression, NewUuidExpression
+from open_targets.adapter.runner import ParallelAcquisitionRunner
+from open_targets.adapter.scan_operation import ExplodingScanOperation, RowScanOperation
+from open_targets.data.schema import DatasetVariant, FieldVariantVariantId
+from open_targets.definition.reference_kg import reference_kg_definition
+from test.fixture.fake.parquet import get_fake_rows, write_fake_dataset
+from test.fixture.fake.schema import (
+    DatasetFake,
+    FieldFakeScalar,
+    FieldFakeStructSequence,
+    FieldFakeStructSequenceElementScalar,
+    FieldFakeStructStructScalar,
+)
+
+_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    label="fake",
+    properties=[FieldFakeStructStructScalar],
+)
+_exploded_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=ExplodingScanOperation(dataset=DatasetFake, exploded_field=FieldFakeStructSequence),
+    primary_id=FieldFakeStructSequenceElementScalar,
+    label="fake_element",
+    properties=[FieldFakeScalar],
+)
+_missing_dataset_node_definition = ExpressionNodeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetVariant),
+    primary_id=FieldVariantVariantId,
+    label="missing",
+    properties=[],
+)
+_edge_definition = ExpressionEdgeAcquisitionDefinition(
+    scan_operation=RowScanOperation(dataset=DatasetFake),
+    primary_id=FieldFakeScalar,
+    source=FieldFakeScalar,
+    target=FieldFakeStructStructScalar,
+    label="fake_edge",
+    properties=[],
+)
+
+
+def test_reference_kg_definitions_are_picklable() -> None:
+    definitions = reference_kg_definition.node_definitions + reference_kg_definition.edge_definitions
+    assert pickle.loads(pickle.dumps(definitions)) == definitions  # noqa: S301
+
+
+@pytest.mark.parametrize(("ordered", "num_shards"), [(True, 1), (False, 1), (True, 3)])
+def test_run(tmp_path: Path, *, ordered: bool, num_shards: int) -> None:
+    for index in range(3):
+        write_fake_dataset(tmp_path, get_fake_rows(index + 2), file_name=f"part-{index}")
+    node_definitions: list[AcquisitionDefinition[Any]] = [
+        _node_definition,
+        _missing_dataset_node_definition,
+        _exploded_node_definition,
+    ]
+    edge_definitions: list[AcquisitionDefinition[Any]] = [_edge_definition]
+    with AcquisitionContext(
+        node_definitions=node_definitions,
+        edge_definitions=edge_definitions,
+        datasets_location=tmp_path,
+    ) as context:
+        expected = {
+            definition.label: list(context.get_acquisition_generator(definition))
+            for definition in [_node_definition, _exploded_node_definition, _edge_definition]
+        }
+    runner = ParallelAcquisitionRunner(
+        node_definitions=node_definitions,
+        edge_definitions=edge_definitions,
+        datasets_location=tmp_path,
+        max_workers=2,
+        chunk_size=2,
+        num_shards=num_shards,
+    )
+
+    outcomes = [
+        (outcome.definition.label, list(outcome.items), outcome.error) for outcome in runner.run(ordered=ordered)
+    ]
+
+    if ordered:
+        assert [label for label, _, _ in outcomes] == ["fake", "missing", "fake_element", "fake_edge"]
+    assert {label: items for label, items, error in outcomes if error is None} == expected
+    ((label, items, error),) = [outcome for outcome in outcomes if outcome[2] is not None]
+    assert label == "missing"
+    assert items == []
+    assert "IOException" in error
+
+
+def test_run_node_deduplicator(tmp_path: Path) -> None:
+    num_rows = 0
+    for index in range(3):
+        rows = get_fake_rows(index + 2)
+        write_fake_dataset(tmp_path, rows, file_name=f"part-{index}")
+        num_rows += len(rows)
+    with NodeDeduplicator() as deduplicator:
+        runner = ParallelAcquisitionRunner(
+            node_definitions=[_node_definition],
+            edge_definitions=[_edge_definition],
+            datasets_location=tmp_path,
+            max_workers=2,
+            num_shards=3,
+            node_deduplicator=deduplicator,
+        )
+
+        node_items, edge_items = [list(outcome.items) for outcome in runner.run(ordered=True)]
+
+        assert sorted(node.id for node in node_items) == ["0", "1", "2", "3"]
+        assert len(edge_items) == num_rows
+        assert deduplicator.get_duplicate_count(_node_definition) == num_rows - len(node_items)
+
+
+def test_run_outcomes_read_after_run(tmp_path: Path) -> None:
+    dataset_path = tmp_path / "datasets"
+    spill_path = tmp_path / "spill"
+    spill_path.mkdir()
+    num_rows = 0
+    for index in range(3):
+        rows = get_fake_rows(index + 2)
+        write_fake_dataset(dataset_path, rows, file_name=f"part-{index}")
+        num_rows += len(rows)
+    runner = ParallelAcquisitionRunner(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=dataset_path,
+        max_workers=2,
+        chunk_size=2,
+        spill_directory=spill_path,
+        num_shards=3,
+    )
+
+    outcomes = list(runner.run(ordered=True))
+
+    assert [len(list(outcome.items)) for outcome in outcomes] == [num_rows, num_rows]
+    del outcomes
+    assert list(spill_path.iterdir()) == []
+
+
+def test_run_outcomes_dropped_unread(tmp_path: Path) -> None:
+    dataset_path = tmp_path / "datasets"
+    spill_path = tmp_path / "spill"
+    spill_path.mkdir()
+    write_fake_dataset(dataset_path, get_fake_rows(2))
+    runner = ParallelAcquisitionRunner(
+        node_definitions=[_node_definition],
+        edge_definitions=[_edge_definition],
+        datasets_location=dataset_path,
+        max_workers=2,
+        spill_directory=spill_path,
+    )
+
+    outcomes = list(runner.run(ordered=True))
+
+    assert len(list(spill_path.iterdir())) == 1
+    assert outcomes[0].error is None
+    del outcomes
+    assert list(spill_path.iterdir()) == []
+
+
+def test_run_deterministic_ids(tmp_path: Path) -> None:
+    num_files = num_shards = 3
+    rows = get_fake_rows(2)
+    for index in range(num_files):
+        write_fake_dataset(tmp_path, rows, file_name=f"part-{index}")
+    definition = ExpressionEdgeAcquisitionDefinition(
+        scan_operation=RowScanOperation(dataset=DatasetFake),
+        primary_id=NewUuidExpression(),
+        source=FieldFakeScalar,
+        target=LiteralExpression("fake"),
+        label="fake_edge",
+        properties=[],
+    )
+    ids: list[list[str]] = []
+    for run_num_shards in [1, num_shards]:
+        runner = ParallelAcquisitionRunner(
+            node_definitions=[],
+            edge_definitions=[definition],
+            datasets_location=tmp_path,
+            max_workers=2,
+            num_shards=run_num_shards,
+            deterministic_ids=True,
+        )
+        ids.append([edge.id for outcome in runner.run(ordered=True) for edge in outcome.items])
+
+    assert len(set(ids[0])) == len(ids[0]) == num_files * len(rows)
+    assert ids[1] == ids[0]
+
+
+def test_invalid_max_workers() -> None:
+    with pytest.raises(ValueError, match="workers"):
+        ParallelAcquisitionRunner(node_definitions=[], edge_definitions=[], datasets_location="", max_workers=0)
@@ -0,0 +1,43 @@
+"""Writer of datasets as parquet files for tests against duckdb."""
+
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import duckdb
+
+from open_targets.data.schema_base import Dataset
+from test.fixture.fake.schema import DatasetFake
+
+
+def get_fake_rows(num_rows: int) -> list[Mapping[str, Any]]:
+    return [DatasetFake.get_row(row_id=row_id) for row_id in range(num_rows)]
+
+
+def write_fake_dataset(
+    location: Path,
+    rows: Sequence[Mapping[str, Any]],
+    file_name: str = "part-0",
+    row_group_size: int | None = None,
+) -> None:
+    write_dataset(location, DatasetFake, rows, file_name, row_group_size)
+
+
+def write_dataset(
+    location: Path,
+    dataset: type[Dataset],
+    rows: Sequence[Mapping[str, Any]],
+    file_name: str = "part-0",
+    row_group_size: int | None = None,
+) -> None:
+    directory = location / dataset.id
+    directory.mkdir(parents=True, exist_ok=True)
+    connection = duckdb.connect()
+    try:
+        connection.execute("CREATE TABLE fake AS SELECT unnest($rows) AS row", {"rows": list(rows)})
+        connection.sql("SELECT row.* FROM fake").write_parquet(
+            str(directory / f"{file_name}.parquet"),
+            row_group_size=row_group_size,
+        )
+    finally:
+        connection.close()
@@ -1,4 +1,4 @@
-from collections.abc import Iterable, Sequence
+from collections.abc import Callable, Iterable, Sequence
 from typing import Any
 
 from open_targets.adapter.acquisition_definition import (
@@ -32,14 +32,24 @@ class MockSingleExpressionAcquisitionDefinition(_ExpressionAcquisitionDefinition
         super().__init__(MockScanOperation(dataset=MockDataset))
         self._expression = expression
 
+    def _create_converter(self, context: AcquisitionContextProtocol) -> Callable[[DataView], Any]:
+        return self._create_value_getter(self._expression)
+
     def _acquire_from_scanning(
         self,
         context: AcquisitionContextProtocol,
         data_stream: Iterable[DataView],
     ) -> Iterable[Any]:
-        value_getter = self._create_value_getter(self._expression)
+        value_getter = self._create_converter(context)
         return (value_getter(data) for data in data_stream)
 
     @property
     def _all_expressions(self) -> Sequence[Expression[Any]]:
         return [self._expression]
+
+    @property
+    def _property_exprs(self) -> Sequence[tuple[Expression[str], Expression[Any]]]:
+        return []
+
+    def _get_attribute_expressions(self, _context: AcquisitionContextProtocol) -> list[Expression[Any]]:
+        return [self._expression]
@@ -1,8 +1,11 @@
 from collections.abc import Iterable, Sequence
 from pathlib import Path
+from typing import Any
 
 from open_targets.adapter.context_protocol import AcquisitionContextProtocol
 from open_targets.adapter.data_view import DataView
+from open_targets.adapter.expression import Expression
+from open_targets.adapter.expression_cache import ExpressionCache
 from open_targets.adapter.scan_operation import ScanOperation
 from open_targets.data.schema_base import Dataset, Field
 
@@ -15,3 +18,19 @@ class MockAcquisitionContext(AcquisitionContextProtocol):
         scan_operation: ScanOperation,
         requested_fields: Sequence[type[Field]],
     ) -> Iterable[DataView]: ...
+
+    def compile_expression(self, _scan_operation: ScanOperation, expression: Expression[Any]) -> Expression[Any]:
+        return expression
+
+    def create_expression_cache(self, _definition: object) -> ExpressionCache | None:
+        return None
+
+    def create_deterministic_id_expression(
+        self,
+        _scan_operation: ScanOperation,
+        _components: Sequence[Expression[Any]],
+    ) -> Expression[str] | None:
+        return None
+
+    def record_acquisition_failure(self, definition: object) -> None:
+        pass